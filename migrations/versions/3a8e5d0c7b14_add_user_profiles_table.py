@@ -0,0 +1,32 @@
+"""Add user_profiles table
+
+Revision ID: 3a8e5d0c7b14
+Revises: 9f3b6c1d2e7a
+Create Date: 2026-10-17 10:03:47.915320
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3a8e5d0c7b14'
+down_revision: Union[str, None] = '9f3b6c1d2e7a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'user_profiles',
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), primary_key=True),
+        sa.Column('embedding_sum', sa.LargeBinary(), nullable=True),
+        sa.Column('weight', sa.Float(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('user_profiles')
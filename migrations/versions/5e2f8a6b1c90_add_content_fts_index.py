@@ -0,0 +1,59 @@
+"""Add content_fts full-text index
+
+Revision ID: 5e2f8a6b1c90
+Revises: c41d7e2a9b53
+Create Date: 2026-10-17 15:02:36.118904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e2f8a6b1c90'
+down_revision: Union[str, None] = 'c41d7e2a9b53'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+AUTHORS = "(SELECT group_concat(value, ' ') FROM json_each({row}.paper_metadata, '$.authors'))"
+CATEGORIES = "(SELECT group_concat(value, ' ') FROM json_each({row}.paper_metadata, '$.categories'))"
+INSERT_NEW = (
+    "INSERT INTO content_fts (rowid, title, abstract, authors, categories) VALUES "
+    f"(new.id, new.title, new.abstract, {AUTHORS.format(row='new')}, {CATEGORIES.format(row='new')});"
+)
+
+
+def upgrade() -> None:
+    # FTS5 is SQLite-specific; other databases keep the ILIKE search
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    op.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS content_fts USING fts5("
+        "title, abstract, authors, categories, tokenize = 'porter unicode61 remove_diacritics 2')"
+    )
+    op.execute(f"CREATE TRIGGER IF NOT EXISTS content_fts_insert AFTER INSERT ON content BEGIN {INSERT_NEW} END")
+    op.execute(
+        "CREATE TRIGGER IF NOT EXISTS content_fts_update AFTER UPDATE OF title, abstract, paper_metadata ON content "
+        f"BEGIN DELETE FROM content_fts WHERE rowid = old.id; {INSERT_NEW} END"
+    )
+    op.execute(
+        "CREATE TRIGGER IF NOT EXISTS content_fts_delete AFTER DELETE ON content "
+        "BEGIN DELETE FROM content_fts WHERE rowid = old.id; END"
+    )
+    # Replaces whatever a rebuild script run before the migration indexed
+    op.execute("DELETE FROM content_fts")
+    op.execute(
+        "INSERT INTO content_fts (rowid, title, abstract, authors, categories) "
+        f"SELECT c.id, c.title, c.abstract, {AUTHORS.format(row='c')}, {CATEGORIES.format(row='c')} FROM content c"
+    )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    op.execute("DROP TRIGGER IF EXISTS content_fts_insert")
+    op.execute("DROP TRIGGER IF EXISTS content_fts_update")
+    op.execute("DROP TRIGGER IF EXISTS content_fts_delete")
+    op.execute("DROP TABLE IF EXISTS content_fts")
@@ -0,0 +1,34 @@
+"""Add feed_sessions table
+
+Revision ID: 7d4c2b9e5a31
+Revises: 5e2f8a6b1c90
+Create Date: 2026-10-17 18:12:40.551904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d4c2b9e5a31'
+down_revision: Union[str, None] = '5e2f8a6b1c90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'feed_sessions',
+        sa.Column('token', sa.String(), primary_key=True),
+        sa.Column('seen', sa.LargeBinary(), nullable=True),
+        sa.Column('latest_offset', sa.Integer(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+    )
+    op.create_index('ix_feed_sessions_updated_at', 'feed_sessions', ['updated_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_feed_sessions_updated_at', table_name='feed_sessions')
+    op.drop_table('feed_sessions')
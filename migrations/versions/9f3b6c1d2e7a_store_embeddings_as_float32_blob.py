@@ -0,0 +1,67 @@
+"""Store Content.embedding as a little-endian float32 blob
+
+Revision ID: 9f3b6c1d2e7a
+Revises: 24462a4d2c51
+Create Date: 2026-10-17 09:12:31.402117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import numpy as np
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9f3b6c1d2e7a'
+down_revision: Union[str, None] = '24462a4d2c51'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 1000
+
+content = sa.table(
+    'content',
+    sa.column('id', sa.Integer),
+    sa.column('embedding', sa.JSON),
+    sa.column('embedding_f32', sa.LargeBinary),
+)
+
+
+def _backfill(source, target, convert) -> None:
+    """Copies `source` into `target` in id-ordered chunks so memory stays flat."""
+    conn = op.get_bind()
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            sa.select(content.c.id, content.c[source])
+            .where(content.c[source].is_not(None), content.c.id > last_id)
+            .order_by(content.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        conn.execute(
+            content.update()
+            .where(content.c.id == sa.bindparam('row_id'))
+            .values({target: sa.bindparam('value')}),
+            [{'row_id': row[0], 'value': convert(row[1])} for row in rows]
+        )
+        last_id = rows[-1][0]
+
+
+def upgrade() -> None:
+    op.add_column('content', sa.Column('embedding_f32', sa.LargeBinary(), nullable=True))
+    _backfill('embedding', 'embedding_f32', lambda value: np.asarray(value, dtype='<f4').tobytes())
+    with op.batch_alter_table('content') as batch_op:
+        batch_op.drop_column('embedding')
+        batch_op.alter_column('embedding_f32', new_column_name='embedding')
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('content') as batch_op:
+        batch_op.alter_column('embedding', new_column_name='embedding_f32')
+    op.add_column('content', sa.Column('embedding', sa.JSON(), nullable=True))
+    _backfill('embedding_f32', 'embedding', lambda value: np.frombuffer(value, dtype='<f4').tolist())
+    with op.batch_alter_table('content') as batch_op:
+        batch_op.drop_column('embedding_f32')
@@ -0,0 +1,31 @@
+"""Add sync_state table
+
+Revision ID: c41d7e2a9b53
+Revises: 3a8e5d0c7b14
+Create Date: 2026-10-17 14:21:08.402117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c41d7e2a9b53'
+down_revision: Union[str, None] = '3a8e5d0c7b14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'sync_state',
+        sa.Column('category', sa.String(), primary_key=True),
+        sa.Column('last_published', sa.DateTime(), nullable=True),
+        sa.Column('synced_at', sa.DateTime(), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('sync_state')
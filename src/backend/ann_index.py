@@ -0,0 +1,156 @@
+import logging
+import os
+import tempfile
+
+import numpy as np
+
+# Approximate search is opt-in: set ANN_ENGINE=ivf to enable it
+ANN_ENGINE = os.getenv("ANN_ENGINE", "").lower()
+ANN_INDEX_PATH = os.getenv("ANN_INDEX_PATH", "ann_index.npz")
+# Number of inverted lists probed per query; higher means better recall, slower queries
+ANN_NPROBE = int(os.getenv("ANN_NPROBE", 8))
+# Below this many rows the exact scan is already fast enough
+ANN_MIN_ROWS = int(os.getenv("ANN_MIN_ROWS", 50000))
+# Rebuild once rows added after training exceed this fraction of the trained rows
+ANN_REBUILD_FRACTION = float(os.getenv("ANN_REBUILD_FRACTION", 0.2))
+
+_ASSIGN_CHUNK = 65536
+
+logger = logging.getLogger(__name__)
+
+
+def save_npz(path, **arrays):
+    """
+    Writes `arrays` to `path` atomically. Each writer gets its own temp file in the
+    target directory, so workers saving at the same time can't clobber each other's
+    half-written file before the rename.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp.npz')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def assign_lists(matrix, centroids):
+    """Returns the index of the most similar centroid for each row, in chunks."""
+    assignments = np.empty(len(matrix), dtype=np.int32)
+    for start in range(0, len(matrix), _ASSIGN_CHUNK):
+        chunk = matrix[start:start + _ASSIGN_CHUNK]
+        assignments[start:start + len(chunk)] = np.argmax(chunk @ centroids.T, axis=1)
+    return assignments
+
+
+def spherical_kmeans(vectors, n_clusters: int, iterations: int = 10, seed: int = 0):
+    """
+    K-means on unit vectors using cosine similarity. Centroids are renormalized
+    after every update and empty clusters are reseeded from random vectors.
+    """
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), n_clusters, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignments = assign_lists(vectors, centroids)
+        order = np.argsort(assignments, kind='stable')
+        counts = np.bincount(assignments, minlength=n_clusters)
+        sums = np.zeros_like(centroids)
+        nonempty = np.flatnonzero(counts)
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])[nonempty]
+        sums[nonempty] = np.add.reduceat(vectors[order], starts, axis=0)
+
+        empty = counts == 0
+        if empty.any():
+            sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()), replace=False)]
+
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        centroids = (sums / norms).astype(np.float32)
+
+    return centroids
+
+
+class IVFIndex:
+    """
+    Inverted-file index over the rows of an EmbeddingIndex matrix.
+
+    Rows are grouped under their nearest k-means centroid. A query only scores the
+    rows stored under the `nprobe` centroids closest to it. Lists hold row positions
+    into the matrix the index was trained on, so no vectors are duplicated.
+    """
+
+    def __init__(self, centroids, offsets, rows, ids):
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.rows = np.asarray(rows, dtype=np.int64)
+        self.ids = np.asarray(ids, dtype=np.int64)
+
+    @property
+    def n_lists(self):
+        return len(self.centroids)
+
+    @property
+    def n_rows(self):
+        return len(self.ids)
+
+    @classmethod
+    def build(cls, ids, matrix, n_lists: int = None, iterations: int = 10, sample_size: int = 256):
+        """
+        Trains centroids on a sample of `sample_size` rows per list and assigns every row.
+        `matrix` must already be L2-normalized.
+        """
+        n = len(ids)
+        n_lists = n_lists or max(1, int(4 * np.sqrt(n)))
+        n_lists = min(n_lists, n)
+
+        rng = np.random.default_rng(0)
+        sample = min(n, n_lists * sample_size)
+        training = matrix[np.sort(rng.choice(n, sample, replace=False))]
+        centroids = spherical_kmeans(np.asarray(training, dtype=np.float32), n_lists, iterations)
+
+        assignments = assign_lists(matrix, centroids)
+        rows = np.argsort(assignments, kind='stable')
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(assignments, minlength=n_lists))])
+        return cls(centroids, offsets, rows, ids)
+
+    def candidate_rows(self, query, nprobe: int):
+        """Row positions stored under the `nprobe` centroids closest to `query`."""
+        nprobe = min(nprobe, self.n_lists)
+        centroid_scores = self.centroids @ query
+        if nprobe < self.n_lists:
+            probe = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        else:
+            probe = np.arange(self.n_lists)
+        return np.concatenate([self.rows[self.offsets[l]:self.offsets[l + 1]] for l in probe])
+
+    def matches(self, ids):
+        """True if this index was trained on a prefix of `ids`."""
+        return self.n_rows <= len(ids) and np.array_equal(self.ids, ids[:self.n_rows])
+
+    def save(self, path: str = ANN_INDEX_PATH):
+        save_npz(path, centroids=self.centroids, offsets=self.offsets, rows=self.rows, ids=self.ids)
+
+    @classmethod
+    def load(cls, path: str = ANN_INDEX_PATH):
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            return cls(data['centroids'], data['offsets'], data['rows'], data['ids'])
+
+
+def load_or_build(ids, matrix, path: str = ANN_INDEX_PATH):
+    """
+    Returns an IVF index usable for `ids`, reusing the one persisted at `path`
+    when it still matches and is not too stale, and rebuilding it otherwise.
+    """
+    existing = IVFIndex.load(path)
+    if existing is not None and existing.matches(ids):
+        if len(ids) - existing.n_rows <= ANN_REBUILD_FRACTION * existing.n_rows:
+            return existing
+
+    logger.info("Building IVF index over %d embeddings", len(ids))
+    index = IVFIndex.build(ids, matrix)
+    index.save(path)
+    return index
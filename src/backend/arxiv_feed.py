@@ -0,0 +1,290 @@
+import asyncio
+import io
+import os
+import re
+import time
+import xml.etree.ElementTree as ET
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# arXiv API endpoint; point it at a local stand-in server for testing
+ARXIV_API_URL = os.getenv("ARXIV_API_URL", "http://export.arxiv.org/api/query")
+# arXiv asks for at most one request every three seconds
+ARXIV_REQUESTS_PER_SECOND = float(os.getenv("ARXIV_REQUESTS_PER_SECOND", 1 / 3))
+# Categories fetched concurrently (requests still go through the shared rate limit)
+ARXIV_CONCURRENCY = int(os.getenv("ARXIV_CONCURRENCY", 4))
+ARXIV_PAGE_SIZE = int(os.getenv("ARXIV_PAGE_SIZE", 100))
+# Papers fetched per category by one incremental sync; a sync that far behind resumes on the next run
+ARXIV_SYNC_MAX_RESULTS = int(os.getenv("ARXIV_SYNC_MAX_RESULTS", 10000))
+
+# Responses retried (after a backoff) instead of failing the request
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+ATOM = '{http://www.w3.org/2005/Atom}'
+ARXIV = '{http://arxiv.org/schemas/atom}'
+_PUBLISHED = re.compile(r'<published>([^<]+)</published>')
+
+
+def _text(element, tag):
+    child = element.find(tag)
+    return child.text if child is not None and child.text else ""
+
+
+def parse_entry(entry):
+    """Maps one Atom <entry> to the paper dict stored as Content."""
+    entry_id = _text(entry, f'{ATOM}id')
+    published = _text(entry, f'{ATOM}published')
+    pdf_url = next(
+        (link.get('href') for link in entry.findall(f'{ATOM}link') if link.get('title') == 'pdf'),
+        entry_id
+    )
+    categories = [category.get('term') for category in entry.findall(f'{ATOM}category')]
+    return {
+        'title': ' '.join(_text(entry, f'{ATOM}title').split()),
+        'abstract': _text(entry, f'{ATOM}summary').strip(),
+        'url': pdf_url,
+        'external_id': entry_id,
+        'source': 'arxiv',
+        'published_date': parse_timestamp(published),
+        'paper_metadata': {
+            'authors': [_text(author, f'{ATOM}name') for author in entry.findall(f'{ATOM}author')],
+            'categories': categories,
+            'paper_id': entry_id.split('/')[-1],
+            'published_date': published
+        }
+    }
+
+
+def parse_timestamp(value):
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+
+def published_range(xml_data):
+    """(oldest, newest) publication time on a page without parsing the whole feed, or None."""
+    published = [parse_timestamp(value) for value in _PUBLISHED.findall(xml_data)]
+    return (min(published), max(published)) if published else None
+
+
+def iter_entries(source):
+    """
+    Incrementally parses an Atom feed (str, bytes or binary file object), yielding
+    each entry's paper dict as soon as its closing tag is read. Processed elements
+    are cleared, so memory stays bounded by one entry however long the feed.
+    """
+    if isinstance(source, str):
+        source = source.encode('utf-8')
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    root = None
+    for event, element in ET.iterparse(source, events=('start', 'end')):
+        if root is None:
+            root = element
+        elif event == 'end' and element.tag == f'{ATOM}entry':
+            # arXiv reports query errors as an entry without a publication date
+            if _text(element, f'{ATOM}published'):
+                yield parse_entry(element)
+            root.clear()
+
+
+def iter_batches(items, size):
+    """Groups an iterable into lists of at most `size` items."""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def parse_feed(xml_data):
+    """Parses an arXiv API response into paper dicts."""
+    return list(iter_entries(xml_data))
+
+
+class TokenBucket:
+    """
+    Async token bucket shared by every worker: `rate` requests per second on
+    average, with bursts of up to `capacity`.
+    """
+
+    def __init__(self, rate: float = ARXIV_REQUESTS_PER_SECOND, capacity: float = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        # Holding the lock while sleeping makes waiters queue up in arrival order
+        async with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            if self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self.tokens = 1
+                self.updated_at = time.monotonic()
+            self.tokens -= 1
+
+
+def retry_after_seconds(response):
+    """Delay asked for by a Retry-After header (seconds or an HTTP date), or None."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+class ArxivClient:
+    """
+    Pooled, retrying HTTP client for the arXiv API. Blocking requests run in a
+    thread pool so many categories can be in flight from one event loop.
+    """
+
+    def __init__(self, base_url: str = ARXIV_API_URL, rate_limiter: TokenBucket = None,
+                 pool_size: int = ARXIV_CONCURRENCY, retries: int = 5, backoff_factor: float = 1,
+                 timeout: float = 30):
+        self.base_url = base_url
+        self.rate_limiter = rate_limiter or TokenBucket()
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.timeout = timeout
+        self.session = requests.Session()
+        # No transport-level retries: query() retries, so every attempt goes through the rate limiter
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    async def query(self, **params):
+        """
+        Returns the raw Atom XML for one API request. Each attempt, retries included,
+        takes a token from the shared rate limiter. A failed attempt waits as long as
+        the server's Retry-After asks, otherwise backs off exponentially.
+        """
+        loop = asyncio.get_running_loop()
+        for attempt in range(self.retries + 1):
+            await self.rate_limiter.acquire()
+            try:
+                response = await loop.run_in_executor(
+                    None, lambda: self.session.get(self.base_url, params=params, timeout=self.timeout)
+                )
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.retries:
+                    raise
+                delay = self.backoff_factor * 2 ** attempt
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt == self.retries:
+                    response.raise_for_status()
+                    return response.text
+                delay = retry_after_seconds(response)
+                if delay is None:
+                    delay = self.backoff_factor * 2 ** attempt
+            await asyncio.sleep(delay)
+
+    async def pages(self, category: str, max_results: int = 50, page_size: int = ARXIV_PAGE_SIZE, since=None):
+        """
+        Yields the raw XML pages of the newest `max_results` papers of `category`.
+
+        With `since`, pages oldest first through the papers submitted at or after it
+        instead, up to `max_results`. A capped sync then ends on a contiguous prefix,
+        so the newest paper it saw is a safe new mark and the next sync resumes there
+        rather than leaving a gap below the newest papers.
+        """
+        if since is None:
+            search_query, sort_order = f"cat:{category}", "descending"
+        else:
+            # submittedDate has minute resolution; the paper at the mark comes back and is skipped on insert
+            until = datetime.now(timezone.utc) + timedelta(days=1)
+            search_query = (f"cat:{category} AND submittedDate:"
+                            f"[{since.astimezone(timezone.utc):%Y%m%d%H%M} TO {until:%Y%m%d%H%M}]")
+            sort_order = "ascending"
+        start = 0
+        while start < max_results:
+            count = min(page_size, max_results - start)
+            xml_data = await self.query(
+                search_query=search_query,
+                start=start,
+                max_results=count,
+                sortBy="submittedDate",
+                sortOrder=sort_order
+            )
+            yield xml_data
+            # A short page means the category has no more papers
+            if xml_data.count('<entry') < count:
+                break
+            start += count
+
+    async def fetch_category(self, category: str, max_results: int = 50, page_size: int = ARXIV_PAGE_SIZE,
+                             since=None):
+        """
+        Newest `max_results` papers of `category`, or with `since` the (up to
+        `max_results`) oldest ones published at or after it.
+        """
+        papers = []
+        async for xml_data in self.pages(category, max_results, page_size, since):
+            papers.extend(parse_feed(xml_data))
+        if since is not None:
+            papers = [paper for paper in papers if paper['published_date'] >= since]
+        return papers
+
+    def close(self):
+        self.session.close()
+
+
+async def crawl(categories, max_results: int = 50, concurrency: int = ARXIV_CONCURRENCY,
+                client: ArxivClient = None, on_papers=None, marks=None):
+    """
+    Fetches `categories` with a pool of `concurrency` workers sharing the client's
+    rate limit. `on_papers(category, papers)` is awaited as each category completes;
+    a category that still fails after retries is reported and skipped.
+
+    `marks` maps categories to their sync high-water mark: those categories fetch
+    the papers published since, oldest first, up to ARXIV_SYNC_MAX_RESULTS per run.
+    Returns {category: number of papers fetched}.
+    """
+    marks = marks or {}
+    own_client = client is None
+    client = client or ArxivClient(pool_size=concurrency)
+    pending = asyncio.Queue()
+    for category in categories:
+        pending.put_nowait(category)
+    counts = {}
+    started = time.perf_counter()
+
+    async def worker():
+        while True:
+            try:
+                category = pending.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                since = marks.get(category)
+                limit = ARXIV_SYNC_MAX_RESULTS if since is not None else max_results
+                papers = await client.fetch_category(category, limit, since=since)
+            except Exception as e:
+                print(f"Failed to fetch {category}: {e}")
+                continue
+            counts[category] = len(papers)
+            if on_papers is not None:
+                await on_papers(category, papers)
+            print(f"[{len(counts)}/{len(categories)}] {category}: {len(papers)} papers "
+                  f"({time.perf_counter() - started:.1f}s elapsed)")
+
+    try:
+        await asyncio.gather(*(worker() for _ in range(min(concurrency, len(categories)) or 1)))
+    finally:
+        if own_client:
+            client.close()
+    return counts
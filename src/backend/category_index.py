@@ -0,0 +1,208 @@
+import asyncio
+import time
+from collections import defaultdict
+from datetime import timezone
+
+import numpy as np
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import Content
+from .vector_index import INDEX_REFRESH_SECONDS
+
+_LOAD_CHUNK = 10000
+# Ids per IN (...) lookup when re-checking unfiled papers
+_REFILE_CHUNK = 500
+
+
+def category_keys(categories):
+    """
+    Keys a paper is filed under: each arXiv code plus its archive,
+    so 'cs.LG' matches both 'cs.LG' and 'cs'.
+    """
+    keys = set()
+    for category in categories or []:
+        keys.add(category)
+        keys.add(category.split('.')[0])
+    return keys
+
+
+def utc_timestamp(published_date):
+    """
+    POSIX seconds of a publication time. Naive datetimes (as read back from the
+    database) are UTC, like the aware ones parsed from the arXiv feed.
+    """
+    if published_date is None:
+        return 0.0
+    if published_date.tzinfo is None:
+        published_date = published_date.replace(tzinfo=timezone.utc)
+    return published_date.timestamp()
+
+
+class CategoryIndex:
+    """
+    Inverted index from arXiv category code to the sorted array of content ids filed
+    under it, plus each paper's publication time for newest-first category feeds.
+    Built once from paper_metadata so requests never decode the JSON column.
+
+    Papers stored without categories are remembered, and filed once their metadata
+    is filled in (e.g. by scripts/enrich_existing_data.py).
+    """
+
+    def __init__(self):
+        self.postings = {}
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.published = np.zeros(0, dtype=np.float64)
+        self.max_id = 0
+        self.checked_at = time.monotonic()
+        # Ids filed under no category, and the number of rows with metadata when last checked
+        self.unfiled = set()
+        self.metadata_count = 0
+        # content id -> (keys, timestamp) of papers filed since the last merge
+        self._pending = {}
+        self._newest_first = {}
+
+    @classmethod
+    async def from_db(cls, db: AsyncSession):
+        index = cls()
+        index.metadata_count = await db.scalar(select(func.count(Content.paper_metadata)))
+        await index._load_after(db, 0)
+        return index
+
+    async def _load_after(self, db: AsyncSession, last_id: int):
+        while True:
+            result = await db.execute(
+                select(Content.id, Content.published_date, Content.paper_metadata)
+                .where(Content.id > last_id)
+                .order_by(Content.id)
+                .limit(_LOAD_CHUNK)
+            )
+            rows = result.all()
+            if not rows:
+                break
+            for row in rows:
+                self.add(row.id, (row.paper_metadata or {}).get('categories', []), row.published_date)
+            last_id = rows[-1].id
+
+    async def _refile_unfiled(self, db: AsyncSession):
+        """Files the unfiled papers whose metadata has been filled in since they were loaded."""
+        unfiled = sorted(self.unfiled)
+        for start in range(0, len(unfiled), _REFILE_CHUNK):
+            result = await db.execute(
+                select(Content.id, Content.published_date, Content.paper_metadata)
+                .where(Content.id.in_(unfiled[start:start + _REFILE_CHUNK]), Content.paper_metadata.is_not(None))
+            )
+            for row in result:
+                # A JSON null reads back as None and is still waiting for its metadata
+                if row.paper_metadata is None:
+                    continue
+                self.add(row.id, row.paper_metadata.get('categories', []), row.published_date)
+                # Its metadata is in now, even if it lists no categories
+                self.unfiled.discard(row.id)
+
+    def add(self, content_id: int, categories, published_date=None):
+        """
+        Files a newly ingested or updated paper; merged into the arrays on the next
+        lookup. A paper filed again leaves the categories it was filed under before.
+        """
+        keys = category_keys(categories)
+        self._pending[content_id] = (keys, utc_timestamp(published_date))
+        if keys:
+            self.unfiled.discard(content_id)
+        else:
+            self.unfiled.add(content_id)
+        self.max_id = max(self.max_id, content_id)
+
+    def _merge_pending(self):
+        if not self._pending:
+            return
+        new_ids = np.fromiter(self._pending, dtype=np.int64, count=len(self._pending))
+        refiled = new_ids[np.isin(new_ids, self.ids)]
+        if len(refiled):
+            for key, ids in list(self.postings.items()):
+                ids = ids[~np.isin(ids, refiled)]
+                if len(ids):
+                    self.postings[key] = ids
+                else:
+                    del self.postings[key]
+
+        by_key = defaultdict(list)
+        for content_id, (keys, _) in self._pending.items():
+            for key in keys:
+                by_key[key].append(content_id)
+        for key, key_ids in by_key.items():
+            merged = np.asarray(key_ids, dtype=np.int64)
+            if key in self.postings:
+                merged = np.concatenate([self.postings[key], merged])
+            self.postings[key] = np.unique(merged)
+
+        new_published = np.fromiter((published for _, published in self._pending.values()), dtype=np.float64)
+        ids = np.concatenate([self.ids, new_ids])
+        published = np.concatenate([self.published, new_published])
+        # Keep the last entry for an id filed twice, then sort by id for searchsorted
+        ids, first = np.unique(ids[::-1], return_index=True)
+        self.ids, self.published = ids, published[::-1][first]
+        self._pending.clear()
+        self._newest_first.clear()
+
+    def ids_for(self, categories):
+        """Sorted ids filed under any of `categories` (union of their postings)."""
+        self._merge_pending()
+        arrays = [self.postings[key] for key in categories if key in self.postings]
+        if not arrays:
+            return np.zeros(0, dtype=np.int64)
+        if len(arrays) == 1:
+            return arrays[0]
+        return np.unique(np.concatenate(arrays))
+
+    def newest_first(self, categories):
+        """Ids filed under `categories`, ordered by publication date, newest first."""
+        key = tuple(sorted(categories))
+        if key not in self._newest_first or self._pending:
+            ids = self.ids_for(categories)
+            published = self.published[np.searchsorted(self.ids, ids)]
+            self._newest_first[key] = ids[np.lexsort((-ids, -published))]
+        return self._newest_first[key]
+
+    async def refresh(self, db: AsyncSession, force: bool = False):
+        """
+        Files papers ingested by other processes since the last check, and unfiled
+        papers whose metadata was filled in (seen as a change in the metadata count).
+        """
+        if not force and time.monotonic() - self.checked_at < INDEX_REFRESH_SECONDS:
+            return self
+        self.checked_at = time.monotonic()
+        metadata_count = await db.scalar(select(func.count(Content.paper_metadata)))
+        max_id = await db.scalar(select(func.max(Content.id)))
+        if max_id and max_id > self.max_id:
+            await self._load_after(db, self.max_id)
+        if metadata_count != self.metadata_count and self.unfiled:
+            await self._refile_unfiled(db)
+        self.metadata_count = metadata_count
+        return self
+
+
+def parse_categories(category: str):
+    """Splits a comma-separated `category` query parameter."""
+    return [code.strip() for code in category.split(',') if code.strip()]
+
+
+_index = None
+_index_lock = asyncio.Lock()
+
+
+async def get_category_index(db: AsyncSession) -> CategoryIndex:
+    """Returns the process-wide category index, building it on first use."""
+    global _index
+    async with _index_lock:
+        if _index is None:
+            _index = await CategoryIndex.from_db(db)
+        else:
+            await _index.refresh(db)
+        return _index
+
+
+def add_to_category_index(content_id: int, categories, published_date=None):
+    """Files a freshly stored paper in the loaded index, if one has been built."""
+    if _index is not None:
+        _index.add(content_id, categories, published_date)
@@ -19,9 +19,17 @@ ArticlesSessionLocal = sessionmaker(articles_engine, expire_on_commit=False, cla
 
 async def init_db():
     # Import all models here to ensure they're registered with Base
-    from .models import Content, User, Interest, Interaction
+    from .models import Content, User, Interest, Interaction, UserProfile, SyncState, FeedSession
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+    async with articles_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        if conn.dialect.name == 'sqlite':
+            # Building the index can take minutes on a large corpus, so startup only checks for it
+            from .search_index import fts_exists
+            if not await conn.run_sync(fts_exists):
+                print("Full-text index missing, /search/arxiv falls back to ILIKE. "
+                      "Run `alembic upgrade head` or `python -m src.backend.scripts.rebuild_search_index`")
 
 async def get_db():
     async with AsyncSessionLocal() as session:
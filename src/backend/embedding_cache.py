@@ -0,0 +1,157 @@
+import asyncio
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+
+from . import encoder
+
+# SQLite file shared by every process that encodes text
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "embedding_cache.db")
+# Entries kept in the in-process LRU tier in front of the file
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", 10000))
+
+_LOOKUP_CHUNK = 500
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Canonical form used for hashing: NFKC with runs of whitespace collapsed."""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", text or "")).strip()
+
+
+class EmbeddingCache:
+    """
+    Two-tier cache of text embeddings keyed by sha256(model id + normalized text):
+    an in-process LRU in front of a persistent SQLite table, so identical text is
+    encoded once across processes and re-ingests.
+    """
+
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH, model_name: str = encoder.model_id(),
+                 max_entries: int = EMBEDDING_CACHE_SIZE):
+        self.path = path
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+    def _connection(self):
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "key TEXT PRIMARY KEY, model TEXT NOT NULL, vector BLOB NOT NULL"
+                ") WITHOUT ROWID"
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _remember(self, key, vector):
+        self._lru[key] = vector
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    def get_many(self, texts):
+        """Returns a list aligned with `texts` holding cached vectors or None."""
+        return self._get_by_keys([self.key(text) for text in texts])
+
+    def _get_by_keys(self, keys):
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key in self._lru:
+                    self._lru.move_to_end(key)
+                    found[key] = self._lru[key]
+
+            missing = list({key for key in keys if key not in found})
+            conn = self._connection()
+            for start in range(0, len(missing), _LOOKUP_CHUNK):
+                chunk = missing[start:start + _LOOKUP_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                rows = conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                for key, blob in rows:
+                    vector = np.frombuffer(blob, dtype='<f4')
+                    found[key] = vector
+                    self._remember(key, vector)
+
+        return [found.get(key) for key in keys]
+
+    def put_many(self, texts, vectors):
+        self._put_by_keys([self.key(text) for text in texts], vectors)
+
+    def _put_by_keys(self, keys, vectors):
+        rows = []
+        with self._lock:
+            for key, vector in zip(keys, vectors):
+                vector = np.asarray(vector, dtype='<f4')
+                self._remember(key, vector)
+                rows.append((key, self.model_name, vector.tobytes()))
+            conn = self._connection()
+            conn.executemany("INSERT OR IGNORE INTO embeddings (key, model, vector) VALUES (?, ?, ?)", rows)
+            conn.commit()
+
+    def encode(self, texts, batch_size: int = 64):
+        """
+        Embeds `texts`, encoding only the ones not cached (each distinct text once)
+        in a single batched call. Returns a float32 array aligned with `texts`.
+        """
+        keys = [self.key(text) for text in texts]
+        vectors = self._get_by_keys(keys)
+        misses = {}
+        for key, text, vector in zip(keys, texts, vectors):
+            if vector is None:
+                misses.setdefault(key, text)
+        if misses:
+            encoded = encoder.encode(list(misses.values()), batch_size=batch_size, convert_to_numpy=True)
+            vectors = self._fill_misses(keys, vectors, misses, encoded)
+        return np.asarray(vectors, dtype=np.float32)
+
+    async def encode_async(self, texts):
+        """
+        Same as encode() but sends the misses to the shared encoder service, so the
+        model runs off the event loop, batched with other concurrent requests.
+        The SQLite lookups and writes (which may wait on another process's write
+        lock) run in worker threads too.
+        """
+        keys = [self.key(text) for text in texts]
+        vectors = await asyncio.to_thread(self._get_by_keys, keys)
+        misses = {}
+        for key, text, vector in zip(keys, texts, vectors):
+            if vector is None:
+                misses.setdefault(key, text)
+        if misses:
+            encoded = await encoder.encoder_service.encode(list(misses.values()))
+            vectors = await asyncio.to_thread(self._fill_misses, keys, vectors, misses, encoded)
+        return np.asarray(vectors, dtype=np.float32)
+
+    def _fill_misses(self, keys, vectors, misses, encoded):
+        self._put_by_keys(list(misses), encoded)
+        by_key = dict(zip(misses, encoded))
+        return [by_key[key] if vector is None else vector for key, vector in zip(keys, vectors)]
+
+
+embedding_cache = EmbeddingCache()
+
+
+def encode_papers(titles, abstracts, batch_size: int = 64):
+    """
+    Encodes titles and abstracts in one batched call and averages each pair,
+    the combined embedding stored for a paper. Texts already in the
+    embedding cache are not encoded again.
+    """
+    vectors = embedding_cache.encode(list(titles) + list(abstracts), batch_size=batch_size)
+    return (vectors[:len(titles)] + vectors[len(titles):]) / 2
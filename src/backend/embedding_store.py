@@ -0,0 +1,115 @@
+import os
+import shutil
+import time
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import Content
+
+# Directory holding the memory-mapped embedding matrix shared by all workers
+EMBEDDING_STORE_DIR = os.getenv("EMBEDDING_STORE_DIR", "embedding_store")
+# Number of previous generations kept around for readers that still map them
+KEEP_GENERATIONS = 2
+
+_CURRENT = "CURRENT"
+_EMBEDDINGS = "embeddings.npy"
+_IDS = "ids.npy"
+
+
+def current_generation(directory: str = EMBEDDING_STORE_DIR):
+    """Returns the name of the live generation, or None if no store has been written."""
+    try:
+        with open(os.path.join(directory, _CURRENT)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def open_store(directory: str = EMBEDDING_STORE_DIR):
+    """
+    Maps the live generation read-only. Returns (generation, ids, matrix) or None.
+    The matrix pages are shared through the OS page cache by every process that maps them.
+    """
+    generation = current_generation(directory)
+    if generation is None:
+        return None
+    path = os.path.join(directory, generation)
+    try:
+        ids = np.load(os.path.join(path, _IDS))
+        matrix = np.load(os.path.join(path, _EMBEDDINGS), mmap_mode='r')
+    except FileNotFoundError:
+        # CURRENT points at a generation that was pruned; treat as missing
+        return None
+    return generation, ids, matrix
+
+
+def _save_synced(path, array):
+    with open(path, 'wb') as f:
+        np.save(f, array)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def write_store(ids, matrix, directory: str = EMBEDDING_STORE_DIR):
+    """
+    Writes a new generation and atomically points CURRENT at it.
+
+    Files go into a fresh directory first and CURRENT is swapped with os.replace,
+    so readers either see the previous complete generation or the new one.
+    `matrix` is expected to be L2-normalized.
+    """
+    os.makedirs(directory, exist_ok=True)
+    generation = f"gen-{time.time_ns()}-{os.getpid()}"
+    path = os.path.join(directory, generation)
+    os.makedirs(path)
+
+    _save_synced(os.path.join(path, _IDS), np.asarray(ids, dtype=np.int64))
+    _save_synced(os.path.join(path, _EMBEDDINGS), np.ascontiguousarray(matrix, dtype=np.float32))
+
+    tmp_current = os.path.join(directory, f"{_CURRENT}.{os.getpid()}.tmp")
+    with open(tmp_current, 'w') as f:
+        f.write(generation)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_current, os.path.join(directory, _CURRENT))
+
+    _prune_generations(directory, generation)
+    return generation
+
+
+def _prune_generations(directory, live):
+    # Workers that still map an old generation keep their pages until they unmap,
+    # so removing the directory entry is safe on POSIX filesystems.
+    generations = sorted(
+        name for name in os.listdir(directory)
+        if name.startswith("gen-") and name != live
+    )
+    for name in generations[:-(KEEP_GENERATIONS - 1) or None]:
+        shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+
+
+async def export_store(db: AsyncSession, directory: str = EMBEDDING_STORE_DIR, chunk_size: int = 10000):
+    """Dumps every stored embedding into a new store generation, normalized and ordered by id."""
+    from .vector_index import normalize_rows
+
+    ids, blocks = [], []
+    last_id = 0
+    while True:
+        result = await db.execute(
+            select(Content.id, Content.embedding)
+            .where(Content.embedding.is_not(None), Content.id > last_id)
+            .order_by(Content.id)
+            .limit(chunk_size)
+        )
+        rows = result.all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        ids.extend(row.id for row in rows)
+        blocks.append(normalize_rows([row.embedding for row in rows]))
+
+    if not ids:
+        return None
+    return write_store(ids, np.vstack(blocks), directory)
@@ -0,0 +1,173 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Sentence embedding model used for papers and queries
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+# Load the model during API startup instead of on the first request that needs it
+PRELOAD_ENCODER = os.getenv("PRELOAD_ENCODER", "false").lower() in ("1", "true", "yes")
+# Inference backend: "torch", "torch-int8" (dynamic quantization) or "onnx" (needs onnxruntime)
+ENCODER_BACKEND = os.getenv("ENCODER_BACKEND", "torch").lower()
+
+_model = None
+_model_lock = threading.Lock()
+
+
+def load_torch(model_name):
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name, device="cpu")
+
+
+def load_torch_int8(model_name):
+    """fp32 model with its Linear layers dynamically quantized to int8 weights."""
+    import torch
+    model = load_torch(model_name)
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def load_onnx(model_name):
+    """ONNX Runtime CPU session; sentence-transformers exports the model on first load."""
+    import onnxruntime  # noqa: F401 -- fail early with a clear error when not installed
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name, device="cpu", backend="onnx")
+
+
+BACKENDS = {'torch': load_torch, 'torch-int8': load_torch_int8, 'onnx': load_onnx}
+
+
+def load_model(backend: str = ENCODER_BACKEND, model_name: str = EMBEDDING_MODEL):
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown encoder backend '{backend}', expected one of {sorted(BACKENDS)}")
+    return BACKENDS[backend](model_name)
+
+
+def model_id(backend: str = ENCODER_BACKEND, model_name: str = EMBEDDING_MODEL) -> str:
+    """
+    Identifies the vectors a backend produces. Quantized and exported backends drift
+    slightly from fp32, so they get their own embedding-cache entries.
+    """
+    return model_name if backend == 'torch' else f"{model_name}@{backend}"
+
+
+def get_model():
+    """
+    Returns the shared model for ENCODER_BACKEND, loading it on first use.
+    sentence_transformers (and torch) are only imported here, so processes
+    that never encode text never pay for them.
+    """
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                _model = load_model()
+    return _model
+
+
+def is_loaded() -> bool:
+    return _model is not None
+
+
+def encode(texts, **kwargs):
+    """Encodes a string or a list of strings with the shared model."""
+    return get_model().encode(texts, **kwargs)
+
+
+async def warm_up():
+    """Loads the model in a worker thread so the event loop keeps serving meanwhile."""
+    await asyncio.to_thread(get_model)
+
+
+# Dynamic batching: wait at most this long for more requests before encoding a batch
+ENCODER_BATCH_WINDOW_MS = float(os.getenv("ENCODER_BATCH_WINDOW_MS", 5))
+ENCODER_MAX_BATCH = int(os.getenv("ENCODER_MAX_BATCH", 64))
+
+
+class EncoderService:
+    """
+    Runs model.encode on a dedicated worker thread behind an asyncio queue.
+
+    Concurrent encode() calls are micro-batched: the batcher takes the first
+    waiting request, collects whatever else arrives within the batch window (up to
+    ENCODER_MAX_BATCH texts) and encodes them in one call off the event loop.
+    torch releases the GIL inside its kernels, so other endpoints keep running.
+    """
+
+    def __init__(self, window_ms: float = ENCODER_BATCH_WINDOW_MS, max_batch: int = ENCODER_MAX_BATCH):
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self._queue = None
+        self._task = None
+        self._executor = None
+        # Metrics
+        self.batches = 0
+        self.texts_encoded = 0
+        self.last_batch_size = 0
+        self.max_batch_seen = 0
+
+    def _ensure_started(self):
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue()
+            self._executor = self._executor or ThreadPoolExecutor(max_workers=1, thread_name_prefix="encoder")
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def encode(self, texts):
+        """Encodes a list of strings; resolves once the batch containing them is done."""
+        if not texts:
+            return []
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((list(texts), future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            requests = [await self._queue.get()]
+            size = len(requests[0][0])
+            deadline = loop.time() + self.window
+            while size < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    request = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                requests.append(request)
+                size += len(request[0])
+
+            batch = [text for texts, _ in requests for text in texts]
+            try:
+                vectors = await loop.run_in_executor(
+                    self._executor, lambda: encode(batch, batch_size=self.max_batch, convert_to_numpy=True)
+                )
+            except Exception as e:
+                for _, future in requests:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.texts_encoded += len(batch)
+            self.last_batch_size = len(batch)
+            self.max_batch_seen = max(self.max_batch_seen, len(batch))
+
+            offset = 0
+            for texts, future in requests:
+                if not future.done():
+                    future.set_result(vectors[offset:offset + len(texts)])
+                offset += len(texts)
+
+    def metrics(self):
+        return {
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "batches": self.batches,
+            "texts_encoded": self.texts_encoded,
+            "mean_batch_size": self.texts_encoded / self.batches if self.batches else 0.0,
+            "last_batch_size": self.last_batch_size,
+            "max_batch_size": self.max_batch_seen,
+        }
+
+
+encoder_service = EncoderService()
@@ -0,0 +1,314 @@
+import asyncio
+import os
+import time
+
+from sqlalchemy import bindparam
+from sqlalchemy.dialects import postgresql, sqlite
+
+from .arxiv_feed import ArxivClient, parse_feed, published_range, ARXIV_CONCURRENCY, ARXIV_SYNC_MAX_RESULTS
+from .category_index import add_to_category_index
+from .embedding_cache import encode_papers
+from .models import Content
+from .suggest_index import add_to_suggest_index
+from .sync_state import advance, save_marks
+from .vector_index import add_to_index
+
+# Capacity of each queue between stages; a full queue pauses the stage feeding it
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", 8))
+# Papers embedded and committed together
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", 256))
+
+# Rows per executemany / IN query in the bulk writer
+BULK_CHUNK_SIZE = 500
+# Columns refreshed when an already-stored paper is upserted with update_existing
+_REFRESHED_COLUMNS = ('title', 'abstract', 'url', 'source', 'published_date', 'paper_metadata')
+_INSERTS = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}
+
+# Core UPDATE run as one executemany per chunk; bind names must not clash with column names
+update_embedding = (
+    Content.__table__.update()
+    .where(Content.__table__.c.id == bindparam('content_id'))
+    .values(embedding=bindparam('vector'))
+)
+
+_DONE = object()
+
+
+def _chunks(items, size=BULK_CHUNK_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+async def bulk_insert_papers(session, papers, embeddings=None, update_existing: bool = False):
+    """
+    Stores paper dicts with one INSERT ... ON CONFLICT (external_id) executemany per
+    chunk through Core, bypassing the ORM unit of work and identity map. Papers already
+    stored are skipped, or with `update_existing` get their metadata refreshed.
+
+    Commits, adds the new rows to this process's vector, category and suggestion indexes and
+    returns the ids of the rows actually inserted, in the order of `papers`.
+    """
+    return [content_id for content_id, _ in await insert_papers(session, papers, embeddings, update_existing)]
+
+
+async def insert_papers(session, papers, embeddings=None, update_existing: bool = False):
+    """
+    bulk_insert_papers(), returning (id, paper) pairs of the inserted rows.
+
+    Which rows are new comes from RETURNING on the insert itself: a row skipped by
+    ON CONFLICT DO NOTHING returns nothing, so two writers storing the same paper
+    at once can't both count it as new.
+    """
+    connection = await session.connection()
+    if connection.dialect.name not in _INSERTS:
+        raise NotImplementedError(f"Bulk upsert is not supported on {connection.dialect.name}")
+    insert = _INSERTS[connection.dialect.name]
+    table = Content.__table__
+
+    rows = {}
+    for position, paper in enumerate(papers):
+        row = dict(paper)
+        if embeddings is not None:
+            row['embedding'] = embeddings[position]
+        # A batch may list a paper twice; the first copy wins
+        rows.setdefault(row['external_id'], row)
+    if not rows:
+        return []
+
+    statement = (
+        insert(table)
+        .on_conflict_do_nothing(index_elements=[table.c.external_id])
+        .returning(table.c.id, table.c.external_id)
+    )
+    ids = {}
+    for chunk in _chunks(list(rows.values())):
+        result = await session.execute(statement, chunk)
+        ids.update((external_id, content_id) for content_id, external_id in result)
+
+    updated = {}
+    conflicting = [row for external_id, row in rows.items() if external_id not in ids]
+    if update_existing and conflicting:
+        statement = insert(table)
+        refreshed = _REFRESHED_COLUMNS + (('embedding',) if embeddings is not None else ())
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.external_id],
+            set_={column: statement.excluded[column] for column in refreshed}
+        ).returning(table.c.id, table.c.external_id)
+        for chunk in _chunks(conflicting):
+            result = await session.execute(statement, chunk)
+            updated.update((external_id, content_id) for content_id, external_id in result)
+    await session.commit()
+
+    # Visible to this process's indexes right away; other processes pick the rows up on refresh
+    inserted = [(ids[external_id], row) for external_id, row in rows.items() if external_id in ids]
+    refreshed_rows = [(updated[external_id], row) for external_id, row in rows.items() if external_id in updated]
+    if embeddings is not None:
+        add_to_index(
+            [content_id for content_id, _ in inserted + refreshed_rows],
+            [row['embedding'] for _, row in inserted + refreshed_rows]
+        )
+    for content_id, row in inserted + refreshed_rows:
+        # An updated paper is filed again under its current categories
+        add_to_category_index(content_id, (row['paper_metadata'] or {}).get('categories', []), row['published_date'])
+    for content_id, row in inserted:
+        # Suggestion counts are per paper, so an update must not count it twice
+        add_to_suggest_index(content_id, row['title'], row['paper_metadata'])
+    return inserted
+
+
+async def store_embeddings(session, ids, embeddings):
+    """Writes the embeddings of stored rows (one executemany per chunk), commits and indexes them."""
+    params = [{'content_id': int(content_id), 'vector': embedding} for content_id, embedding in zip(ids, embeddings)]
+    for chunk in _chunks(params):
+        await session.execute(update_embedding, chunk)
+    await session.commit()
+    add_to_index(list(ids), list(embeddings))
+
+
+async def insert_and_embed(session, papers, embed, update_existing: bool = False):
+    """
+    Inserts `papers` without embeddings, then embeds only the rows actually inserted
+    with `embed` (an async callable taking the list of paper dicts) and stores their
+    vectors, so papers already stored are never encoded again. Returns the new ids.
+
+    A crash between the two commits leaves rows without an embedding, which
+    scripts/generate_embeddings.py fills in.
+    """
+    stored = await insert_papers(session, papers, update_existing=update_existing)
+    if stored:
+        await store_embeddings(session, [content_id for content_id, _ in stored],
+                               await embed([paper for _, paper in stored]))
+    return [content_id for content_id, _ in stored]
+
+
+async def embed_papers(papers):
+    """Embeds paper dicts (title and abstract averaged) in a worker thread."""
+    return await asyncio.to_thread(
+        encode_papers, [paper['title'] for paper in papers], [paper['abstract'] for paper in papers]
+    )
+
+
+class StageStats:
+    """Throughput and busy time of one pipeline stage, plus the occupancy of its input queue."""
+
+    def __init__(self, name, queue=None):
+        self.name = name
+        self.queue = queue
+        self.items = 0
+        self.busy = 0.0
+
+    def record(self, count, started):
+        self.items += count
+        self.busy += time.perf_counter() - started
+
+    def describe(self, elapsed):
+        line = f"{self.name:<6} {self.items:>8} items {self.items / elapsed:>8.1f}/s  busy {100 * self.busy / elapsed:>3.0f}%"
+        if self.queue is not None:
+            line += f"  queue {self.queue.qsize()}/{self.queue.maxsize}"
+        return line
+
+
+class IngestPipeline:
+    """
+    Streaming arXiv ingest: fetch -> parse -> write -> embed, connected by bounded
+    queues. Each stage only holds a few pages or batches, so memory stays flat however
+    large the crawl, and a slow stage back-pressures the ones before it instead of
+    letting work pile up. Batches are inserted first and only the rows the insert
+    reports as new are embedded, so stored papers are never encoded again. Papers
+    are searchable as soon as their batch commits and recommendable once their
+    embeddings commit.
+    """
+
+    def __init__(self, session_factory, client: ArxivClient = None, concurrency: int = ARXIV_CONCURRENCY,
+                 batch_size: int = INGEST_BATCH_SIZE, queue_size: int = INGEST_QUEUE_SIZE,
+                 embed: bool = True, report_every: float = 10.0):
+        self.session_factory = session_factory
+        self.own_client = client is None
+        self.client = client or ArxivClient(pool_size=concurrency)
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.embed = embed
+        self.report_every = report_every
+        self.pages = asyncio.Queue(queue_size)
+        self.papers = asyncio.Queue(queue_size)
+        self.inserted = asyncio.Queue(queue_size)
+        self.stats = {
+            'fetch': StageStats('fetch'),
+            'parse': StageStats('parse', self.pages),
+            'write': StageStats('write', self.papers),
+            'embed': StageStats('embed', self.inserted),
+        }
+        self.stored_ids = []
+
+    async def run(self, categories, max_results: int = 50, marks=None):
+        """
+        Ingests the newest `max_results` papers of each category; returns the new content ids.
+        With `marks` (see sync_state.load_marks), categories that have a mark only fetch
+        papers newer than it, and the advanced marks are saved once every batch is written.
+        """
+        self.started = time.perf_counter()
+        self.marks = dict(marks) if marks is not None else None
+        stages = [
+            asyncio.create_task(self._fetch(categories, max_results)),
+            asyncio.create_task(self._parse()),
+            asyncio.create_task(self._write()),
+            asyncio.create_task(self._embed()),
+        ]
+        reporter = asyncio.create_task(self._report())
+        try:
+            # If any stage fails, cancel the rest rather than leave them blocked on a queue
+            done, pending = await asyncio.wait(stages, return_when=asyncio.FIRST_EXCEPTION)
+            for task in pending:
+                task.cancel()
+            for task in done:
+                task.result()
+            if self.marks is not None:
+                async with self.session_factory() as session:
+                    await save_marks(session, self.marks)
+        finally:
+            reporter.cancel()
+            if self.own_client:
+                self.client.close()
+        self.print_stats()
+        return self.stored_ids
+
+    async def _fetch(self, categories, max_results):
+        pending = list(categories)
+
+        async def worker():
+            while pending:
+                category = pending.pop()
+                since = self.marks.get(category) if self.marks is not None else None
+                limit = ARXIV_SYNC_MAX_RESULTS if since is not None else max_results
+                newest = None
+                try:
+                    started = time.perf_counter()
+                    async for xml_data in self.client.pages(category, limit, since=since):
+                        self.stats['fetch'].record(1, started)
+                        published = published_range(xml_data)
+                        if published is not None and (newest is None or published[1] > newest):
+                            newest = published[1]
+                        await self.pages.put(xml_data)
+                        started = time.perf_counter()
+                except Exception as e:
+                    # Leave the mark alone so the next sync retries the whole category
+                    print(f"Failed to fetch {category}: {e}")
+                    continue
+                if self.marks is not None:
+                    advance(self.marks, category, newest)
+
+        await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+        await self.pages.put(_DONE)
+
+    async def _parse(self):
+        seen = set()
+        while (xml_data := await self.pages.get()) is not _DONE:
+            started = time.perf_counter()
+            papers = await asyncio.to_thread(parse_feed, xml_data)
+            # The same paper is listed under each of its categories
+            papers = [paper for paper in papers if paper['external_id'] not in seen]
+            seen.update(paper['external_id'] for paper in papers)
+            self.stats['parse'].record(len(papers), started)
+            for paper in papers:
+                await self.papers.put(paper)
+        await self.papers.put(_DONE)
+
+    async def _write(self):
+        """Groups parsed papers into batches and inserts each with one bulk upsert."""
+        async with self.session_factory() as session:
+            batch = []
+            while True:
+                paper = await self.papers.get()
+                if paper is not _DONE:
+                    batch.append(paper)
+                if batch and (len(batch) >= self.batch_size or paper is _DONE):
+                    started = time.perf_counter()
+                    inserted = await insert_papers(session, batch)
+                    self.stored_ids.extend(content_id for content_id, _ in inserted)
+                    self.stats['write'].record(len(inserted), started)
+                    if inserted and self.embed:
+                        await self.inserted.put(inserted)
+                    batch = []
+                if paper is _DONE:
+                    break
+        await self.inserted.put(_DONE)
+
+    async def _embed(self):
+        """Embeds the newly inserted papers of each batch in one encoder call and stores the vectors."""
+        async with self.session_factory() as session:
+            while (inserted := await self.inserted.get()) is not _DONE:
+                started = time.perf_counter()
+                ids = [content_id for content_id, _ in inserted]
+                await store_embeddings(session, ids, await embed_papers([paper for _, paper in inserted]))
+                self.stats['embed'].record(len(ids), started)
+
+    async def _report(self):
+        while True:
+            await asyncio.sleep(self.report_every)
+            self.print_stats()
+
+    def print_stats(self):
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        print(f"--- ingest {elapsed:.0f}s, {len(self.stored_ids)} papers stored")
+        for stats in self.stats.values():
+            print(stats.describe(elapsed))
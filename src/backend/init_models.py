@@ -1,6 +1,6 @@
 from .database import Base, engine
-from .models import Content, User, Interest, Interaction
+from .models import Content, User, Interest, Interaction, UserProfile, SyncState, FeedSession
 
 
 # This ensures all models are registered with SQLAlchemy
-models = [Content, User, Interest, Interaction] 
\ No newline at end of file
+models = [Content, User, Interest, Interaction, UserProfile, SyncState, FeedSession] 
\ No newline at end of file
@@ -3,10 +3,10 @@ from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse, Fil
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, or_, and_, func, desc, Integer
+from sqlalchemy import select, or_, and_, func
 import requests
 from .models import Content, User, Interaction, Base
-from .database import get_db, init_db, AsyncSessionLocal, get_articles_db, engine
+from .database import get_db, init_db, AsyncSessionLocal, ArticlesSessionLocal, get_articles_db, engine
 import asyncio
 from datetime import datetime, timedelta
 from .seed import seed_initial_content
@@ -18,7 +18,15 @@ import os
 import json
 import io
 from pydantic import BaseModel, EmailStr
-from .utils import process_and_store_arxiv_results, get_embedding, similarity_search # Import the functions
+from .utils import process_and_store_arxiv_results, get_embedding, similarity_search, rank_content_ids, fetch_content_by_ids, fetch_latest_content, hybrid_search_ids # Import the functions
+from .ranking_cache import ranking_cache, RankedResults, RECOMMENDATION_CANDIDATES
+from .seen_sets import seen_sets
+from .category_index import get_category_index, parse_categories
+from .search_index import fts_available, search_ids, keyword_search_query, SEARCH_FUSION
+from . import suggest_index
+from . import vector_index
+from . import encoder
+from .user_profiles import apply_interaction, get_profile_vector, PROFILE_INTERACTIONS
 from fastapi.staticfiles import StaticFiles
 from . import auth
 from passlib.context import CryptContext
@@ -42,6 +50,13 @@ async def startup_event():
                 
         # Initialize both main and articles databases
         await init_db()
+
+        # The encoder is otherwise loaded by the first request that needs a fresh embedding
+        if encoder.PRELOAD_ENCODER:
+            asyncio.create_task(encoder.warm_up())
+        asyncio.create_task(suggest_index.warm_up(ArticlesSessionLocal))
+        # Loads the embedding index and builds its IVF index (when enabled) before the first query
+        asyncio.create_task(vector_index.warm_up(ArticlesSessionLocal))
     except Exception as e:
         print(f"Error during startup: {e}")
         raise e
@@ -107,13 +122,39 @@ async def favicon():
     """
     return JSONResponse(status_code=204, content={})
 
+@app.get("/api/health/ready")
+async def readiness():
+    """
+    Reports whether the embedding model is loaded. Feed and search are served
+    either way; only endpoints that embed new text wait for the model.
+    """
+    return {"status": "ok", "encoder_loaded": encoder.is_loaded()}
+
+@app.post("/api/health/warm-up")
+async def warm_up():
+    """Loads the embedding model ahead of traffic that needs it."""
+    await encoder.warm_up()
+    return {"status": "ok", "encoder_loaded": encoder.is_loaded()}
+
+@app.get("/api/encoder/metrics")
+async def encoder_metrics():
+    """Queue depth and batch sizes of the shared encoder service."""
+    return {"encoder_loaded": encoder.is_loaded(), **encoder.encoder_service.metrics()}
+
 @app.get("/search/arxiv")
 async def search_arxiv(
     query: str = "machine learning",
     page: int = 1,
     page_size: int = 10,
+    mode: str = "lexical",
+    fusion: Optional[str] = None,
     db: AsyncSession = Depends(get_articles_db)
 ):
+    if mode not in ("lexical", "hybrid"):
+        raise HTTPException(status_code=400, detail="mode must be 'lexical' or 'hybrid'")
+    fusion = fusion or SEARCH_FUSION
+    if fusion not in ("rrf", "weighted"):
+        raise HTTPException(status_code=400, detail="fusion must be 'rrf' or 'weighted'")
     try:
         # Clean and validate input
         search_terms = [term.strip().lower() for term in query.split() if len(term.strip()) >= 3]
@@ -122,34 +163,31 @@ async def search_arxiv(
 
         # Calculate offset
         offset = (page - 1) * page_size
+
+        # Lexical candidates re-ranked by embedding similarity
+        if mode == "hybrid":
+            ranked_ids = await hybrid_search_ids(query, db, fusion=fusion)
+            articles = await fetch_content_by_ids(ranked_ids[offset:offset + page_size], db)
+            return {
+                "items": format_articles(articles),
+                "page": page,
+                "total": len(ranked_ids),
+                "has_more": (offset + page_size) < len(ranked_ids)
+            }
+
+        # SQLite: bm25-ranked FTS5 lookup, independent of corpus size
+        if await fts_available(db):
+            ids, total = await search_ids(db, query, page_size, offset)
+            articles = await fetch_content_by_ids(ids, db)
+            return {
+                "items": format_articles(articles),
+                "page": page,
+                "total": total,
+                "has_more": (offset + page_size) < total
+            }
         
         # --- Keyword Search with Improved Relevance ---
-        title_conditions = [Content.title.ilike(f'%{term}%') for term in search_terms]
-        abstract_conditions = [Content.abstract.ilike(f'%{term}%') for term in search_terms]
-
-        # Build scoring with higher weight for title matches
-        score_expr = func.coalesce(0, 0)
-        for term in search_terms:
-            title_matches = (func.instr(func.lower(Content.title), term) > 0).cast(Integer) * 3
-            abstract_matches = (func.instr(func.lower(Content.abstract), term) > 0).cast(Integer)
-            score_expr += title_matches + abstract_matches
-
-        base_query = select(
-            Content.id,
-            Content.title,
-            Content.abstract,
-            Content.source,
-            Content.external_id,
-            Content.url,
-            Content.published_date,
-            Content.paper_metadata,
-            score_expr.label("score")
-        ).where(
-            or_(*title_conditions, *abstract_conditions)
-        ).order_by(
-            desc("score"), 
-            desc(Content.published_date)
-        )
+        base_query = keyword_search_query(search_terms)
 
         # Get total count
         count_query = select(func.count()).select_from(base_query.subquery())
@@ -171,6 +209,27 @@ async def search_arxiv(
         print(f"Search error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/search/suggest")
+async def search_suggest(
+    q: str,
+    limit: int = 8,
+    db: AsyncSession = Depends(get_articles_db)
+):
+    """
+    Search-as-you-type completions of `q` from title phrases, author names and
+    category codes, ranked by the number of papers they appear in and the likes
+    and saves of those papers. Served from the in-memory prefix index, so
+    keystrokes don't query the database.
+    """
+    index = await suggest_index.get_suggest_index(db)
+    return {
+        "query": q,
+        "suggestions": [
+            {"text": text, "kind": kind, "count": count}
+            for text, kind, count in index.suggest(q, min(max(limit, 1), 20))
+        ]
+    }
+
 @app.get("/search/core")
 def search_core(query: str, max_results: int = 10):
     """
@@ -213,6 +272,7 @@ async def login_for_access_token(
 async def get_content(
     page: int = 1, 
     limit: int = 10,
+    category: str = "",
     current_user: Optional[User] = Depends(auth.get_current_user),
     db: AsyncSession = Depends(get_articles_db)
 ):
@@ -235,18 +295,27 @@ async def get_content(
             if interacted_content_ids:
                 query = query.where(~Content.id.in_(interacted_content_ids))
         
-        # Add ordering and pagination
-        query = query.order_by(Content.published_date.desc())
-        
-        # Get total count of filtered content
-        count_query = select(func.count()).select_from(query.subquery())
-        total_count = await db.scalar(count_query)
-        
-        # Apply pagination
-        query = query.offset(offset).limit(limit)
-        
-        result = await db.execute(query)
-        contents = result.scalars().all()
+        if category:
+            # Page through the category's ids in memory and load only the page
+            category_index = await get_category_index(db)
+            ordered_ids = category_index.newest_first(parse_categories(category))
+            if current_user and interacted_content_ids:
+                ordered_ids = ordered_ids[~np.isin(ordered_ids, interacted_content_ids)]
+            total_count = len(ordered_ids)
+            contents = await fetch_content_by_ids(ordered_ids[offset:offset + limit].tolist(), db)
+        else:
+            # Add ordering and pagination
+            query = query.order_by(Content.published_date.desc())
+            
+            # Get total count of filtered content
+            count_query = select(func.count()).select_from(query.subquery())
+            total_count = await db.scalar(count_query)
+            
+            # Apply pagination
+            query = query.offset(offset).limit(limit)
+            
+            result = await db.execute(query)
+            contents = result.scalars().all()
         
         return {
             "items": [
@@ -564,6 +633,15 @@ async def create_interaction(
         db.add(new_interaction)
         action = "added"
     
+    # Keep the user's taste vector in step with their likes and saves
+    await db.flush()
+    await apply_interaction(
+        db,
+        current_user.id,
+        interaction.content_id,
+        interaction.interaction_type,
+        added=(action == "added")
+    )
     await db.commit()
     return {"status": "success", "action": action}
 
@@ -774,81 +852,103 @@ async def get_recommendations(
     page: int = 1,
     page_size: int = 10,
     exclude: str = "",
+    cursor: str = "",
+    session: str = "",
+    category: str = "",
     db: AsyncSession = Depends(get_articles_db)
 ):
     try:
-        # Parse excluded content IDs
-        excluded_ids = set(int(id_) for id_ in exclude.split(',') if id_.strip().isdigit())
-        
-        # If user is not authenticated, return latest papers
-        if not current_user:
-            query = select(Content).where(
-                ~Content.id.in_(excluded_ids) if excluded_ids else true()
-            ).order_by(Content.published_date.desc())
-            
-            # Get total count for pagination
-            count_query = select(func.count()).select_from(query.subquery())
-            total = await db.scalar(count_query)
-            
-            # Apply pagination
-            query = query.offset((page - 1) * page_size).limit(page_size)
-            result = await db.execute(query)
-            content = result.scalars().all()
-            
-            return {
-                "items": format_articles(content),
-                "page": page,
-                "total": total,
-                "has_more": ((page - 1) * page_size + len(content)) < total
-            }
-
-        # Get user's liked and bookmarked content
-        liked_query = select(Content).join(
-            Interaction,
-            and_(
-                Interaction.content_id == Content.id,
-                Interaction.user_id == current_user.id,
-                Interaction.interaction_type.in_(['like', 'save'])
-            )
-        )
-        liked_result = await db.execute(liked_query)
-        liked_content = liked_result.scalars().all()
-
-        # Combine excluded IDs with already interacted content
-        all_excluded_ids = excluded_ids.union(set(content.id for content in liked_content))
-
-        if not liked_content:
-            # If no interactions yet, return latest papers
-            query = select(Content).where(
-                ~Content.id.in_(all_excluded_ids) if all_excluded_ids else true()
-            ).order_by(Content.published_date.desc())
-            
-            query = query.offset((page - 1) * page_size).limit(page_size)
-            result = await db.execute(query)
-            content = result.scalars().all()
-            return format_content_response(content, page, page_size)
-
-        # Calculate average embedding from liked/saved content
-        embeddings = [np.array(content.embedding) for content in liked_content if content.embedding]
-        if not embeddings:
-            return format_content_response([], page, page_size)
-
-        avg_embedding = np.mean(embeddings, axis=0).tolist()
-
-        # Get similar content using existing similarity_search function
-        similar_content = await similarity_search(
-            avg_embedding,
-            db,
-            content_ids_to_exclude=list(all_excluded_ids),
-            limit=page_size
-        )
+        # Content already shown in this feed session is tracked in the database,
+        # so any worker can serve the next page
+        session, seen = await seen_sets.load(db, session)
+        # Older clients still send the shown ids explicitly
+        seen.add(int(id_) for id_ in exclude.split(',') if id_.strip().isdigit())
 
-        return format_content_response(similar_content, page, page_size)
+        response = await recommendation_page(current_user, page, page_size, cursor, category, seen, db)
+        await seen_sets.save(db, session, seen)
+        response["session"] = session
+        return response
 
     except Exception as e:
         print(f"Error in recommendations: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+async def recommendation_page(current_user, page, page_size, cursor, category, seen, db):
+    """One page of the feed, skipping and then recording what `seen` already holds."""
+    # Restrict to the requested categories through the in-memory category index
+    category_ids = None
+    if category:
+        category_index = await get_category_index(db)
+        category_ids = category_index.newest_first(parse_categories(category))
+
+    # If user is not authenticated, return latest papers
+    if not current_user:
+        content = await fetch_latest_content(db, seen, page_size, newest_first_ids=category_ids)
+        seen.add(item.id for item in content)
+
+        # Get total count for pagination
+        if category_ids is not None:
+            total = len(category_ids)
+            has_more = bool((~seen.contains(category_ids)).any())
+        else:
+            total = await db.scalar(select(func.count()).select_from(Content))
+            has_more = seen.latest_offset < total
+
+        return {
+            "items": format_articles(content),
+            "page": page,
+            "total": total,
+            "has_more": has_more
+        }
+
+    # Later pages slice the ranking computed for the first one
+    ranking = ranking_cache.get(cursor, current_user.id) if cursor else None
+    if ranking is not None and ranking.category == category:
+        page_ids, has_more = ranking.page(page, page_size)
+        page_ids = [id_ for id_, was_seen in zip(page_ids, seen.contains(page_ids)) if not was_seen]
+        seen.add(page_ids)
+        response = format_content_response(await fetch_content_by_ids(page_ids, db), page, page_size)
+        response.update(has_more=has_more, cursor=cursor)
+        return response
+
+    # Get the ids of the user's liked and bookmarked content
+    liked_query = select(Interaction.content_id).where(
+        and_(
+            Interaction.user_id == current_user.id,
+            Interaction.interaction_type.in_(PROFILE_INTERACTIONS)
+        )
+    )
+    liked_result = await db.execute(liked_query)
+    liked_ids = liked_result.scalars().all()
+
+    if not liked_ids:
+        # If no interactions yet, return latest papers
+        content = await fetch_latest_content(db, seen, page_size, newest_first_ids=category_ids)
+        seen.add(item.id for item in content)
+        return format_content_response(content, page, page_size)
+
+    # Average embedding of liked/saved content, maintained incrementally per user
+    avg_embedding = await get_profile_vector(db, current_user.id)
+    if avg_embedding is None:
+        return format_content_response([], page, page_size)
+
+    # Rank a candidate list once and hand out a cursor for the following pages;
+    # seen and liked papers are masked out of the score vector
+    ranked_ids = await rank_content_ids(
+        avg_embedding,
+        db,
+        content_ids_to_exclude=np.concatenate([seen.ids(), liked_ids]),
+        limit=max(RECOMMENDATION_CANDIDATES, page_size),
+        restrict_to_ids=category_ids
+    )
+    ranking = RankedResults(current_user.id, ranked_ids, first_page=page, category=category)
+    page_ids, has_more = ranking.page(page, page_size)
+    seen.add(page_ids)
+
+    response = format_content_response(await fetch_content_by_ids(page_ids, db), page, page_size)
+    response.update(has_more=has_more, cursor=ranking_cache.put(ranking))
+    return response
+
 def format_content_response(content, page, page_size):
     return {
         "items": [
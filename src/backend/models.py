@@ -1,8 +1,34 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Table, Boolean, JSON, Text
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Table, Boolean, JSON, Text, LargeBinary, Float
 from sqlalchemy.orm import relationship
+from sqlalchemy.types import TypeDecorator
 from datetime import datetime
+import numpy as np
 from .database import Base  # Import Base from database.py
 
+class Float32Vector(TypeDecorator):
+    """
+    Stores an embedding as raw little-endian float32 bytes (4 bytes per dimension)
+    and reads it back as a numpy array without any text parsing.
+    """
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return np.asarray(value, dtype='<f4').tobytes()
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return np.frombuffer(value, dtype='<f4')
+
+    def compare_values(self, x, y):
+        # Arrays don't reduce to a single bool with ==, which the ORM relies on
+        if x is None or y is None:
+            return x is y
+        return np.array_equal(x, y)
+
 # Association table for user interests
 user_interests = Table(
     'user_interests',
@@ -51,7 +77,7 @@ class Content(Base):
     url = Column(String)
     published_date = Column(DateTime)
     paper_metadata = Column(JSON, nullable=True)
-    embedding = Column(JSON, nullable=True)
+    embedding = Column(Float32Vector, nullable=True)
     
     # Relationships
     interactions = relationship("Interaction", back_populates="content")
@@ -73,4 +99,39 @@ class Interaction(Base):
     content = relationship("Content", back_populates="interactions")
 
     def __repr__(self):
-        return f"<Interaction(user_id={self.user_id}, content_id={self.content_id}, type='{self.interaction_type}')>" 
\ No newline at end of file
+        return f"<Interaction(user_id={self.user_id}, content_id={self.content_id}, type='{self.interaction_type}')>"
+
+class UserProfile(Base):
+    __tablename__ = 'user_profiles'
+
+    # Running sum of the embeddings of everything the user liked or saved
+    user_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
+    embedding_sum = Column(Float32Vector, nullable=True)
+    weight = Column(Float, default=0.0)  # Number of contributing interactions (decayed if enabled)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<UserProfile(user_id={self.user_id}, weight={self.weight})>"
+
+class SyncState(Base):
+    __tablename__ = 'sync_state'
+
+    # High-water mark of the incremental arXiv sync, one row per category
+    category = Column(String, primary_key=True)
+    last_published = Column(DateTime)  # Newest publication time stored, naive UTC
+    synced_at = Column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<SyncState(category='{self.category}', last_published={self.last_published})>"
+
+class FeedSession(Base):
+    __tablename__ = 'feed_sessions'
+
+    # Papers already shown in one feed session, shared by every API worker (see seen_sets)
+    token = Column(String, primary_key=True)
+    seen = Column(LargeBinary)  # zlib-compressed bitmap, one bit per content id
+    latest_offset = Column(Integer, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+    def __repr__(self):
+        return f"<FeedSession(token='{self.token}', updated_at={self.updated_at})>"
@@ -0,0 +1,195 @@
+import logging
+import os
+import tempfile
+
+import numpy as np
+
+from .ann_index import save_npz
+
+# Compressed representation scored before the exact re-rank: "", "int8" or "pq"
+EMBEDDING_QUANTIZATION = os.getenv("EMBEDDING_QUANTIZATION", "").lower()
+QUANTIZATION_PATH = os.getenv("QUANTIZATION_PATH", "quantized_embeddings.npz")
+# Number of PQ sub-quantizers; must divide the embedding dimension
+PQ_SUBSPACES = int(os.getenv("PQ_SUBSPACES", 48))
+# Candidates re-ranked with the exact float vectors, as a multiple of the requested limit
+QUANTIZATION_RERANK_FACTOR = int(os.getenv("QUANTIZATION_RERANK_FACTOR", 10))
+
+_CHUNK = 65536
+
+logger = logging.getLogger(__name__)
+
+
+class Int8Quantizer:
+    """
+    Scalar quantization to int8 with one scale per dimension (4x smaller than float32).
+    Queries stay in float and are multiplied by the scales, so scoring is asymmetric.
+    """
+
+    kind = 'int8'
+
+    def __init__(self, scales):
+        self.scales = np.asarray(scales, dtype=np.float32)
+
+    @classmethod
+    def fit(cls, matrix):
+        scales = np.zeros(matrix.shape[1], dtype=np.float32)
+        for start in range(0, len(matrix), _CHUNK):
+            chunk = np.abs(np.asarray(matrix[start:start + _CHUNK]))
+            scales = np.maximum(scales, chunk.max(axis=0))
+        scales[scales == 0] = 1.0
+        return cls(scales / 127.0)
+
+    def encode(self, matrix):
+        codes = np.empty(matrix.shape, dtype=np.int8)
+        for start in range(0, len(matrix), _CHUNK):
+            chunk = np.asarray(matrix[start:start + _CHUNK]) / self.scales
+            codes[start:start + len(chunk)] = np.clip(np.rint(chunk), -127, 127)
+        return codes
+
+    def scores(self, codes, query, rows=None):
+        weighted = (query * self.scales).astype(np.float32)
+        n = len(codes) if rows is None else len(rows)
+        scores = np.empty(n, dtype=np.float32)
+        # Dequantize in chunks so the float copy never exceeds _CHUNK rows
+        for start in range(0, n, _CHUNK):
+            block = codes[start:start + _CHUNK] if rows is None else codes[rows[start:start + _CHUNK]]
+            scores[start:start + len(block)] = block.astype(np.float32) @ weighted
+        return scores
+
+    def state(self):
+        return {'scales': self.scales}
+
+    @property
+    def bytes_per_vector(self):
+        return len(self.scales)
+
+
+class ProductQuantizer:
+    """
+    Product quantization: the vector is split into `m` sub-vectors, each replaced by the
+    index of its nearest of 256 sub-centroids (one byte per sub-vector). Queries are
+    scored with asymmetric distance tables of query-to-centroid inner products.
+    """
+
+    kind = 'pq'
+
+    def __init__(self, codebooks):
+        # codebooks: (m, 256, dim / m)
+        self.codebooks = np.asarray(codebooks, dtype=np.float32)
+
+    @property
+    def m(self):
+        return self.codebooks.shape[0]
+
+    @classmethod
+    def fit(cls, matrix, m: int = PQ_SUBSPACES, sample_size: int = 65536, iterations: int = 15):
+        dim = matrix.shape[1]
+        if dim % m:
+            raise ValueError(f"PQ_SUBSPACES={m} does not divide embedding dimension {dim}")
+        rng = np.random.default_rng(0)
+        sample = np.asarray(matrix[np.sort(rng.choice(len(matrix), min(len(matrix), sample_size), replace=False))])
+        sub_dim = dim // m
+        n_centroids = min(256, len(sample))
+
+        codebooks = np.zeros((m, 256, sub_dim), dtype=np.float32)
+        for j in range(m):
+            codebooks[j, :n_centroids] = _kmeans(sample[:, j * sub_dim:(j + 1) * sub_dim], n_centroids, iterations)
+        return cls(codebooks)
+
+    def encode(self, matrix):
+        sub_dim = self.codebooks.shape[2]
+        codes = np.empty((len(matrix), self.m), dtype=np.uint8)
+        for start in range(0, len(matrix), _CHUNK):
+            chunk = np.asarray(matrix[start:start + _CHUNK], dtype=np.float32)
+            for j in range(self.m):
+                codes[start:start + len(chunk), j] = _nearest(chunk[:, j * sub_dim:(j + 1) * sub_dim], self.codebooks[j])
+        return codes
+
+    def scores(self, codes, query, rows=None):
+        sub_dim = self.codebooks.shape[2]
+        # (m, 256) table of inner products between each query sub-vector and each centroid
+        table = np.einsum('jkd,jd->jk', self.codebooks, query.reshape(self.m, sub_dim))
+        n = len(codes) if rows is None else len(rows)
+        scores = np.empty(n, dtype=np.float32)
+        subspaces = np.arange(self.m)
+        for start in range(0, n, _CHUNK):
+            block = codes[start:start + _CHUNK] if rows is None else codes[rows[start:start + _CHUNK]]
+            scores[start:start + len(block)] = table[subspaces, block].sum(axis=1)
+        return scores
+
+    def state(self):
+        return {'codebooks': self.codebooks}
+
+    @property
+    def bytes_per_vector(self):
+        return self.m
+
+
+def _nearest(vectors, centroids):
+    """Index of the nearest centroid (Euclidean) for each vector."""
+    distances = (centroids ** 2).sum(axis=1) - 2 * vectors @ centroids.T
+    return np.argmin(distances, axis=1)
+
+
+def _kmeans(vectors, k, iterations):
+    rng = np.random.default_rng(0)
+    centroids = vectors[rng.choice(len(vectors), k, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = _nearest(vectors, centroids)
+        counts = np.bincount(assignments, minlength=k)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, vectors)
+        nonempty = counts > 0
+        centroids[nonempty] = sums[nonempty] / counts[nonempty, None]
+    return centroids
+
+
+QUANTIZERS = {'int8': Int8Quantizer, 'pq': ProductQuantizer}
+
+
+def fit_quantizer(kind: str, matrix, **kwargs):
+    if kind not in QUANTIZERS:
+        raise ValueError(f"Unknown quantization '{kind}', expected one of {sorted(QUANTIZERS)}")
+    return QUANTIZERS[kind].fit(matrix, **kwargs)
+
+
+def save(path, quantizer, codes, ids):
+    save_npz(path, kind=quantizer.kind, codes=codes, ids=ids, **quantizer.state())
+
+
+def load(path, kind):
+    """Returns (quantizer, codes, ids) from `path`, or None if missing or of another kind."""
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as data:
+        if str(data['kind']) != kind:
+            return None
+        state = {name: data[name] for name in data.files if name not in ('kind', 'codes', 'ids')}
+        return QUANTIZERS[kind](**state), data['codes'], data['ids']
+
+
+def load_or_fit(ids, matrix, kind: str = EMBEDDING_QUANTIZATION, path: str = QUANTIZATION_PATH):
+    """Returns (quantizer, codes) for `ids`, reusing the persisted codes when they still match."""
+    existing = load(path, kind)
+    if existing is not None and np.array_equal(existing[2], ids):
+        return existing[0], existing[1]
+
+    logger.info("Quantizing %d embeddings (%s)...", len(ids), kind)
+    quantizer = fit_quantizer(kind, matrix)
+    codes = quantizer.encode(matrix)
+    save(path, quantizer, codes, ids)
+    return quantizer, codes
+
+
+def spill_to_disk(matrix, directory: str = None):
+    """
+    Moves a float matrix off the heap into an unlinked temporary file mapped read-only.
+    Once codes exist the floats are only read for the re-rank shortlist, so the OS can
+    page them in on demand and drop them again under memory pressure.
+    """
+    directory = directory or os.path.dirname(os.path.abspath(QUANTIZATION_PATH))
+    with tempfile.NamedTemporaryFile(dir=directory, suffix='.npy') as f:
+        np.save(f, np.ascontiguousarray(matrix, dtype=np.float32))
+        f.flush()
+        # The mapping outlives the directory entry removed when the file closes
+        return np.load(f.name, mmap_mode='r')
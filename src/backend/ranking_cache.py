@@ -0,0 +1,63 @@
+import os
+import secrets
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+# Number of ranked candidates computed per cursor; bounds how far one cursor can scroll
+RECOMMENDATION_CANDIDATES = int(os.getenv("RECOMMENDATION_CANDIDATES", 1000))
+RANKING_CACHE_TTL_SECONDS = float(os.getenv("RANKING_CACHE_TTL_SECONDS", 900))
+RANKING_CACHE_SIZE = int(os.getenv("RANKING_CACHE_SIZE", 2048))
+
+
+class RankedResults:
+    """A ranked list of content ids, paged relative to the page it was computed for."""
+
+    def __init__(self, user_id, ids, first_page: int = 1, category: str = ""):
+        self.user_id = user_id
+        self.ids = np.asarray(ids, dtype=np.int32)
+        self.first_page = first_page
+        # Category filter the ranking was computed under
+        self.category = category
+        self.expires_at = time.monotonic() + RANKING_CACHE_TTL_SECONDS
+
+    def page(self, page: int, page_size: int):
+        """Returns (ids, has_more) for `page`."""
+        start = max(page - self.first_page, 0) * page_size
+        end = start + page_size
+        return self.ids[start:end].tolist(), end < len(self.ids)
+
+
+class RankingCache:
+    """
+    Short-lived, LRU-bounded map from opaque cursors to ranked recommendation lists.
+    Lets later feed pages slice a ranking instead of re-scoring the corpus.
+    """
+
+    def __init__(self, max_entries: int = RANKING_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+
+    def put(self, results: RankedResults) -> str:
+        cursor = secrets.token_urlsafe(16)
+        self._entries[cursor] = results
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return cursor
+
+    def get(self, cursor: str, user_id) -> RankedResults:
+        """Returns the ranking for `cursor` if it exists, has not expired and belongs to `user_id`."""
+        results = self._entries.get(cursor)
+        if results is None:
+            return None
+        if results.expires_at < time.monotonic():
+            del self._entries[cursor]
+            return None
+        if results.user_id != user_id:
+            return None
+        self._entries.move_to_end(cursor)
+        return results
+
+
+ranking_cache = RankingCache()
@@ -0,0 +1,70 @@
+import asyncio
+import argparse
+import time
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+# Use RELATIVE imports.
+from ..database import ARTICLES_DATABASE_URL
+from ..models import Content
+from ..encoder import BACKENDS, EMBEDDING_MODEL, load_model
+
+
+async def load_sample(size):
+    """Titles and abstracts of the newest papers, the same text mix ingest encodes."""
+    engine = create_async_engine(ARTICLES_DATABASE_URL)
+    async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with async_session() as session:
+        result = await session.execute(
+            select(Content.title, Content.abstract).order_by(Content.id.desc()).limit((size + 1) // 2)
+        )
+        rows = result.all()
+    await engine.dispose()
+    texts = [text for row in rows for text in (row.title or "", row.abstract or "")]
+    return texts[:size]
+
+
+def time_backend(model, texts, batch_size, repeats):
+    """Returns (embeddings, best sentences/s over `repeats` runs) after one warm-up batch."""
+    model.encode(texts[:batch_size], batch_size=batch_size)
+    best = 0.0
+    for _ in range(repeats):
+        started = time.perf_counter()
+        embeddings = model.encode(texts, batch_size=batch_size, convert_to_numpy=True, normalize_embeddings=True)
+        best = max(best, len(texts) / (time.perf_counter() - started))
+    return embeddings, best
+
+
+def benchmark_encoders(texts, backends, batch_size=64, repeats=3):
+    print(f"{EMBEDDING_MODEL}: {len(texts)} texts, batch size {batch_size}, best of {repeats}")
+    print(f"{'backend':<12}{'sentences/s':>13}{'speedup':>9}{'mean cos':>10}{'min cos':>9}")
+
+    # Every backend is compared against the fp32 torch vectors
+    baseline, baseline_rate = None, None
+    for backend in ['torch'] + [name for name in backends if name != 'torch']:
+        try:
+            model = load_model(backend)
+        except ImportError as e:
+            print(f"{backend:<12}skipped ({e})")
+            continue
+        embeddings, rate = time_backend(model, texts, batch_size, repeats)
+        if baseline is None:
+            baseline, baseline_rate = embeddings, rate
+        agreement = (embeddings * baseline).sum(axis=1)
+        print(f"{backend:<12}{rate:>13.1f}{rate / baseline_rate:>8.2f}x{agreement.mean():>10.4f}{agreement.min():>9.4f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare encoder backends on throughput and agreement with fp32")
+    parser.add_argument("--backends", nargs="+", choices=sorted(BACKENDS), default=sorted(BACKENDS))
+    parser.add_argument("--sample", type=int, default=1000, help="Number of titles/abstracts to encode")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    texts = asyncio.run(load_sample(args.sample))
+    if not texts:
+        print("No papers in the database. Run populate_db first.")
+    else:
+        benchmark_encoders(texts, args.backends, args.batch_size, args.repeats)
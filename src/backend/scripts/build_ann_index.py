@@ -0,0 +1,35 @@
+import asyncio
+import argparse
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+# Use RELATIVE imports.
+from ..database import ARTICLES_DATABASE_URL
+from ..vector_index import EmbeddingIndex
+from ..ann_index import IVFIndex, ANN_INDEX_PATH
+
+
+async def build_ann_index(n_lists=None, path=ANN_INDEX_PATH):
+    engine = create_async_engine(ARTICLES_DATABASE_URL)
+    async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async with async_session() as session:
+        index = await EmbeddingIndex.from_db(session)
+    await engine.dispose()
+
+    if not len(index):
+        print("No embeddings found. Run generate_embeddings first.")
+        return
+
+    print(f"Training IVF index over {len(index)} embeddings...")
+    ivf = IVFIndex.build(index.ids, index.matrix, n_lists=n_lists)
+    ivf.save(path)
+    print(f"Saved {ivf.n_lists} lists to {path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prebuild the IVF index used when ANN_ENGINE=ivf")
+    parser.add_argument("--lists", type=int, default=None, help="Number of inverted lists (default 4*sqrt(N))")
+    parser.add_argument("--path", default=ANN_INDEX_PATH)
+    args = parser.parse_args()
+    asyncio.run(build_ann_index(args.lists, args.path))
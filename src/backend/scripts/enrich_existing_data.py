@@ -1,77 +1,118 @@
 import asyncio
-import arxiv
+import argparse
+import re
+import time
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy import select, JSON, update
-import sys
-import os
+from sqlalchemy import select, bindparam, func
 
-# Add the parent directory to the Python path
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Use RELATIVE imports.
+from ..models import Content, Base
+from ..database import ARTICLES_DATABASE_URL
+from ..arxiv_feed import ArxivClient, parse_feed, ARXIV_API_URL, ARXIV_CONCURRENCY
 
-# Now import directly from the modules
-from models import Content, Base
-from database import DATABASE_URL, ARTICLES_DATABASE_URL
+# arXiv id in an abs or pdf URL, without the version: 2401.01234, hep-th/9901001
+ARXIV_URL_ID = re.compile(r'arxiv\.org/(?:abs|pdf)/(.+?)(?:v\d+)?(?:\.pdf)?$')
 
-async def enrich_content():
+# Core UPDATE run as one executemany per batch; bind names must not clash with column names
+update_metadata = (
+    Content.__table__.update()
+    .where(Content.__table__.c.id == bindparam('content_id'))
+    .values(paper_metadata=bindparam('metadata'))
+)
+
+
+def arxiv_id_from_url(url):
+    match = ARXIV_URL_ID.search(url or '')
+    return match.group(1) if match else None
+
+
+async def fetch_metadata(client, arxiv_ids):
+    """Looks up a batch of ids in one id_list request; returns {arxiv id: paper_metadata}."""
+    xml_data = await client.query(id_list=','.join(arxiv_ids), max_results=len(arxiv_ids))
+    metadata = {}
+    for paper in parse_feed(xml_data):
+        arxiv_id = arxiv_id_from_url(paper['external_id'])
+        if arxiv_id:
+            metadata[arxiv_id] = paper['paper_metadata']
+    return metadata
+
+
+async def enrich_batch(session, client, rows):
+    """Fetches metadata for one batch of (id, url) rows and applies it with one bulk UPDATE."""
+    ids_by_arxiv_id = {arxiv_id_from_url(row.url): row.id for row in rows}
+    ids_by_arxiv_id.pop(None, None)
+    if not ids_by_arxiv_id:
+        return 0
+    metadata = await fetch_metadata(client, list(ids_by_arxiv_id))
+    updates = [
+        {'content_id': ids_by_arxiv_id[arxiv_id], 'metadata': paper_metadata}
+        for arxiv_id, paper_metadata in metadata.items()
+        if arxiv_id in ids_by_arxiv_id
+    ]
+    if updates:
+        await session.execute(update_metadata, updates)
+        await session.commit()
+    return len(updates)
+
+
+async def enrich_content(batch_size=200, concurrency=ARXIV_CONCURRENCY, base_url=ARXIV_API_URL, dry_run=False):
     engine = create_async_engine(ARTICLES_DATABASE_URL)
-    
+
     # Create tables if they don't exist
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
-    
+
     async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
-    
+    client = ArxivClient(base_url, pool_size=concurrency)
+
     async with async_session() as session:
-        result = await session.execute(
-            select(Content).where(Content.paper_metadata.is_(None))
-        )
-        contents = result.scalars().all()
-        
-        print(f"Found {len(contents)} papers that need metadata enrichment")
-        
-        if not contents:
-            print("No papers need enrichment. Exiting...")
-            return
-            
-        proceed = input("Do you want to proceed with enrichment? (y/n): ")
-        if proceed.lower() != 'y':
-            print("Enrichment cancelled")
+        missing = select(Content.id, Content.url).where(Content.paper_metadata.is_(None))
+        total = await session.scalar(select(func.count()).select_from(missing.subquery()))
+        print(f"Found {total} papers that need metadata enrichment")
+
+        if not total or dry_run:
+            client.close()
+            await engine.dispose()
             return
 
-        client = arxiv.Client()
         enriched_count = 0
-        
-        for content in contents:
-            if content.url and 'arxiv.org' in content.url:
-                arxiv_id = content.url.split('/')[-1]
-                try:
-                    search = arxiv.Search(id_list=[arxiv_id])
-                    results = list(client.results(search))
-                    if results:
-                        paper = results[0]
-                        
-                        # Start a new transaction for each paper
-                        async with session.begin_nested():
-                            await session.execute(
-                                update(Content)
-                                .where(Content.id == content.id)
-                                .values(paper_metadata={
-                                    'authors': [author.name for author in paper.authors],
-                                    'categories': [cat for cat in paper.categories],
-                                    'paper_id': arxiv_id,
-                                    'published_date': paper.published.isoformat()
-                                })
-                            )
-                            await session.commit()
-                        
-                        enriched_count += 1
-                        print(f"Enriched paper ({enriched_count}/{len(contents)}): {content.title}")
-                except Exception as e:
-                    print(f"Error enriching {content.title}: {e}")
-                    continue
+        started = time.perf_counter()
+        last_id = 0
+        while True:
+            # One wave: `concurrency` id_list requests in flight under the shared rate limit
+            result = await session.execute(
+                missing.where(Content.id > last_id).order_by(Content.id).limit(batch_size * concurrency)
+            )
+            rows = result.all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            batches = [rows[start:start + batch_size] for start in range(0, len(rows), batch_size)]
+
+            async def enrich(batch):
+                # Each batch commits in its own session so requests can overlap
+                async with async_session() as batch_session:
+                    try:
+                        return await enrich_batch(batch_session, client, batch)
+                    except Exception as e:
+                        print(f"Error enriching ids {batch[0].id}-{batch[-1].id}: {e}")
+                        await batch_session.rollback()
+                        return 0
+
+            enriched_count += sum(await asyncio.gather(*(enrich(batch) for batch in batches)))
+            rate = enriched_count / (time.perf_counter() - started)
+            print(f"Enriched {enriched_count}/{total} papers ({rate:.1f} papers/s)")
 
         print(f"Database enrichment complete! Enriched {enriched_count} papers")
+    client.close()
+    await engine.dispose()
 
 if __name__ == "__main__":
-    asyncio.run(enrich_content()) 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Fill in paper_metadata for papers stored without it")
+    parser.add_argument("--batch-size", type=int, default=200, help="arXiv ids looked up per API request")
+    parser.add_argument("--concurrency", type=int, default=ARXIV_CONCURRENCY, help="Requests in flight at once")
+    parser.add_argument("--base-url", default=ARXIV_API_URL, help="arXiv API endpoint (e.g. a local stand-in server)")
+    parser.add_argument("--dry-run", action="store_true", help="Only count the papers that need enrichment")
+    args = parser.parse_args()
+    asyncio.run(enrich_content(args.batch_size, args.concurrency, args.base_url, args.dry_run))
@@ -1,7 +1,12 @@
 import asyncio
+import argparse
+import json
+import multiprocessing
+import queue
+import time
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy import select, update
+from sqlalchemy import select, func
 import sys
 import os
 import numpy as np
@@ -11,58 +16,321 @@ import numpy as np
 # Use RELATIVE imports.
 from ..models import Content, Base
 from ..database import ARTICLES_DATABASE_URL
-from ..utils import get_embedding
+from ..encoder import EMBEDDING_MODEL, ENCODER_BACKEND
+from ..embedding_cache import encode_papers
+from ..embedding_store import export_store, EMBEDDING_STORE_DIR
+from ..ingest import update_embedding
 
+# Progress of an interrupted run, picked up again with --resume
+EMBEDDING_CHECKPOINT_PATH = os.getenv("EMBEDDING_CHECKPOINT_PATH", "embedding_checkpoint.json")
 
-async def generate_embeddings():
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_checkpoint(path, checkpoint):
+    """Writes the checkpoint atomically so a kill mid-write never corrupts it."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+
+def pending_filter(reembed):
+    # A re-embed revisits every row; otherwise only rows still missing a vector
+    return [] if reembed else [Content.embedding.is_(None)]
+
+
+async def plan_shards(session, shards, reembed):
+    """Splits the id range of the rows to embed into `shards` contiguous ranges."""
+    low, high = (await session.execute(
+        select(func.min(Content.id), func.max(Content.id)).where(*pending_filter(reembed))
+    )).one()
+    if low is None:
+        return []
+    step = -(-(high - low + 1) // shards)
+    return [
+        {'start': start, 'end': min(start + step - 1, high), 'last_id': start - 1, 'failed': [], 'done': False}
+        for start in range(low, high + 1, step)
+    ]
+
+
+def pending_rows(last_id, end_id, reembed):
+    return (
+        select(Content.id, Content.title, Content.abstract)
+        .where(Content.id > last_id, Content.id <= end_id, *pending_filter(reembed))
+        .order_by(Content.id)
+    )
+
+
+async def read_shard(session, shard, reembed, chunk_size):
+    """
+    Yields (retried, rows) chunks of id-ordered (id, title, abstract) rows left in
+    `shard`: first one chunk per [first id, last id] range an earlier pass failed
+    to embed or write (`retried` is that range), then the rows after last_id.
+    """
+    for retried in list(shard['failed']):
+        # A failed range was one chunk when it failed, so it still fits in one
+        yield retried, (await session.execute(pending_rows(retried[0] - 1, retried[1], reembed))).all()
+    last_id = shard['last_id']
+    while True:
+        rows = (await session.execute(pending_rows(last_id, shard['end'], reembed).limit(chunk_size))).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        yield None, rows
+
+
+def embed_rows(rows, batch_size):
+    ids = [row.id for row in rows]
+    embeddings = encode_papers(
+        [row.title or "" for row in rows],
+        [row.abstract or "" for row in rows],
+        batch_size
+    )
+    return ids, embeddings
+
+
+def shard_worker(index, shard, reembed, batch_size, chunk_size, threads, results):
+    """
+    Worker process: reads and encodes one shard, handing each chunk to the
+    parent, which is the only process that writes to the database. A chunk
+    that fails to encode is reported as its [first id, last id] range and an
+    error message instead of its vectors.
+    """
+    if threads:
+        # Share the cores between workers instead of every model using all of them
+        import torch
+        torch.set_num_threads(threads)
+
+    async def run():
+        engine = create_async_engine(ARTICLES_DATABASE_URL)
+        async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        try:
+            async with async_session() as session:
+                async for retried, rows in read_shard(session, shard, reembed, chunk_size):
+                    if not rows:
+                        results.put((index, retried, [], []))
+                        continue
+                    try:
+                        results.put((index, retried, *embed_rows(rows, batch_size)))
+                    except Exception as e:
+                        results.put((index, retried, [rows[0].id, rows[-1].id], f"{type(e).__name__}: {e}"))
+        finally:
+            await engine.dispose()
+
+    try:
+        asyncio.run(run())
+        results.put((index, None, None, None))
+    except Exception as e:
+        results.put((index, None, None, f"{type(e).__name__}: {e}"))
+
+
+class Progress:
+    def __init__(self):
+        self.total = 0
+        self.started = time.perf_counter()
+
+    def report(self, index, count, chunk_started):
+        self.total += count
+        chunk_rate = count / (time.perf_counter() - chunk_started)
+        overall_rate = self.total / (time.perf_counter() - self.started)
+        print(f"Embedded {self.total} papers (shard {index} chunk {chunk_rate:.1f} papers/s, overall {overall_rate:.1f} papers/s)")
+
+
+async def write_chunk(session, checkpoint, checkpoint_path, index, ids, embeddings):
+    """Writes one chunk in its own transaction, then records it in the checkpoint."""
+    await session.execute(
+        update_embedding,
+        [{'content_id': content_id, 'vector': embedding} for content_id, embedding in zip(ids, embeddings)]
+    )
+    await session.commit()
+    shard = checkpoint['shards'][index]
+    # A retried range lies behind the sweep; only the sweep moves last_id
+    shard['last_id'] = max(shard['last_id'], ids[-1])
+    save_checkpoint(checkpoint_path, checkpoint)
+
+
+def settle_chunk(checkpoint, checkpoint_path, index, retried, id_range, ok):
+    """
+    Keeps the shard's failed ranges in step with one chunk's outcome: a retried
+    range that succeeded is dropped, a new failure is recorded for --resume.
+    """
+    shard = checkpoint['shards'][index]
+    if ok and retried in shard['failed']:
+        shard['failed'].remove(retried)
+    elif not ok and retried is None:
+        shard['failed'].append(id_range)
+        # The sweep moves on; the range is retried from the failed list
+        shard['last_id'] = max(shard['last_id'], id_range[1])
+    else:
+        return
+    save_checkpoint(checkpoint_path, checkpoint)
+
+
+async def write_or_skip(session, checkpoint, checkpoint_path, index, ids, embeddings, retried=None):
+    """write_chunk(), rolling back and recording a chunk that fails instead of aborting the run."""
+    try:
+        if ids:
+            await write_chunk(session, checkpoint, checkpoint_path, index, ids, embeddings)
+        ok = True
+    except Exception as e:
+        print(f"Error writing embeddings for ids {ids[0]}-{ids[-1]}: {e}")
+        await session.rollback()  # Rollback if error
+        ok = False
+    settle_chunk(checkpoint, checkpoint_path, index, retried, [ids[0], ids[-1]] if ids else retried, ok)
+    return ok
+
+
+async def run_inline(session, checkpoint, checkpoint_path, batch_size, chunk_size, progress):
+    """Single shard: read, encode and write in this process."""
+    shard = checkpoint['shards'][0]
+    async for retried, rows in read_shard(session, shard, checkpoint['reembed'], chunk_size):
+        chunk_started = time.perf_counter()
+        if not rows:
+            settle_chunk(checkpoint, checkpoint_path, 0, retried, retried, True)
+            continue
+        try:
+            ids, embeddings = embed_rows(rows, batch_size)
+        except Exception as e:
+            # Recorded in the checkpoint and retried by --resume
+            print(f"Error generating embeddings for ids {rows[0].id}-{rows[-1].id}: {e}")
+            settle_chunk(checkpoint, checkpoint_path, 0, retried, [rows[0].id, rows[-1].id], False)
+            continue
+        if await write_or_skip(session, checkpoint, checkpoint_path, 0, ids, embeddings, retried):
+            progress.report(0, len(ids), chunk_started)
+    shard['done'] = not shard['failed']
+    save_checkpoint(checkpoint_path, checkpoint)
+
+
+async def run_sharded(session, checkpoint, checkpoint_path, batch_size, chunk_size, progress):
+    """
+    One encoder process per unfinished shard. Workers only read; their chunks come
+    back over a bounded queue and are written here, so SQLite sees a single writer
+    and workers block instead of piling up results when the writer falls behind.
+    """
+    context = multiprocessing.get_context("spawn")
+    pending = [i for i, shard in enumerate(checkpoint['shards']) if not shard['done']]
+    results = context.Queue(maxsize=2 * len(pending))
+    threads = max(1, (os.cpu_count() or 1) // len(pending))
+    workers = [
+        context.Process(
+            target=shard_worker,
+            args=(i, checkpoint['shards'][i], checkpoint['reembed'], batch_size, chunk_size, threads, results),
+            daemon=True
+        )
+        for i in pending
+    ]
+    for worker in workers:
+        worker.start()
+
+    loop = asyncio.get_running_loop()
+    running = set(pending)
+    failed = []
+    chunk_started = time.perf_counter()
+    while running:
+        try:
+            index, retried, ids, embeddings = await loop.run_in_executor(None, results.get, True, 5)
+        except queue.Empty:
+            if not any(worker.is_alive() for worker in workers):
+                # A worker died without reporting (e.g. killed by the OOM killer)
+                failed.extend(sorted(running))
+                break
+            continue
+        if ids is None:
+            running.discard(index)
+            if embeddings is None:
+                checkpoint['shards'][index]['done'] = not checkpoint['shards'][index]['failed']
+                save_checkpoint(checkpoint_path, checkpoint)
+            else:
+                print(f"Shard {index} failed: {embeddings}")
+                failed.append(index)
+            continue
+        if isinstance(embeddings, str):
+            print(f"Error generating embeddings for ids {ids[0]}-{ids[-1]}: {embeddings}")
+            settle_chunk(checkpoint, checkpoint_path, index, retried, ids, False)
+        elif await write_or_skip(session, checkpoint, checkpoint_path, index, ids, embeddings, retried) and ids:
+            progress.report(index, len(ids), chunk_started)
+        chunk_started = time.perf_counter()
+
+    for worker in workers:
+        worker.join()
+    if failed:
+        print(f"Shards {failed} did not finish; rerun with --resume to continue them")
+
+
+async def generate_embeddings(batch_size=64, chunk_size=1000, shards=1, resume=False, reembed=False,
+                              checkpoint_path=EMBEDDING_CHECKPOINT_PATH):
     engine = create_async_engine(ARTICLES_DATABASE_URL)
 
     async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
     async with async_session() as session:
-        # Get all content items that don't have an embedding
-        result = await session.execute(
-            select(Content).where(Content.embedding.is_(None))
-        )
-        contents = result.scalars().all()
+        checkpoint = load_checkpoint(checkpoint_path) if resume else None
+        if checkpoint is not None:
+            if checkpoint['model'] != EMBEDDING_MODEL:
+                print(f"Checkpoint was written for model {checkpoint['model']}, not {EMBEDDING_MODEL}. Exiting...")
+                await engine.dispose()
+                return
+            # Checkpoints written before the backend was recorded were all torch
+            if checkpoint.get('backend', 'torch') != ENCODER_BACKEND:
+                print(f"Checkpoint was written for encoder backend {checkpoint.get('backend', 'torch')}, "
+                      f"not {ENCODER_BACKEND}. Exiting...")
+                await engine.dispose()
+                return
+            for shard in checkpoint['shards']:
+                # Checkpoints written before failed ranges were recorded
+                shard.setdefault('failed', [])
+            done = sum(shard['last_id'] - shard['start'] + 1 for shard in checkpoint['shards'])
+            print(f"Resuming {len(checkpoint['shards'])} shard(s) from {checkpoint_path} ({done} ids already covered)")
+        else:
+            checkpoint = {
+                'model': EMBEDDING_MODEL,
+                'backend': ENCODER_BACKEND,
+                'reembed': reembed,
+                'shards': await plan_shards(session, shards, reembed)
+            }
+            if not checkpoint['shards']:
+                print("No papers need embedding generation. Exiting...")
+                await engine.dispose()
+                return
+            save_checkpoint(checkpoint_path, checkpoint)
 
-        print(f"Found {len(contents)} papers without embeddings")
+        progress = Progress()
+        if len(checkpoint['shards']) == 1:
+            await run_inline(session, checkpoint, checkpoint_path, batch_size, chunk_size, progress)
+        else:
+            await run_sharded(session, checkpoint, checkpoint_path, batch_size, chunk_size, progress)
 
-        if not contents:
-            print("No papers need embedding generation. Exiting...")
+        if not all(shard['done'] for shard in checkpoint['shards']):
+            failed = [id_range for shard in checkpoint['shards'] for id_range in shard['failed']]
+            if failed:
+                print(f"Embedding failed for id ranges {failed}; rerun with --resume to retry them")
+            await engine.dispose()
             return
+        os.remove(checkpoint_path)
+        print(f"Embedding generation complete: {progress.total} papers in {time.perf_counter() - progress.started:.1f}s")
 
-        for content in contents:
-            # Store the title *before* any potential exceptions
-            content_title = content.title
-            try:
-                # Combine title and abstract embeddings (simple average)
-                title_embedding = await get_embedding(content.title, session)
-                abstract_embedding = await get_embedding(content.abstract, session)
-                if title_embedding is None or abstract_embedding is None:
-                    print(f"Skipping {content_title} due to missing embedding (or duplicate title/abstract).")
-                    continue
-
-                combined_embedding = ((np.array(title_embedding) + np.array(abstract_embedding)) / 2).tolist()
-
-                # Update the content item with the combined embedding
-                await session.execute(
-                    update(Content)
-                    .where(Content.id == content.id)
-                    .values(embedding=combined_embedding)
-                )
-                await session.commit()  # Commit after each update
-                print(f"Generated embedding for: {content_title}")
-
-            except Exception as e:
-                # Use the stored title
-                print(f"Error generating embedding for {content_title}: {e}")
-                await session.rollback()  # Rollback if error
-                continue
-
-        print("Embedding generation complete.")
+        if progress.total:
+            # Publish the new vectors to the shared memory-mapped store read by the API workers
+            generation = await export_store(session)
+            if generation:
+                print(f"Wrote embedding store generation {generation} to {EMBEDDING_STORE_DIR}")
     await engine.dispose()
 
 
 if __name__ == "__main__":
-    asyncio.run(generate_embeddings()) 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Embed papers that have no embedding yet")
+    parser.add_argument("--batch-size", type=int, default=64, help="Sentences per model.encode batch")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Papers read, encoded and committed together")
+    parser.add_argument("--shards", type=int, default=1, help="Split the id range across this many encoder processes")
+    parser.add_argument("--resume", action="store_true", help="Continue the run recorded in the checkpoint file")
+    parser.add_argument("--reembed", action="store_true", help="Re-embed every paper, e.g. after changing EMBEDDING_MODEL")
+    parser.add_argument("--checkpoint", default=EMBEDDING_CHECKPOINT_PATH, help="Checkpoint file path")
+    args = parser.parse_args()
+    asyncio.run(generate_embeddings(
+        args.batch_size, args.chunk_size, args.shards, args.resume, args.reembed, args.checkpoint
+    ))
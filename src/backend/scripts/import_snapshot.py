@@ -0,0 +1,150 @@
+import asyncio
+import argparse
+import gzip
+import json
+import os
+import time
+from email.utils import parsedate_to_datetime
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+# Use RELATIVE imports.
+from ..models import Base
+from ..database import ARTICLES_DATABASE_URL
+from ..ingest import bulk_insert_papers, insert_and_embed, embed_papers
+from ..embedding_store import export_store, EMBEDDING_STORE_DIR
+
+
+def snapshot_record_to_paper(record):
+    """
+    Maps one record of the arXiv metadata snapshot (one JSON object per line) to the
+    paper dict stored as Content, with the same external_id/url scheme as the API.
+    """
+    versions = record.get('versions') or [{'version': 'v1'}]
+    latest = versions[-1]['version']
+    created = versions[0].get('created')
+    published = parsedate_to_datetime(created) if created else None
+    paper_id = f"{record['id']}{latest}"
+
+    if record.get('authors_parsed'):
+        # [last, first, suffix] -> "first last suffix"
+        authors = [' '.join(part for part in (first, last, *suffix) if part)
+                   for last, first, *suffix in record['authors_parsed']]
+    else:
+        authors = [name.strip() for name in (record.get('authors') or '').split(',') if name.strip()]
+
+    return {
+        'title': ' '.join((record.get('title') or '').split()),
+        'abstract': (record.get('abstract') or '').strip(),
+        'url': f"http://arxiv.org/pdf/{paper_id}",
+        'external_id': f"http://arxiv.org/abs/{paper_id}",
+        'source': 'arxiv',
+        'published_date': published,
+        'paper_metadata': {
+            'authors': authors,
+            'categories': (record.get('categories') or '').split(),
+            'paper_id': paper_id,
+            'published_date': published.isoformat() if published else None
+        }
+    }
+
+
+def open_snapshot(path):
+    return gzip.open(path, 'rb') if path.endswith('.gz') else open(path, 'rb')
+
+
+def read_progress(path):
+    if not os.path.exists(path):
+        return {'offset': 0, 'records': 0, 'inserted': 0}
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_progress(path, progress):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(progress, f)
+    os.replace(tmp_path, path)
+
+
+def read_batches(snapshot, offset, batch_size, categories):
+    """
+    Yields (papers, end_offset) batches from `offset` on, one line at a time so
+    memory stays constant. `end_offset` is where the next batch starts.
+    """
+    snapshot.seek(offset)
+    batch = []
+    for line in snapshot:
+        offset += len(line)
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        if categories and not any(code.split('.')[0] in categories or code in categories
+                                  for code in record.get('categories', '').split()):
+            continue
+        batch.append(snapshot_record_to_paper(record))
+        if len(batch) >= batch_size:
+            yield batch, offset
+            batch = []
+    yield batch, offset
+
+
+async def import_snapshot(path, batch_size=5000, embed=False, resume=False, categories=None):
+    progress_path = f"{path}.progress"
+    progress = read_progress(progress_path) if resume else {'offset': 0, 'records': 0, 'inserted': 0}
+    if progress['offset']:
+        print(f"Resuming at byte {progress['offset']} ({progress['records']} records already read)")
+
+    engine = create_async_engine(ARTICLES_DATABASE_URL)
+    async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    started = time.perf_counter()
+    records = inserted = 0
+    async with async_session() as session:
+        with open_snapshot(path) as snapshot:
+            for papers, offset in read_batches(snapshot, progress['offset'], batch_size, categories):
+                read = len(papers)
+                if embed:
+                    # Only the papers the insert reports as new are embedded
+                    stored_ids = await insert_and_embed(session, papers, embed_papers)
+                else:
+                    stored_ids = await bulk_insert_papers(session, papers)
+
+                # Progress only moves past a batch once it is committed
+                records += read
+                inserted += len(stored_ids)
+                progress = {
+                    'offset': offset,
+                    'records': progress['records'] + read,
+                    'inserted': progress['inserted'] + len(stored_ids)
+                }
+                write_progress(progress_path, progress)
+                elapsed = time.perf_counter() - started
+                print(f"Read {progress['records']} records, inserted {progress['inserted']} "
+                      f"({records / elapsed:.0f} records/s, {inserted / elapsed:.0f} inserts/s)")
+
+        if embed and inserted:
+            # Publish the new vectors to the shared memory-mapped store read by the API workers
+            generation = await export_store(session)
+            if generation:
+                print(f"Wrote embedding store generation {generation} to {EMBEDDING_STORE_DIR}")
+    await engine.dispose()
+
+    if os.path.exists(progress_path):
+        os.remove(progress_path)
+    print(f"Import complete: {inserted} papers inserted in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import papers from a local arXiv metadata snapshot (JSON lines)")
+    parser.add_argument("path", help="Snapshot file, e.g. arxiv-metadata-oai-snapshot.json (or .json.gz)")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Records inserted per transaction")
+    parser.add_argument("--embed", action="store_true", help="Embed papers inline instead of with generate_embeddings")
+    parser.add_argument("--resume", action="store_true", help="Continue from the progress file of an interrupted import")
+    parser.add_argument("--categories", nargs="+", help="Only import these archives or categories (e.g. cs stat.ML)")
+    args = parser.parse_args()
+    asyncio.run(import_snapshot(args.path, args.batch_size, args.embed, args.resume,
+                                set(args.categories) if args.categories else None))
@@ -1,5 +1,5 @@
 import asyncio
-import arxiv
+import argparse
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy import select
@@ -13,6 +13,10 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 # Use relative imports instead
 from ..models import Content, Base
 from ..database import DATABASE_URL, ARTICLES_DATABASE_URL
+from ..arxiv_feed import ArxivClient, crawl, ARXIV_API_URL, ARXIV_CONCURRENCY
+from ..ingest import IngestPipeline, bulk_insert_papers
+from ..embedding_store import export_store
+from ..sync_state import load_marks, save_marks, advance
 
 # Complete arXiv categories taxonomy
 ARXIV_CATEGORIES = {
@@ -200,88 +204,125 @@ ARXIV_CATEGORIES = {
     ]
 }
 
-async def fetch_arxiv_papers(max_results=50):
-    client = arxiv.Client()
+def category_codes():
+    """
+    Flattens ARXIV_CATEGORIES into query codes: 'cs' + 'LG' -> 'cs.LG',
+    'hep' + '-ex' -> 'hep-ex', and archives without subcategories as-is.
+    """
+    codes = []
+    for main_cat, subcats in ARXIV_CATEGORIES.items():
+        if not subcats:
+            codes.append(main_cat)
+        for subcat in subcats:
+            codes.append(f"{main_cat}{subcat}" if subcat.startswith('-') else f"{main_cat}.{subcat}")
+    return codes
+
+async def fetch_arxiv_papers(max_results=50, concurrency=ARXIV_CONCURRENCY, base_url=ARXIV_API_URL, marks=None):
+    """
+    Fetches the newest papers of every category. Categories with a sync mark in
+    `marks` only fetch papers published at or after it; the marks are advanced in place.
+    """
     # Use UTC timezone for consistency with arXiv's dates
     date_filter = datetime.now().astimezone().replace(microsecond=0) - timedelta(days=3000)
     
-    # First, get all existing paper IDs from the database
+    papers = {}
+    new_marks = {}
+
+    async def collect(category, results):
+        for paper in results:
+            advance(new_marks, category, paper['published_date'])
+            # Skip papers already fetched under another category; stored ones are skipped on insert
+            if paper['external_id'] in papers:
+                continue
+            if paper['published_date'] > date_filter:
+                papers[paper['external_id']] = paper
+
+    client = ArxivClient(base_url, pool_size=concurrency)
+    try:
+        await crawl(category_codes(), max_results, concurrency, client, on_papers=collect, marks=marks)
+    finally:
+        client.close()
+
+    if marks is not None:
+        for category, published in new_marks.items():
+            advance(marks, category, published)
+    return list(papers.values())
+
+async def store_papers(papers):
     engine = create_async_engine(ARTICLES_DATABASE_URL)
     async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
     
-    async with async_session() as session:
-        existing_papers_query = select(Content.external_id)
-        result = await session.execute(existing_papers_query)
-        existing_paper_ids = {paper[0] for paper in result.fetchall()}
-    
-    papers = []
-    for main_cat, subcats in ARXIV_CATEGORIES.items():
-        for subcat in subcats:
-            category = f"{main_cat}.{subcat}" if main_cat != subcat else main_cat
-            search = arxiv.Search(
-                query=f"cat:{category}",
-                max_results=max_results,
-                sort_by=arxiv.SortCriterion.SubmittedDate
-            )
-            
-            results = list(client.results(search))
-            for paper in results:
-                # Skip if paper already exists in database
-                if paper.entry_id in existing_paper_ids:
-                    print(f"Skipping existing paper: {paper.title}")
-                    continue
-                    
-                # Both dates are now timezone-aware for comparison
-                if paper.published > date_filter:
-                    papers.append({
-                        'title': paper.title,
-                        'abstract': paper.summary,
-                        'url': paper.pdf_url,
-                        'external_id': paper.entry_id,
-                        'source': 'arxiv',
-                        'published_date': paper.published,
-                        'paper_metadata': {
-                            'authors': [author.name for author in paper.authors],
-                            'categories': [cat for cat in paper.categories],
-                            'paper_id': paper.entry_id.split('/')[-1],
-                            'published_date': paper.published.isoformat()
-                        }
-                    })
-            print(f"Fetched {len(results)} new papers from {category}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
     
-    return papers
+    async with async_session() as session:
+        stored_ids = await bulk_insert_papers(session, papers)
+    await engine.dispose()
+    print(f"Stored {len(stored_ids)} new papers")
 
-async def store_papers(papers):
+async def read_marks(full=False):
+    """Sync marks to resume from, or None for a full refresh of the newest papers."""
+    if full:
+        return None
     engine = create_async_engine(ARTICLES_DATABASE_URL)
     async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
-    
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
-    
     async with async_session() as session:
-        for paper in papers:
-            existing = await session.execute(
-                select(Content).where(Content.external_id == paper['external_id'])
-            )
-            if not existing.scalar_one_or_none():
-                content = Content(
-                    title=paper['title'],
-                    abstract=paper['abstract'],
-                    url=paper['url'],
-                    external_id=paper['external_id'],
-                    source=paper['source'],
-                    published_date=paper['published_date'],
-                    paper_metadata=paper['paper_metadata']
-                )
-                session.add(content)
-        
-        await session.commit()
+        marks = await load_marks(session)
+    await engine.dispose()
+    print(f"Incremental sync: {len(marks)} categories have a high-water mark")
+    return marks
+
+async def write_marks(marks):
+    engine = create_async_engine(ARTICLES_DATABASE_URL)
+    async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with async_session() as session:
+        await save_marks(session, marks)
+    await engine.dispose()
+
+async def stream_papers(max_results=50, concurrency=ARXIV_CONCURRENCY, base_url=ARXIV_API_URL, embed=True, full=False):
+    """Fetches, embeds and stores in one streaming pass instead of populate + generate_embeddings."""
+    marks = await read_marks(full)
+    engine = create_async_engine(ARTICLES_DATABASE_URL)
+    async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    pipeline = IngestPipeline(async_session, ArxivClient(base_url, pool_size=concurrency), concurrency, embed=embed)
+    try:
+        stored_ids = await pipeline.run(category_codes(), max_results, marks=marks if marks is not None else {})
+    finally:
+        pipeline.client.close()
+
+    if embed and stored_ids:
+        # Publish the new vectors to the shared memory-mapped store read by the API workers
+        async with async_session() as session:
+            await export_store(session)
+    await engine.dispose()
+    print(f"Stored {len(stored_ids)} new papers")
 
-async def main():
-    papers = await fetch_arxiv_papers()
+async def main(max_results=50, concurrency=ARXIV_CONCURRENCY, base_url=ARXIV_API_URL, full=False):
+    marks = await read_marks(full)
+    sync_marks = marks if marks is not None else {}
+    papers = await fetch_arxiv_papers(max_results, concurrency, base_url, sync_marks)
     print(f"Fetched {len(papers)} papers")
     await store_papers(papers)
+    # Only now that the papers are committed may the marks move past them
+    await write_marks(sync_marks)
     print("Database population complete!")
 
 if __name__ == "__main__":
-    asyncio.run(main()) 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Fetch the newest papers of every arXiv category")
+    parser.add_argument("--max-results", type=int, default=50, help="Papers fetched per category on its first sync")
+    parser.add_argument("--concurrency", type=int, default=ARXIV_CONCURRENCY, help="Categories fetched in parallel")
+    parser.add_argument("--base-url", default=ARXIV_API_URL, help="arXiv API endpoint (e.g. a local stand-in server)")
+    parser.add_argument("--stream", action="store_true", help="Store and embed papers as they arrive (fetch -> parse -> write -> embed)")
+    parser.add_argument("--no-embed", action="store_true", help="With --stream, leave embeddings to generate_embeddings")
+    parser.add_argument("--full", action="store_true", help="Ignore the sync marks and refetch the newest --max-results of every category")
+    args = parser.parse_args()
+    if args.stream:
+        asyncio.run(stream_papers(args.max_results, args.concurrency, args.base_url, not args.no_embed, args.full))
+    else:
+        asyncio.run(main(args.max_results, args.concurrency, args.base_url, args.full))
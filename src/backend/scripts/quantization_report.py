@@ -0,0 +1,73 @@
+import asyncio
+import argparse
+import time
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+# Use RELATIVE imports.
+from ..database import ARTICLES_DATABASE_URL
+from ..vector_index import EmbeddingIndex, top_k
+from ..quantization import fit_quantizer
+
+
+def evaluate(quantizer, codes, matrix, queries, exact, k, rerank_factor):
+    """Returns (recall@k, ms per query) for one quantizer and re-rank depth."""
+    positions = np.arange(len(matrix))
+    hits = 0
+    started = time.perf_counter()
+    for query, truth in zip(queries, exact):
+        shortlist, _ = top_k(positions, quantizer.scores(codes, query), k * rerank_factor)
+        if rerank_factor > 1:
+            shortlist = np.sort(shortlist)
+            shortlist, _ = top_k(shortlist, matrix[shortlist] @ query, k)
+        hits += len(np.intersect1d(shortlist[:k], truth))
+    elapsed_ms = (time.perf_counter() - started) * 1000 / len(queries)
+    return hits / (len(queries) * k), elapsed_ms
+
+
+async def quantization_report(n_queries=200, k=10, rerank_factors=(1, 10)):
+    engine = create_async_engine(ARTICLES_DATABASE_URL)
+    async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async with async_session() as session:
+        index = await EmbeddingIndex.from_db(session)
+    await engine.dispose()
+
+    index.compact()
+    matrix = index.matrix
+    n, dim = matrix.shape if len(index) else (0, 0)
+    if n <= k:
+        print("Not enough embeddings for a report. Run generate_embeddings first.")
+        return
+
+    # Use stored papers as queries; exact float search is the ground truth
+    rng = np.random.default_rng(0)
+    queries = np.asarray(matrix[rng.choice(n, min(n_queries, n), replace=False)])
+    positions = np.arange(n)
+    started = time.perf_counter()
+    exact = [top_k(positions, matrix @ query, k)[0] for query in queries]
+    float_ms = (time.perf_counter() - started) * 1000 / len(queries)
+
+    print(f"{n} embeddings, {dim} dimensions, {len(queries)} queries, recall@{k}")
+    print(f"{'setting':<12}{'bytes/vec':>10}{'total MB':>10}{'re-rank':>9}{'recall':>8}{'ms/query':>10}")
+    print(f"{'float32':<12}{dim * 4:>10}{n * dim * 4 / 2**20:>10.1f}{'-':>9}{1.0:>8.3f}{float_ms:>10.2f}")
+
+    settings = [('int8', 'int8', {})]
+    settings += [(f'pq{m}', 'pq', {'m': m}) for m in (8, 16, 32, 48, 96) if dim % m == 0 and m < dim]
+    for name, kind, kwargs in settings:
+        quantizer = fit_quantizer(kind, matrix, **kwargs)
+        codes = quantizer.encode(matrix)
+        total_mb = codes.nbytes / 2**20
+        for factor in rerank_factors:
+            recall, ms = evaluate(quantizer, codes, matrix, queries, exact, k, factor)
+            rerank = f"{factor}x" if factor > 1 else "none"
+            print(f"{name:<12}{quantizer.bytes_per_vector:>10}{total_mb:>10.1f}{rerank:>9}{recall:>8.3f}{ms:>10.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure recall vs memory of the embedding quantization settings")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(quantization_report(args.queries, args.k))
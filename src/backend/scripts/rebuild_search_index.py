@@ -0,0 +1,30 @@
+import asyncio
+import time
+from sqlalchemy.ext.asyncio import create_async_engine
+
+# Use RELATIVE imports.
+from ..models import Base
+from ..database import ARTICLES_DATABASE_URL
+from ..search_index import create_fts, rebuild_fts
+
+
+async def rebuild_search_index():
+    engine = create_async_engine(ARTICLES_DATABASE_URL)
+    if engine.dialect.name != 'sqlite':
+        print("The full-text index is SQLite-only; other databases use the ILIKE search. Exiting...")
+        await engine.dispose()
+        return
+
+    started = time.perf_counter()
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        # create_fts indexes everything when the table is new; otherwise rebuild from scratch
+        if not await conn.run_sync(create_fts):
+            await conn.run_sync(rebuild_fts)
+        total = (await conn.exec_driver_sql("SELECT count(*) FROM content_fts")).scalar()
+    await engine.dispose()
+    print(f"Indexed {total} papers for full-text search in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    asyncio.run(rebuild_search_index())
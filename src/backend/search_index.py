@@ -0,0 +1,234 @@
+import os
+import re
+import time
+
+import numpy as np
+from sqlalchemy import text, select, func, or_, desc, Integer
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import Content
+from .vector_index import INDEX_REFRESH_SECONDS
+
+# bm25 column weights: title, abstract, authors, categories
+FTS_WEIGHTS = (5.0, 1.0, 2.0, 1.0)
+# Hybrid search: lexical candidates re-ranked by embedding similarity
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", 300))
+# "rrf" (reciprocal-rank fusion) or "weighted" (weighted sum of min-max normalized scores)
+SEARCH_FUSION = os.getenv("SEARCH_FUSION", "rrf").lower()
+# Share of the fused score given to the semantic side, between 0 and 1
+SEARCH_SEMANTIC_WEIGHT = float(os.getenv("SEARCH_SEMANTIC_WEIGHT", 0.5))
+RRF_K = int(os.getenv("RRF_K", 60))
+
+# Full-text index over content, keyed by content.id. Triggers keep it in sync with every
+# write path (ORM, bulk upserts, metadata enrichment); embedding-only updates don't touch it.
+# Created by migration 5e2f8a6b1c90 (which keeps its own copy of this DDL) or
+# scripts/rebuild_search_index.py, never at API startup.
+FTS_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS content_fts USING fts5(
+        title, abstract, authors, categories,
+        tokenize = 'porter unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS content_fts_insert AFTER INSERT ON content BEGIN
+        INSERT INTO content_fts (rowid, title, abstract, authors, categories) VALUES (
+            new.id, new.title, new.abstract,
+            (SELECT group_concat(value, ' ') FROM json_each(new.paper_metadata, '$.authors')),
+            (SELECT group_concat(value, ' ') FROM json_each(new.paper_metadata, '$.categories'))
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS content_fts_update AFTER UPDATE OF title, abstract, paper_metadata ON content BEGIN
+        DELETE FROM content_fts WHERE rowid = old.id;
+        INSERT INTO content_fts (rowid, title, abstract, authors, categories) VALUES (
+            new.id, new.title, new.abstract,
+            (SELECT group_concat(value, ' ') FROM json_each(new.paper_metadata, '$.authors')),
+            (SELECT group_concat(value, ' ') FROM json_each(new.paper_metadata, '$.categories'))
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS content_fts_delete AFTER DELETE ON content BEGIN
+        DELETE FROM content_fts WHERE rowid = old.id;
+    END
+    """,
+]
+
+FTS_REBUILD = [
+    "DELETE FROM content_fts",
+    """
+    INSERT INTO content_fts (rowid, title, abstract, authors, categories)
+    SELECT c.id, c.title, c.abstract,
+        (SELECT group_concat(value, ' ') FROM json_each(c.paper_metadata, '$.authors')),
+        (SELECT group_concat(value, ' ') FROM json_each(c.paper_metadata, '$.categories'))
+    FROM content c
+    """,
+]
+
+# Databases known to have the index, and when the others were last checked
+_available = set()
+_checked_at = {}
+
+
+def fts_exists(connection) -> bool:
+    """Whether the index table exists (sync connection, e.g. via run_sync)."""
+    return connection.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'content_fts'"
+    ).first() is not None
+
+
+def create_fts(connection):
+    """Creates the index and its triggers (sync connection, e.g. via run_sync); True if newly created."""
+    exists = fts_exists(connection)
+    for statement in FTS_DDL:
+        connection.exec_driver_sql(statement)
+    if not exists:
+        rebuild_fts(connection)
+    return not exists
+
+
+def rebuild_fts(connection):
+    """Re-indexes every paper from the content table."""
+    for statement in FTS_REBUILD:
+        connection.exec_driver_sql(statement)
+
+
+async def fts_available(db: AsyncSession) -> bool:
+    """
+    Whether this database has the FTS5 index (SQLite only; other databases fall back).
+    A missing index is looked for again every INDEX_REFRESH_SECONDS, so running the
+    migration or rebuild script switches running workers over without a restart.
+    """
+    connection = await db.connection()
+    if connection.dialect.name != 'sqlite':
+        return False
+    url = str(connection.engine.url)
+    if url in _available:
+        return True
+    if time.monotonic() - _checked_at.get(url, float('-inf')) < INDEX_REFRESH_SECONDS:
+        return False
+    _checked_at[url] = time.monotonic()
+    result = await db.execute(text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'content_fts'"
+    ))
+    if result.first() is None:
+        return False
+    _available.add(url)
+    return True
+
+
+def match_expression(query: str, min_length: int = 3):
+    """
+    Turns free text into an FTS5 MATCH expression: each word quoted (so user input
+    can't inject FTS syntax) and OR-ed, leaving bm25 to rank papers matching more terms.
+    """
+    terms = [term for term in re.findall(r'\w+', query.lower()) if len(term) >= min_length]
+    return ' OR '.join(f'"{term}"' for term in terms)
+
+
+async def search_scored(db: AsyncSession, query: str, limit: int, offset: int = 0):
+    """Returns (ids, scores) ranked by bm25 with title weighting; higher scores are better."""
+    expression = match_expression(query)
+    if not expression:
+        return [], []
+    weights = ', '.join(str(weight) for weight in FTS_WEIGHTS)
+    result = await db.execute(
+        text(
+            f"SELECT rowid, -bm25(content_fts, {weights}) AS score FROM content_fts "
+            f"WHERE content_fts MATCH :query ORDER BY score DESC LIMIT :limit OFFSET :offset"
+        ),
+        {'query': expression, 'limit': limit, 'offset': offset}
+    )
+    rows = result.all()
+    return [row[0] for row in rows], [row[1] for row in rows]
+
+
+async def search_ids(db: AsyncSession, query: str, limit: int, offset: int = 0):
+    """Returns (ids ranked by bm25 with title weighting, total number of matches)."""
+    expression = match_expression(query)
+    if not expression:
+        return [], 0
+    total = await db.scalar(
+        text("SELECT count(*) FROM content_fts WHERE content_fts MATCH :query"),
+        {'query': expression}
+    )
+    ids, _ = await search_scored(db, query, limit, offset)
+    return ids, total
+
+
+def keyword_search_query(search_terms):
+    """
+    ILIKE search used where FTS5 isn't available: papers containing any term,
+    scored 3 per title match and 1 per abstract match.
+    """
+    title_conditions = [Content.title.ilike(f'%{term}%') for term in search_terms]
+    abstract_conditions = [Content.abstract.ilike(f'%{term}%') for term in search_terms]
+
+    # Build scoring with higher weight for title matches
+    score_expr = func.coalesce(0, 0)
+    for term in search_terms:
+        title_matches = (func.instr(func.lower(Content.title), term) > 0).cast(Integer) * 3
+        abstract_matches = (func.instr(func.lower(Content.abstract), term) > 0).cast(Integer)
+        score_expr += title_matches + abstract_matches
+
+    return select(
+        Content.id,
+        Content.title,
+        Content.abstract,
+        Content.source,
+        Content.external_id,
+        Content.url,
+        Content.published_date,
+        Content.paper_metadata,
+        score_expr.label("score")
+    ).where(
+        or_(*title_conditions, *abstract_conditions)
+    ).order_by(
+        desc("score"),
+        desc(Content.published_date)
+    )
+
+
+async def lexical_candidates(db: AsyncSession, query: str, limit: int = HYBRID_CANDIDATES):
+    """Top `limit` lexical matches as (ids, scores), from FTS5 when available."""
+    if await fts_available(db):
+        return await search_scored(db, query, limit)
+    search_terms = [term.strip().lower() for term in query.split() if len(term.strip()) >= 3]
+    if not search_terms:
+        return [], []
+    rows = (await db.execute(keyword_search_query(search_terms).limit(limit))).all()
+    return [row.id for row in rows], [row.score for row in rows]
+
+
+def _min_max(scores):
+    scores = np.asarray(scores, dtype=np.float64)
+    spread = scores.max() - scores.min() if len(scores) else 0
+    return (scores - scores.min()) / spread if spread > 0 else np.ones_like(scores)
+
+
+def fuse_rankings(lexical_ids, lexical_scores, semantic_ids, semantic_scores,
+                  fusion: str = SEARCH_FUSION, semantic_weight: float = SEARCH_SEMANTIC_WEIGHT):
+    """
+    Re-ranks the lexical candidates by combining both rankings; candidates without
+    an embedding only get their lexical share. Ties keep the lexical order.
+    """
+    if not lexical_ids:
+        return []
+    position = {content_id: i for i, content_id in enumerate(lexical_ids)}
+    semantic = np.zeros(len(lexical_ids))
+    if fusion == 'rrf':
+        lexical = 1.0 / (RRF_K + 1 + np.arange(len(lexical_ids)))
+        for rank, content_id in enumerate(semantic_ids):
+            semantic[position[content_id]] = 1.0 / (RRF_K + 1 + rank)
+    elif fusion == 'weighted':
+        lexical = _min_max(lexical_scores)
+        if len(semantic_ids):
+            rows = [position[content_id] for content_id in semantic_ids]
+            semantic[rows] = _min_max(semantic_scores)
+    else:
+        raise ValueError(f"Unknown fusion '{fusion}', expected 'rrf' or 'weighted'")
+    fused = (1 - semantic_weight) * lexical + semantic_weight * semantic
+    order = np.argsort(-fused, kind='stable')
+    return [lexical_ids[i] for i in order]
@@ -0,0 +1,106 @@
+import os
+import secrets
+import time
+import zlib
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import FeedSession
+
+# Feed sessions expire after this many seconds without a request
+SEEN_SET_TTL_SECONDS = float(os.getenv("SEEN_SET_TTL_SECONDS", 3600))
+
+
+class SeenSet:
+    """
+    Bitmap of the content ids already shown in one feed session.
+    One bit per id, so a million-paper corpus costs at most 125 KB per session.
+    """
+
+    def __init__(self):
+        self.bits = np.zeros(0, dtype=np.uint8)
+        # Position reached in the latest-papers stream (see utils.fetch_latest_content)
+        self.latest_offset = 0
+
+    @classmethod
+    def from_row(cls, row: FeedSession):
+        seen = cls()
+        if row.seen:
+            seen.bits = np.frombuffer(zlib.decompress(row.seen), dtype=np.uint8).copy()
+        seen.latest_offset = row.latest_offset or 0
+        return seen
+
+    def to_bytes(self) -> bytes:
+        # Mostly-zero bitmaps compress to a small fraction of their size
+        return zlib.compress(self.bits.tobytes())
+
+    def add(self, ids):
+        ids = np.fromiter(ids, dtype=np.int64)
+        ids = ids[ids >= 0]
+        if not len(ids):
+            return
+        needed = int(ids.max() >> 3) + 1
+        if needed > len(self.bits):
+            # Grow geometrically so scrolling through new ids doesn't reallocate every page
+            grown = np.zeros(max(needed, 2 * len(self.bits)), dtype=np.uint8)
+            grown[:len(self.bits)] = self.bits
+            self.bits = grown
+        np.bitwise_or.at(self.bits, ids >> 3, (1 << (ids & 7)).astype(np.uint8))
+
+    def contains(self, ids):
+        """Boolean mask telling which of `ids` have been seen."""
+        ids = np.asarray(ids, dtype=np.int64)
+        mask = np.zeros(len(ids), dtype=bool)
+        in_range = (ids >= 0) & ((ids >> 3) < len(self.bits))
+        bytes_ = self.bits[ids[in_range] >> 3]
+        mask[in_range] = (bytes_ >> (ids[in_range] & 7)) & 1
+        return mask
+
+    def ids(self):
+        return np.flatnonzero(np.unpackbits(self.bits, bitorder='little'))
+
+    def __len__(self):
+        return int(np.unpackbits(self.bits).sum())
+
+
+class SeenSetStore:
+    """
+    Feed sessions kept in the feed_sessions table, so every API worker continues
+    the same session whichever one serves the next page.
+    """
+
+    def __init__(self, ttl_seconds: float = SEEN_SET_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._purged_at = 0.0
+
+    async def load(self, db: AsyncSession, token: str = ""):
+        """Returns (token, seen_set), starting a new session if `token` is unknown or expired."""
+        row = await db.get(FeedSession, token) if token else None
+        if row is None or row.updated_at < self._cutoff():
+            return secrets.token_urlsafe(16), SeenSet()
+        return token, SeenSet.from_row(row)
+
+    async def save(self, db: AsyncSession, token: str, seen: SeenSet):
+        """Stores the session's seen set and commits."""
+        row = await db.get(FeedSession, token)
+        if row is None:
+            row = FeedSession(token=token)
+            db.add(row)
+        row.seen = seen.to_bytes()
+        row.latest_offset = seen.latest_offset
+        row.updated_at = datetime.utcnow()
+        # Expired sessions are deleted now and then rather than on every request
+        now = time.monotonic()
+        if now - self._purged_at >= self.ttl_seconds / 10:
+            self._purged_at = now
+            await db.execute(delete(FeedSession).where(FeedSession.updated_at < self._cutoff()))
+        await db.commit()
+
+    def _cutoff(self):
+        return datetime.utcnow() - timedelta(seconds=self.ttl_seconds)
+
+
+seen_sets = SeenSetStore()
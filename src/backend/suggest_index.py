@@ -0,0 +1,363 @@
+import asyncio
+import os
+import re
+import time
+from collections import Counter
+from itertools import islice
+
+import numpy as np
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import Content, Interaction
+from .user_profiles import PROFILE_INTERACTIONS
+from .vector_index import INDEX_REFRESH_SECONDS
+
+# Longest title phrase offered as a completion, in words
+SUGGEST_MAX_NGRAM = int(os.getenv("SUGGEST_MAX_NGRAM", 3))
+# Multi-word title phrases found in fewer papers than this are left out of the index
+SUGGEST_MIN_COUNT = int(os.getenv("SUGGEST_MIN_COUNT", 2))
+# How many phrases below SUGGEST_MIN_COUNT are remembered while they wait to reach it
+SUGGEST_MAX_RARE = int(os.getenv("SUGGEST_MAX_RARE", 500000))
+# How many papers one like or save of a paper is worth when ranking its completions
+SUGGEST_INTERACTION_WEIGHT = int(os.getenv("SUGGEST_INTERACTION_WEIGHT", 5))
+
+_LOAD_CHUNK = 10000
+_LOOKUP_CHUNK = 500
+_CACHE_SIZE = 4096
+_MAX_KEY_LENGTH = 64
+_WORD = re.compile(r'[^\W_]+(?:[-\'][^\W_]+)*')
+_STOPWORDS = frozenset(
+    'a an and are as at be by for from in into is its of on or the to via with without we our this that'.split()
+)
+
+
+def normalize(text: str) -> str:
+    """Lowercased words separated by single spaces; what both keys and typed prefixes are compared as."""
+    return ' '.join(_WORD.findall((text or '').lower()))
+
+
+def title_phrases(title: str, max_words: int = SUGGEST_MAX_NGRAM):
+    """
+    Distinct phrases of 1 to `max_words` consecutive title words, skipping those
+    that start or end with a stopword ('of neural' completes to nothing useful).
+    """
+    words = normalize(title).split()
+    phrases = set()
+    for start, word in enumerate(words):
+        if word in _STOPWORDS or len(word) < 2:
+            continue
+        for end in range(start + 1, min(start + max_words, len(words)) + 1):
+            if words[end - 1] not in _STOPWORDS:
+                phrases.add(' '.join(words[start:end]))
+    return phrases
+
+
+def paper_terms(title: str, paper_metadata):
+    """(kind, key, display) entries a paper contributes, each counted once per paper."""
+    paper_metadata = paper_metadata or {}
+    terms = {('title', phrase, phrase) for phrase in title_phrases(title)}
+    for author in paper_metadata.get('authors', []):
+        name = normalize(author)
+        if not name:
+            continue
+        # Typing a surname (or any later part of the name) also finds the author
+        words = name.split()
+        for start in range(len(words)):
+            terms.add(('author', ' '.join(words[start:]), author.strip()))
+    for category in paper_metadata.get('categories', []):
+        terms.add(('category', normalize(category), category))
+    return terms
+
+
+def count_terms(rows):
+    """
+    Counters of papers and of the likes and saves of those papers per (kind, key,
+    display) entry, over (title, paper_metadata, likes) rows.
+    """
+    papers, likes = Counter(), Counter()
+    for title, paper_metadata, liked in rows:
+        for kind, key, display in paper_terms(title, paper_metadata):
+            entry = (kind, key[:_MAX_KEY_LENGTH], display)
+            papers[entry] += 1
+            if liked:
+                likes[entry] += liked
+    return papers, likes
+
+
+async def interaction_counts(db: AsyncSession):
+    """Likes and saves per content id."""
+    result = await db.execute(
+        select(Interaction.content_id, func.count())
+        .where(Interaction.interaction_type.in_(PROFILE_INTERACTIONS))
+        .group_by(Interaction.content_id)
+    )
+    return dict(result.all())
+
+
+def _prunable(entry):
+    # Multi-word title phrases; single words, authors and categories are always kept
+    return entry[0] == 'title' and ' ' in entry[1]
+
+
+class _Entries:
+    """
+    One immutable version of the sorted arrays, with the lookup cache that is only
+    valid for it. A merge builds a new one and swaps it in, so a lookup that
+    started on the old version finishes on consistent arrays.
+    """
+
+    __slots__ = ('keys', 'counts', 'weights', 'kinds', 'displays', 'cache')
+
+    def __init__(self, keys=None, counts=None, weights=None, kinds=None, displays=None):
+        self.keys = np.zeros(0, dtype=object) if keys is None else keys
+        self.counts = np.zeros(0, dtype=np.int64) if counts is None else counts
+        self.weights = np.zeros(0, dtype=np.int64) if weights is None else weights
+        self.kinds = np.zeros(0, dtype=object) if kinds is None else kinds
+        self.displays = np.zeros(0, dtype=object) if displays is None else displays
+        self.cache = {}
+
+
+class SuggestIndex:
+    """
+    Prefix index for search-as-you-type: every completion key sorted in one array,
+    with parallel arrays of paper counts, popularity weights, kinds and display
+    text. An entry's weight is its paper count plus SUGGEST_INTERACTION_WEIGHT for
+    every like or save of those papers. A prefix selects a contiguous slice found
+    with two binary searches, and the heaviest entries of that slice are the
+    suggestions.
+
+    New papers and interactions are counted into pending Counters and merged into
+    a new version of the arrays in a worker thread; lookups never wait for a merge.
+    """
+
+    def __init__(self):
+        self.entries = _Entries()
+        self.max_id = 0
+        self.checked_at = time.monotonic()
+        # Likes and saves per content id, as of the last count
+        self.liked = {}
+        self._pending = Counter()
+        self._pending_likes = Counter()
+        # Multi-word title phrases not yet in SUGGEST_MIN_COUNT papers, oldest first
+        self._rare = Counter()
+        self._rare_likes = Counter()
+        self._merge_lock = asyncio.Lock()
+        self._merge_task = None
+
+    def __len__(self):
+        return len(self.entries.keys)
+
+    @classmethod
+    async def from_db(cls, db: AsyncSession):
+        index = cls()
+        index.liked = await interaction_counts(db)
+        await index._load_after(db, 0)
+        await index.merge()
+        return index
+
+    async def _load_after(self, db: AsyncSession, last_id: int):
+        while True:
+            result = await db.execute(
+                select(Content.id, Content.title, Content.paper_metadata)
+                .where(Content.id > last_id)
+                .order_by(Content.id)
+                .limit(_LOAD_CHUNK)
+            )
+            rows = result.all()
+            if not rows:
+                break
+            papers, likes = await asyncio.to_thread(
+                count_terms, [(row.title, row.paper_metadata, self.liked.get(row.id, 0)) for row in rows]
+            )
+            self._pending.update(papers)
+            self._pending_likes.update(likes)
+            last_id = rows[-1].id
+            self.max_id = max(self.max_id, last_id)
+            if len(rows) < _LOAD_CHUNK:
+                break
+            # Fold each full chunk in before reading the next, so the pending counts (and the
+            # phrases below SUGGEST_MIN_COUNT) stay bounded instead of holding the whole corpus
+            await self.merge()
+
+    async def _count_likes(self, db: AsyncSession, changed):
+        """Counts the change in likes and saves of already indexed papers, given per content id."""
+        content_ids = list(changed)
+        for start in range(0, len(content_ids), _LOOKUP_CHUNK):
+            result = await db.execute(
+                select(Content.id, Content.title, Content.paper_metadata)
+                .where(Content.id.in_(content_ids[start:start + _LOOKUP_CHUNK]))
+            )
+            _, likes = await asyncio.to_thread(
+                count_terms, [(row.title, row.paper_metadata, changed[row.id]) for row in result]
+            )
+            self._pending_likes.update(likes)
+
+    def add(self, content_id: int, title: str, paper_metadata=None):
+        """Counts a newly ingested paper's terms and starts a background merge if none is running."""
+        papers, _ = count_terms([(title, paper_metadata, 0)])
+        self._pending.update(papers)
+        self.max_id = max(self.max_id, content_id)
+        self.schedule_merge()
+
+    def schedule_merge(self):
+        """Starts a background merge of the pending counts unless one is already running."""
+        if (self._pending or self._pending_likes) and (self._merge_task is None or self._merge_task.done()):
+            self._merge_task = asyncio.get_running_loop().create_task(self.merge())
+        return self._merge_task
+
+    async def merge(self):
+        """Folds pending counts into a new version of the arrays, off the event loop."""
+        async with self._merge_lock:
+            while self._pending or self._pending_likes:
+                pending, self._pending = self._pending, Counter()
+                pending_likes, self._pending_likes = self._pending_likes, Counter()
+                self.entries = await asyncio.to_thread(self._merged, self.entries, pending, pending_likes)
+
+    def _merged(self, entries: _Entries, pending: Counter, pending_likes: Counter) -> _Entries:
+        """
+        Returns `entries` with `pending` paper counts and `pending_likes` folded in:
+        known keys are incremented, new ones inserted at their sorted positions in
+        one linear pass. A new multi-word title phrase is only inserted once
+        SUGGEST_MIN_COUNT papers contain it; phrases seen only once are mostly noise
+        and would be the bulk of the index.
+        """
+        items = sorted(pending.keys() | pending_likes.keys(), key=lambda entry: self._sort_key(*entry))
+        new_keys = np.empty(len(items), dtype=object)
+        new_keys[:] = [self._sort_key(*entry) for entry in items]
+        new_counts = np.array([pending[entry] for entry in items], dtype=np.int64)
+        new_likes = np.array([pending_likes[entry] for entry in items], dtype=np.int64)
+
+        positions = np.searchsorted(entries.keys, new_keys)
+        known = positions < len(entries.keys)
+        known[known] = entries.keys[positions[known]] == new_keys[known]
+        counts = entries.counts.copy()
+        np.add.at(counts, positions[known], new_counts[known])
+        weights = entries.weights.copy()
+        np.add.at(weights, positions[known], new_counts[known] + SUGGEST_INTERACTION_WEIGHT * new_likes[known])
+
+        fresh = ~known
+        for row in np.flatnonzero(fresh):
+            entry = items[row]
+            minimum = 1
+            if _prunable(entry):
+                minimum = SUGGEST_MIN_COUNT
+                new_counts[row] += self._rare.pop(entry, 0)
+                new_likes[row] += self._rare_likes.pop(entry, 0)
+                if 0 < new_counts[row] < minimum:
+                    self._rare[entry] = int(new_counts[row])
+                    if new_likes[row]:
+                        self._rare_likes[entry] = int(new_likes[row])
+            # Likes alone don't bring in an entry no paper has been counted for
+            fresh[row] = new_counts[row] >= minimum
+        # Forget the oldest phrases still below the threshold rather than grow without bound
+        for entry in list(islice(self._rare, max(0, len(self._rare) - SUGGEST_MAX_RARE))):
+            del self._rare[entry]
+            self._rare_likes.pop(entry, None)
+
+        kinds = np.empty(fresh.sum(), dtype=object)
+        kinds[:] = [items[row][0] for row in np.flatnonzero(fresh)]
+        displays = np.empty(fresh.sum(), dtype=object)
+        displays[:] = [items[row][2] for row in np.flatnonzero(fresh)]
+        return _Entries(
+            np.insert(entries.keys, positions[fresh], new_keys[fresh]),
+            np.insert(counts, positions[fresh], new_counts[fresh]),
+            np.insert(weights, positions[fresh], new_counts[fresh] + SUGGEST_INTERACTION_WEIGHT * new_likes[fresh]),
+            np.insert(entries.kinds, positions[fresh], kinds),
+            np.insert(entries.displays, positions[fresh], displays),
+        )
+
+    @staticmethod
+    def _sort_key(kind, key, display):
+        # The separator sorts before any character a prefix can continue with
+        return f"{key}\x00{kind}\x00{display}"
+
+    def suggest(self, prefix: str, limit: int = 8):
+        """Up to `limit` completions of `prefix` as (text, kind, paper count), most popular first."""
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        entries = self.entries
+        cache_key = (prefix, limit)
+        if cache_key in entries.cache:
+            return entries.cache[cache_key]
+
+        start = np.searchsorted(entries.keys, prefix, side='left')
+        end = np.searchsorted(entries.keys, prefix + '\uffff', side='left')
+        weights = entries.weights[start:end]
+        # Over-fetch: the surname and full-name keys of one author dedupe to one suggestion
+        top = min(len(weights), limit * 3)
+        if top < len(weights):
+            candidates = np.argpartition(-weights, top - 1)[:top]
+        else:
+            candidates = np.arange(len(weights))
+        candidates = candidates[np.lexsort((candidates, -weights[candidates]))]
+
+        suggestions, seen = [], set()
+        for position in candidates + start:
+            entry = (entries.displays[position], entries.kinds[position])
+            if entry not in seen:
+                seen.add(entry)
+                suggestions.append((*entry, int(entries.counts[position])))
+                if len(suggestions) == limit:
+                    break
+
+        if len(entries.cache) >= _CACHE_SIZE:
+            entries.cache.clear()
+        entries.cache[cache_key] = suggestions
+        return suggestions
+
+    async def refresh(self, db: AsyncSession, force: bool = False):
+        """
+        Counts papers ingested, and likes or saves changed, since the last check by
+        any process; they show up once merged.
+        """
+        if not force and time.monotonic() - self.checked_at < INDEX_REFRESH_SECONDS:
+            return self
+        self.checked_at = time.monotonic()
+        liked = await interaction_counts(db)
+        changed = {}
+        for content_id in liked.keys() | self.liked.keys():
+            delta = liked.get(content_id, 0) - self.liked.get(content_id, 0)
+            # Papers not loaded yet are counted with their likes when they are
+            if delta and content_id <= self.max_id:
+                changed[content_id] = delta
+        self.liked = liked
+        if changed:
+            await self._count_likes(db, changed)
+        max_id = await db.scalar(select(func.max(Content.id)))
+        if max_id and max_id > self.max_id:
+            await self._load_after(db, self.max_id)
+        self.schedule_merge()
+        return self
+
+
+_index = None
+_index_lock = asyncio.Lock()
+
+
+async def get_suggest_index(db: AsyncSession) -> SuggestIndex:
+    """Returns the process-wide suggestion index, building it on first use."""
+    global _index
+    async with _index_lock:
+        if _index is None:
+            _index = await SuggestIndex.from_db(db)
+        else:
+            await _index.refresh(db)
+        return _index
+
+
+def add_to_suggest_index(content_id: int, title: str, paper_metadata=None):
+    """Counts a freshly stored paper in the loaded index, if one has been built."""
+    if _index is not None:
+        _index.add(content_id, title, paper_metadata)
+
+
+async def warm_up(session_factory):
+    """Builds the index in the background so the first keystroke doesn't wait for it."""
+    try:
+        async with session_factory() as db:
+            index = await get_suggest_index(db)
+        print(f"Suggestion index ready: {len(index)} completions")
+    except Exception as e:
+        print(f"Error building suggestion index: {e}")
@@ -0,0 +1,37 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import SyncState
+
+
+async def load_marks(db: AsyncSession):
+    """{category: newest publication time already synced}, as aware UTC datetimes."""
+    result = await db.execute(select(SyncState.category, SyncState.last_published))
+    return {
+        category: last_published.replace(tzinfo=timezone.utc)
+        for category, last_published in result.all()
+        if last_published is not None
+    }
+
+
+def advance(marks, category, published):
+    """Raises the in-memory mark of `category` to `published` if that is newer."""
+    if published is not None and (category not in marks or published > marks[category]):
+        marks[category] = published
+
+
+async def save_marks(db: AsyncSession, marks):
+    """
+    Persists the marks. Call only once the papers they cover are committed,
+    so an interrupted sync refetches rather than skips them.
+    """
+    now = datetime.utcnow()
+    for category, published in marks.items():
+        await db.merge(SyncState(
+            category=category,
+            last_published=published.astimezone(timezone.utc).replace(tzinfo=None),
+            synced_at=now
+        ))
+    await db.commit()
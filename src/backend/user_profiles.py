@@ -0,0 +1,97 @@
+import os
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import select, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import Content, Interaction, UserProfile
+
+# Interaction types that pull the user's taste vector towards a paper
+PROFILE_INTERACTIONS = ('like', 'save')
+# Optional time decay: older interactions lose half their weight every this many days (0 disables)
+PROFILE_HALF_LIFE_DAYS = float(os.getenv("PROFILE_HALF_LIFE_DAYS", 0))
+
+
+def _decay(since: datetime, now: datetime) -> float:
+    """Weight an interaction recorded at `since` still carries at `now`."""
+    if not PROFILE_HALF_LIFE_DAYS or since is None:
+        return 1.0
+    age_days = max((now - since).total_seconds(), 0) / 86400
+    return 0.5 ** (age_days / PROFILE_HALF_LIFE_DAYS)
+
+
+async def rebuild_profile(db: AsyncSession, user_id: int) -> UserProfile:
+    """
+    Recomputes a user's profile from their interactions and stores it.
+    Used once per user to seed the running sum; afterwards it is updated incrementally.
+    """
+    result = await db.execute(
+        select(Content.embedding, Interaction.created_at).join(
+            Interaction,
+            and_(
+                Interaction.content_id == Content.id,
+                Interaction.user_id == user_id,
+                Interaction.interaction_type.in_(PROFILE_INTERACTIONS)
+            )
+        ).where(Content.embedding.is_not(None))
+    )
+    now = datetime.utcnow()
+    embedding_sum, weight = None, 0.0
+    for embedding, created_at in result:
+        contribution = _decay(created_at, now)
+        vector = np.asarray(embedding, dtype=np.float32) * contribution
+        embedding_sum = vector if embedding_sum is None else embedding_sum + vector
+        weight += contribution
+
+    profile = await db.get(UserProfile, user_id)
+    if profile is None:
+        profile = UserProfile(user_id=user_id)
+        db.add(profile)
+    profile.embedding_sum = embedding_sum
+    profile.weight = weight
+    profile.updated_at = now
+    return profile
+
+
+async def apply_interaction(db: AsyncSession, user_id: int, content_id: int, interaction_type: str,
+                            added: bool):
+    """
+    Adds one paper's embedding to the user's running sum in O(d). A removal
+    rebuilds the profile instead: the paper's current embedding need not be what
+    was added (it may have had none yet, or been re-embedded since).
+    Must run after the interaction change has been flushed, so a rebuild already
+    reflects it. The caller commits.
+    """
+    if interaction_type not in PROFILE_INTERACTIONS:
+        return
+
+    profile = await db.get(UserProfile, user_id)
+    if profile is None or not added:
+        await rebuild_profile(db, user_id)
+        return
+
+    embedding = await db.scalar(select(Content.embedding).where(Content.id == content_id))
+    if embedding is None:
+        return
+
+    now = datetime.utcnow()
+    # Age the whole profile, then add the new paper at full weight
+    age = _decay(profile.updated_at, now)
+    embedding_sum = profile.embedding_sum * age if profile.embedding_sum is not None else None
+    vector = np.asarray(embedding, dtype=np.float32)
+    profile.embedding_sum = vector if embedding_sum is None else embedding_sum + vector
+    profile.weight = (profile.weight or 0.0) * age + 1.0
+    profile.updated_at = now
+
+
+async def get_profile_vector(db: AsyncSession, user_id: int):
+    """Returns the user's mean liked/saved embedding, or None if they have none."""
+    profile = await db.get(UserProfile, user_id)
+    if profile is None:
+        profile = await rebuild_profile(db, user_id)
+        await db.commit()
+
+    if profile.embedding_sum is None or not profile.weight:
+        return None
+    return profile.embedding_sum / profile.weight
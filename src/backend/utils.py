@@ -1,13 +1,10 @@
-from datetime import datetime
 from .models import Content
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, JSON, update, func, and_, or_, desc
-import xml.etree.ElementTree as ET
+from sqlalchemy import select
 import asyncio
 import arxiv
 import sys
 import os
-from sentence_transformers import SentenceTransformer
 import numpy as np
 
 # Add the parent directory to the Python path
@@ -16,44 +13,53 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 # Now import directly from the modules
 from .models import Content, Base  # Use relative import
 from .database import DATABASE_URL, ARTICLES_DATABASE_URL
-
-# Load a pre-trained model (all-MiniLM-L6-v2 is fast and good for many tasks)
-model = SentenceTransformer('all-MiniLM-L6-v2')
+from .vector_index import get_index
+from .embedding_cache import embedding_cache
+from .search_index import lexical_candidates, fuse_rankings, HYBRID_CANDIDATES, SEARCH_FUSION
+from .ingest import insert_and_embed, BULK_CHUNK_SIZE
+from .arxiv_feed import iter_entries, iter_batches
 
 async def get_embedding(text: str, db: AsyncSession):
     """
-    Gets the embedding for a given text.  Checks the database first,
-    and if not found, generates it using SentenceTransformer.
+    Gets the embedding for a given text.  Checks the content-hash embedding
+    cache first, and if not found, generates it on the encoder service
+    (off the event loop) and caches it.
     """
-    # Check if the embedding exists
-    embedding_check_query = select(Content.embedding).where(
-        or_(
-            Content.title == text,
-            Content.abstract == text
-        )
-    )
-    existing_embedding = await db.execute(embedding_check_query)
-    try:
-        existing_embedding_result = existing_embedding.scalar_one_or_none()
-    except Exception as e: # catch exception
-        existing_embedding_result = None
-
-    if existing_embedding_result is not None:
-        return existing_embedding_result
+    embeddings = await embedding_cache.encode_async([text])
+    return embeddings[0].tolist()  # Convert numpy array to list
 
-    # Generate and return the embedding
-    embedding = model.encode(text).tolist()  # Convert numpy array to list
-    return embedding
+async def rank_content_ids(query_embedding, db: AsyncSession, content_ids_to_exclude=None, limit: int = 100, restrict_to_ids=None):
+    """
+    Returns the ids of the `limit` most similar embedded articles, best first,
+    scored against the resident embedding index. `restrict_to_ids` limits
+    scoring to a subset such as one category's ids.
+    """
+    index = await get_index(db)
+    top_ids, _ = index.search(query_embedding, limit=limit, exclude=content_ids_to_exclude, restrict=restrict_to_ids)
+    return top_ids.tolist()
 
-async def similarity_search(query_embedding: list, db: AsyncSession, content_ids_to_exclude=None, limit: int = 100):
+async def hybrid_search_ids(query: str, db: AsyncSession, candidates: int = HYBRID_CANDIDATES, fusion: str = SEARCH_FUSION):
     """
-    Performs a similarity search using cosine similarity.
-    This is a simplified, in-memory implementation.
+    Two-stage search: the top `candidates` lexical matches are re-ranked by cosine
+    similarity to the query embedding (encoded once, through the embedding cache)
+    and fused with their lexical ranking. Only the candidates are scored, so the
+    cost per query doesn't grow with the corpus.
     """
-    # Ensure the query embedding is a numpy array
-    query_embedding_np = np.array(query_embedding)
+    lexical_ids, lexical_scores = await lexical_candidates(db, query, candidates)
+    if not lexical_ids:
+        return []
+    query_embedding = (await embedding_cache.encode_async([query]))[0]
+    index = await get_index(db)
+    semantic_ids, semantic_scores = index.search(
+        query_embedding, limit=len(lexical_ids), restrict=np.unique(lexical_ids)
+    )
+    return fuse_rankings(lexical_ids, lexical_scores, semantic_ids.tolist(), semantic_scores, fusion)
+
+async def fetch_content_by_ids(content_ids, db: AsyncSession):
+    """Loads the display columns for `content_ids`, preserving their order."""
+    if not content_ids:
+        return []
 
-    # Build the base query
     query = select(
         Content.id,
         Content.title,
@@ -61,85 +67,80 @@ async def similarity_search(query_embedding: list, db: AsyncSession, content_ids
         Content.source,
         Content.url,
         Content.published_date,
-        Content.paper_metadata,
-        Content.embedding
-    ).where(Content.embedding.is_not(None))
-
-    # Exclude content IDs if provided
-    if content_ids_to_exclude:
-        query = query.where(Content.id.not_in(content_ids_to_exclude))
+        Content.paper_metadata
+    ).where(Content.id.in_(content_ids))
 
-    # Execute the query
     result = await db.execute(query)
-    all_articles = result.all()
+    articles_by_id = {article.id: article for article in result.all()}
 
-    # Calculate cosine similarity for each article
-    similarities = []
-    for article in all_articles:
-        if article.embedding:
-            article_embedding_np = np.array(article.embedding)
-            # Calculate cosine similarity
-            similarity = np.dot(query_embedding_np, article_embedding_np) / (np.linalg.norm(query_embedding_np) * np.linalg.norm(article_embedding_np))
-            similarities.append((article, similarity))
+    return [articles_by_id[id_] for id_ in content_ids if id_ in articles_by_id]
 
-    # Sort by similarity (descending)
-    sorted_articles = sorted(similarities, key=lambda x: x[1], reverse=True)
+async def fetch_latest_content(db: AsyncSession, seen, limit: int, newest_first_ids=None):
+    """
+    Returns up to `limit` of the newest articles not in the `seen` set.
+    Scans forward from the session's position in the newest-first stream instead
+    of pushing the seen ids into a NOT IN clause. When `newest_first_ids` is given
+    (e.g. a category from the category index), the page is picked from it instead.
+    """
+    if newest_first_ids is not None:
+        unseen = newest_first_ids[~seen.contains(newest_first_ids)]
+        return await fetch_content_by_ids(unseen[:limit].tolist(), db)
+
+    content = []
+    batch_size = limit * 2
+    while len(content) < limit:
+        query = select(Content).order_by(
+            Content.published_date.desc(), Content.id.desc()
+        ).offset(seen.latest_offset).limit(batch_size)
+        result = await db.execute(query)
+        batch = result.scalars().all()
+        if not batch:
+            break
+
+        unseen = ~seen.contains([item.id for item in batch])
+        for position, (item, is_unseen) in enumerate(zip(batch, unseen)):
+            if is_unseen:
+                content.append(item)
+                if len(content) == limit:
+                    # Resume right after the last article handed out
+                    seen.latest_offset += position + 1
+                    break
+        else:
+            seen.latest_offset += len(batch)
+
+    return content
 
-    # Return the top 'limit' articles
-    return [article for article, similarity in sorted_articles[:limit]]
+async def similarity_search(query_embedding: list, db: AsyncSession, content_ids_to_exclude=None, limit: int = 100):
+    """
+    Performs a similarity search using cosine similarity.
+    Scores the whole corpus against the resident embedding index in one
+    matrix-vector product and only loads the rows that made the top `limit`.
+    """
+    top_ids = await rank_content_ids(query_embedding, db, content_ids_to_exclude, limit)
+    return await fetch_content_by_ids(top_ids, db)
+
+async def process_and_store_arxiv_results(xml_data, db: AsyncSession):
+    """
+    Stores the papers of an arXiv API response (str, bytes or binary file object)
+    that aren't stored yet, and returns their new ids.
+
+    Entries are parsed incrementally and handled in batches as they complete: each
+    batch is written with one bulk upsert, and only the rows it reports as inserted
+    are embedded (in one call), so large harvest pages start landing before the
+    whole document has been read.
+    """
+    async def embed(papers):
+        # Combine title and abstract embeddings (simple average), encoded in one batch
+        vectors = await embedding_cache.encode_async(
+            [paper['title'] for paper in papers] + [paper['abstract'] for paper in papers]
+        )
+        return (vectors[:len(papers)] + vectors[len(papers):]) / 2
 
-async def process_and_store_arxiv_results(xml_data: str, db: AsyncSession):
     try:
-        root = ET.fromstring(xml_data)
-        namespace = {'atom': 'http://www.w3.org/2005/Atom'}
-        
-        stored_articles = []
-        for entry in root.findall('atom:entry', namespace):
-            title = entry.find('atom:title', namespace).text
-            abstract = entry.find('atom:summary', namespace).text
-            url = entry.find('atom:id', namespace).text
-            published = entry.find('atom:published', namespace).text
-            
-            # Extract categories and authors
-            categories = [cat.get('term') for cat in entry.findall('atom:category', namespace)]
-            authors = [author.find('atom:name', namespace).text for author in entry.findall('atom:author', namespace)]
-            paper_id = url.split('/')[-1]
-            
-            # Check if article already exists
-            query = select(Content).where(
-                Content.external_id == url
-            )
-            result = await db.execute(query)
-            existing_article = result.scalar_one_or_none()
-            
-            if not existing_article:
-                # Get embeddings for title and abstract
-                title_embedding = await get_embedding(title, db)
-                abstract_embedding = await get_embedding(abstract, db)
-
-                # Combine title and abstract embeddings (simple average)
-                combined_embedding = ((np.array(title_embedding) + np.array(abstract_embedding)) / 2).tolist()
-
-                article = Content(
-                    title=title,
-                    abstract=abstract,
-                    source='arxiv',
-                    external_id=url,
-                    url=url,
-                    published_date=datetime.fromisoformat(published.replace('Z', '+00:00')),
-                    paper_metadata={
-                        'categories': categories,
-                        'authors': authors,
-                        'paper_id': paper_id,
-                        'published_date': published
-                    },
-                    embedding = combined_embedding
-                )
-                db.add(article)
-                stored_articles.append(article)
-        
-        await db.commit()
-        return stored_articles
+        stored_ids = []
+        for batch in iter_batches(iter_entries(xml_data), BULK_CHUNK_SIZE):
+            stored_ids.extend(await insert_and_embed(db, batch, embed))
+        return stored_ids
     except Exception as e:
         await db.rollback()
-        raise e 
\ No newline at end of file
+        raise e 
@@ -0,0 +1,414 @@
+import asyncio
+import logging
+import os
+import time
+
+import numpy as np
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .models import Content
+from . import ann_index
+from . import embedding_store
+from . import quantization
+
+# How often (in seconds) a loaded index checks the database for rows it is missing
+INDEX_REFRESH_SECONDS = float(os.getenv("INDEX_REFRESH_SECONDS", 30))
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_rows(matrix):
+    """
+    Returns a contiguous float32 copy of `matrix` with every row scaled to unit length.
+    Zero rows are left as zeros so they never score above anything else.
+    """
+    matrix = np.array(matrix, dtype=np.float32, ndmin=2, order='C')
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+    return matrix
+
+
+class EmbeddingIndex:
+    """
+    Resident brute-force cosine index.
+
+    Holds every embedding as one pre-normalized float32 matrix next to an array of
+    content ids, so a query is a single matrix-vector product followed by a top-k
+    selection instead of a per-row Python loop.
+
+    The base matrix is either loaded from the database or memory-mapped from the
+    shared embedding store. Rows embedded afterwards go into a small in-memory
+    delta, so the (possibly shared) base is never copied.
+    """
+
+    def __init__(self, ids, matrix, generation=None, normalized=False):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        if not len(self.ids):
+            matrix = np.zeros((0, 0), dtype=np.float32)
+        elif not normalized:
+            matrix = normalize_rows(matrix)
+        self.matrix = matrix
+        self.ids_sorted = bool(np.all(np.diff(self.ids) > 0))
+        # Base rows superseded by the delta
+        self.removed = np.zeros(len(self.ids), dtype=bool)
+        self.delta_ids = np.zeros(0, dtype=np.int64)
+        self.delta_matrix = np.zeros((0, self.matrix.shape[1]), dtype=np.float32)
+        # Store generation the base was mapped from, None when loaded from the database
+        self.generation = generation
+        self.checked_at = time.monotonic()
+        # Optional approximate index over the base rows (see ann_index)
+        self.ann = None
+        # Optional compressed copy of the base rows, scored before an exact re-rank
+        self.quantizer = None
+        self.codes = None
+        # Background compaction / IVF build / quantization (see schedule_maintenance)
+        self._maintenance = None
+        # Rows added while a background compaction runs, replayed onto its result
+        self._journal = None
+
+    def __len__(self):
+        return len(self.ids) - int(self.removed.sum()) + len(self.delta_ids)
+
+    @property
+    def dim(self):
+        return self.matrix.shape[1] if len(self.ids) else self.delta_matrix.shape[1]
+
+    @classmethod
+    async def from_db(cls, db: AsyncSession):
+        """Maps the embedding store when one exists, otherwise reads every embedding from the database."""
+        stored = embedding_store.open_store()
+        if stored is not None:
+            generation, ids, matrix = stored
+            index = cls(ids, matrix, generation=generation, normalized=True)
+            return await index.refresh(db, force=True)
+
+        result = await db.execute(
+            select(Content.id, Content.embedding)
+            .where(Content.embedding.is_not(None))
+            .order_by(Content.id)
+        )
+        rows = [(row.id, row.embedding) for row in result if row.embedding is not None]
+        if not rows:
+            return cls([], [])
+        ids, embeddings = zip(*rows)
+        return cls(ids, embeddings)
+
+    def all_ids(self):
+        return np.concatenate([self.ids[~self.removed], self.delta_ids])
+
+    def add(self, ids, embeddings):
+        """Adds rows to the delta; ids already present are replaced."""
+        ids = np.asarray(ids, dtype=np.int64)
+        if not len(ids):
+            return
+        vectors = normalize_rows(embeddings)
+        if self._journal is not None:
+            self._journal.append((ids, vectors))
+        if len(self.ids):
+            self.removed |= np.isin(self.ids, ids)
+        if not len(self.delta_ids):
+            self.delta_ids, self.delta_matrix = ids, vectors
+            return
+        keep = ~np.isin(self.delta_ids, ids)
+        self.delta_ids = np.concatenate([self.delta_ids[keep], ids])
+        self.delta_matrix = np.ascontiguousarray(np.vstack([self.delta_matrix[keep], vectors]))
+
+    def search(self, query, limit: int = 100, exclude=None, nprobe: int = None, restrict=None):
+        """
+        Returns (ids, scores) of the `limit` rows most similar to `query`,
+        best first, skipping any id in `exclude`. When `restrict` (a sorted id
+        array, e.g. from the category index) is given, only those rows are scored.
+        """
+        if not len(self) or limit <= 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        query = normalize_rows(query)[0]
+        exclude = np.fromiter(exclude, dtype=np.int64) if exclude is not None and len(exclude) else None
+
+        if restrict is not None:
+            rows = self.rows_for(restrict)
+            rows = rows[~self.removed[rows]]
+            if self.quantizer is not None:
+                base = self._search_quantized(query, limit, exclude, rows)
+            else:
+                base = self._score_rows(self.ids[rows], self.matrix[rows], query, limit, exclude)
+            in_delta = np.isin(self.delta_ids, restrict)
+            delta = self._score_rows(self.delta_ids[in_delta], self.delta_matrix[in_delta], query, limit, exclude)
+        else:
+            base, delta = self._search_all(query, limit, exclude, nprobe)
+
+        ids = np.concatenate([base[0], delta[0]])
+        scores = np.concatenate([base[1], delta[1]])
+        return top_k(ids, scores, limit)
+
+    def rows_for(self, ids):
+        """Base row positions holding `ids`; ids not in the base are skipped."""
+        ids = np.asarray(ids, dtype=np.int64)
+        if not len(self.ids):
+            return np.zeros(0, dtype=np.int64)
+        if self.ids_sorted:
+            # Binary search for each restricted id instead of a pass over the whole base
+            rows = np.minimum(np.searchsorted(self.ids, ids), len(self.ids) - 1)
+            return rows[self.ids[rows] == ids]
+        return np.flatnonzero(np.isin(self.ids, ids))
+
+    def _search_all(self, query, limit, exclude, nprobe):
+        if self.ann is not None:
+            base = self._search_ann(query, limit, exclude, nprobe or ann_index.ANN_NPROBE)
+        elif self.quantizer is not None:
+            base = self._search_quantized(query, limit, exclude)
+        else:
+            base = self._score_rows(self.ids, self.matrix, query, limit, exclude, self.removed)
+        delta = self._score_rows(self.delta_ids, self.delta_matrix, query, limit, exclude)
+        return base, delta
+
+    @staticmethod
+    def _score_rows(ids, matrix, query, limit, exclude, removed=None):
+        if not len(ids):
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        scores = matrix @ query
+        if removed is not None and removed.any():
+            scores[removed] = -np.inf
+        if exclude is not None:
+            scores[np.isin(ids, exclude)] = -np.inf
+        return top_k(ids, scores, limit)
+
+    def _search_ann(self, query, limit, exclude, nprobe):
+        """
+        Scores only the probed IVF lists plus any base rows after the prefix the IVF
+        index was trained on (a reused index may be older than the base). Doubles
+        `nprobe` while exclusions leave fewer than `limit` results.
+        """
+        tail = np.arange(self.ann.n_rows, len(self.ids))
+        while True:
+            rows = np.concatenate([self.ann.candidate_rows(query, nprobe), tail])
+            rows = rows[~self.removed[rows]]
+            if self.quantizer is not None:
+                found = self._search_quantized(query, limit, exclude, rows)
+            else:
+                found = self._score_rows(self.ids[rows], self.matrix[rows], query, limit, exclude)
+            if len(found[0]) >= limit or nprobe >= self.ann.n_lists:
+                return found
+            nprobe *= 2
+
+    def _search_quantized(self, query, limit, exclude, rows=None):
+        """
+        Shortlists base rows (all of them, or the given positions) with the compressed
+        codes, then re-ranks the shortlist with the exact float vectors.
+        """
+        positions = np.arange(len(self.ids)) if rows is None else rows
+        scores = self.quantizer.scores(self.codes, query, rows)
+        removed = self.removed[positions]
+        if removed.any():
+            scores[removed] = -np.inf
+        if exclude is not None:
+            scores[np.isin(self.ids[positions], exclude)] = -np.inf
+
+        shortlist, _ = top_k(positions, scores, limit * quantization.QUANTIZATION_RERANK_FACTOR)
+        # Sorted positions keep reads from a memory-mapped matrix sequential
+        shortlist = np.sort(shortlist)
+        return top_k(self.ids[shortlist], self.matrix[shortlist] @ query, limit)
+
+    def compact(self):
+        """Folds the delta into the base matrix. Copies a memory-mapped base into RAM."""
+        self._set_base(*_merge_base(self.ids, self.matrix, self.removed, self.delta_ids, self.delta_matrix))
+
+    def _set_base(self, ids, matrix):
+        self.ids = ids
+        self.matrix = matrix
+        self.ids_sorted = bool(np.all(np.diff(self.ids) > 0))
+        self.removed = np.zeros(len(self.ids), dtype=bool)
+        self.delta_ids = np.zeros(0, dtype=np.int64)
+        self.delta_matrix = np.zeros((0, self.matrix.shape[1]), dtype=np.float32)
+        self.ann = None
+        self.quantizer = self.codes = None
+
+    async def compact_async(self):
+        """
+        compact() with the copy done in a worker thread. Searches keep using the current
+        base meanwhile; rows added in the meantime are replayed onto the new one.
+        """
+        self._journal = []
+        try:
+            merged = await asyncio.to_thread(
+                _merge_base, self.ids, self.matrix, self.removed.copy(), self.delta_ids, self.delta_matrix
+            )
+            journal = self._journal
+        finally:
+            self._journal = None
+        self._set_base(*merged)
+        for ids, vectors in journal:
+            self.add(ids, vectors)
+
+    def ann_stale(self):
+        return len(self.delta_ids) + self.removed.sum() > ann_index.ANN_REBUILD_FRACTION * len(self.ids)
+
+    def ann_due(self):
+        if ann_index.ANN_ENGINE != 'ivf' or len(self) < ann_index.ANN_MIN_ROWS:
+            return False
+        return self.ann is None or self.ann_stale()
+
+    def quantization_due(self):
+        kind = quantization.EMBEDDING_QUANTIZATION
+        return bool(kind) and len(self.ids) > 0 and (self.quantizer is None or self.quantizer.kind != kind)
+
+    def needs_maintenance(self):
+        return self.ann_due() or self.quantization_due()
+
+    def schedule_maintenance(self):
+        """
+        Starts the background compaction / IVF build / quantization if one is due and
+        none is running. Queries never wait for it: until it finishes they use the
+        exact scan.
+        """
+        if (self._maintenance is None or self._maintenance.done()) and self.needs_maintenance():
+            self._maintenance = asyncio.get_running_loop().create_task(self.maintain())
+        return self._maintenance
+
+    async def maintain(self):
+        try:
+            await self.ensure_ann()
+        except Exception as e:
+            logger.exception("Building the IVF index failed: %s", e)
+        # After the IVF build: a compaction there replaces the base the codes describe
+        try:
+            await self.ensure_quantized()
+        except Exception as e:
+            logger.exception("Quantizing the embedding index failed: %s", e)
+
+    async def ensure_quantized(self):
+        """
+        Attaches compressed codes for the base rows when EMBEDDING_QUANTIZATION is set.
+        A base read from the database is then moved to a memory-mapped file, since
+        only the re-rank shortlist still needs the floats.
+        """
+        kind = quantization.EMBEDDING_QUANTIZATION
+        if not kind or not len(self.ids):
+            self.quantizer = self.codes = None
+            return self
+        if not self.quantization_due():
+            return self
+        # Fitting and encoding are CPU bound; keep them off the event loop
+        ids = self.ids
+        quantizer, codes, matrix = await asyncio.to_thread(_quantize, ids, self.matrix, kind)
+        if self.ids is ids:
+            self.quantizer, self.codes, self.matrix = quantizer, codes, matrix
+        return self
+
+    async def ensure_ann(self):
+        """Attaches an IVF index when ANN_ENGINE=ivf and the corpus is large enough."""
+        if ann_index.ANN_ENGINE != 'ivf' or len(self) < ann_index.ANN_MIN_ROWS:
+            self.ann = None
+            return self
+        if self.ann is not None and not self.ann_stale():
+            return self
+        if self.ann_stale():
+            await self.compact_async()
+        # k-means over the corpus is CPU bound; keep it off the event loop
+        ids = self.ids
+        ann = await asyncio.to_thread(ann_index.load_or_build, ids, self.matrix)
+        if self.ids is ids:
+            self.ann = ann
+        return self
+
+    async def refresh(self, db: AsyncSession, force: bool = False):
+        """
+        Picks up a newer store generation and rows embedded since the index was built.
+        Only a COUNT runs unless the database and the index disagree, in which case
+        the missing rows are loaded into the delta.
+        """
+        if not force and time.monotonic() - self.checked_at < INDEX_REFRESH_SECONDS:
+            return self
+        self.checked_at = time.monotonic()
+
+        generation = embedding_store.current_generation()
+        if generation is not None and generation != self.generation:
+            return await EmbeddingIndex.from_db(db)
+
+        total = await db.scalar(
+            select(func.count()).select_from(Content).where(Content.embedding.is_not(None))
+        )
+        if total == len(self):
+            return self
+        if total < len(self) and self.generation is None:
+            # Rows were deleted or cleared; a rebuild is simpler than diffing
+            return await EmbeddingIndex.from_db(db)
+
+        result = await db.execute(select(Content.id).where(Content.embedding.is_not(None)))
+        missing = np.setdiff1d(np.fromiter((row[0] for row in result), dtype=np.int64), self.all_ids())
+        if len(missing):
+            result = await db.execute(
+                select(Content.id, Content.embedding).where(Content.id.in_(missing.tolist()))
+            )
+            rows = [(row.id, row.embedding) for row in result if row.embedding is not None]
+            if rows:
+                ids, embeddings = zip(*rows)
+                self.add(ids, embeddings)
+        return self
+
+
+def _quantize(ids, matrix, kind):
+    quantizer, codes = quantization.load_or_fit(ids, matrix, kind)
+    if not isinstance(matrix, np.memmap):
+        matrix = quantization.spill_to_disk(matrix)
+    return quantizer, codes, matrix
+
+
+def _merge_base(ids, matrix, removed, delta_ids, delta_matrix):
+    keep = ~removed
+    return (
+        np.concatenate([ids[keep], delta_ids]),
+        np.ascontiguousarray(np.vstack([matrix[keep], delta_matrix])),
+    )
+
+
+def top_k(ids, scores, limit):
+    """Selects the best `limit` entries with argpartition and orders only those."""
+    valid = np.count_nonzero(scores > -np.inf)
+    k = min(limit, valid)
+    if k == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+    if k < len(scores):
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(len(scores))
+    order = candidates[np.argsort(-scores[candidates], kind='stable')][:k]
+    return ids[order], scores[order]
+
+
+_index = None
+_index_lock = asyncio.Lock()
+
+
+async def get_index(db: AsyncSession) -> EmbeddingIndex:
+    """
+    Returns the process-wide index, building it on first use. A due IVF build
+    or quantization is started in the background rather than awaited.
+    """
+    global _index
+    async with _index_lock:
+        if _index is None:
+            _index = await EmbeddingIndex.from_db(db)
+        else:
+            _index = await _index.refresh(db)
+        _index.schedule_maintenance()
+        return _index
+
+
+async def warm_up(session_factory):
+    """Loads the index and builds its IVF index and codes at startup, before the first query needs them."""
+    try:
+        async with session_factory() as db:
+            index = await get_index(db)
+        if index._maintenance is not None:
+            await index._maintenance
+    except Exception as e:
+        logger.exception("Warming up the embedding index failed: %s", e)
+
+
+def add_to_index(ids, embeddings):
+    """Adds freshly stored rows to the loaded index, if one has been built."""
+    if _index is not None:
+        _index.add(ids, embeddings)
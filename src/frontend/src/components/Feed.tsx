@@ -22,6 +22,12 @@ interface Content {
   };
 }
 
+interface Suggestion {
+  text: string;
+  kind: 'title' | 'author' | 'category';
+  count: number;
+}
+
 interface SearchItem {
   id: number;
   title: string;
@@ -49,10 +55,13 @@ export const Feed: React.FC = () => {
   const [showProfile, setShowProfile] = useState(false);
   const [showLoginModal, setShowLoginModal] = useState(false);
   const [searchQuery, setSearchQuery] = useState('');
+  const [suggestions, setSuggestions] = useState<Suggestion[]>([]);
+  const [showSuggestions, setShowSuggestions] = useState(false);
   const [isAuthenticated, setIsAuthenticated] = useState(!!localStorage.getItem('token'));
-  const [shownContentIds, setShownContentIds] = useState<Set<number>>(new Set());
   const [nextPageContent, setNextPageContent] = useState<Content[]>([]);
   const containerRef = useRef<HTMLDivElement>(null);
+  const recommendationCursor = useRef<string | null>(null);
+  const feedSession = useRef<string | null>(null);
   const navigate = useNavigate();
   const [showCategories, setShowCategories] = useState(false);
   const [currentView, setCurrentView] = useState<'feed' | 'search' | 'profile'>('feed');
@@ -105,8 +114,36 @@ export const Feed: React.FC = () => {
     window.location.href = '/login';
   };
 
-  const handleSearch = async (newPage: number = 1) => {
-    if (!searchQuery.trim()) {
+  useEffect(() => {
+    // Typeahead: ask for completions once typing pauses
+    const prefix = searchQuery.trim();
+    if (prefix.length < 2) {
+      setSuggestions([]);
+      return;
+    }
+    const controller = new AbortController();
+    const timer = setTimeout(async () => {
+      try {
+        const response = await fetch(
+          `${API_BASE_URL}/search/suggest?q=${encodeURIComponent(prefix)}&limit=8`,
+          { signal: controller.signal }
+        );
+        if (!response.ok) return;
+        const data = await response.json();
+        setSuggestions(data.suggestions);
+      } catch (error) {
+        if ((error as Error).name !== 'AbortError') console.error('Suggest error:', error);
+      }
+    }, 120);
+    return () => {
+      clearTimeout(timer);
+      controller.abort();
+    };
+  }, [searchQuery]);
+
+  const handleSearch = async (newPage: number = 1, query: string = searchQuery) => {
+    setShowSuggestions(false);
+    if (!query.trim()) {
       setCurrentView('feed');
       setContents(lastFeedContents);
       return;
@@ -118,7 +155,7 @@ export const Feed: React.FC = () => {
       const token = localStorage.getItem('token');
       
       const response = await fetch(
-        `${API_BASE_URL}/search/arxiv?query=${encodeURIComponent(searchQuery)}&page=${newPage}&page_size=10`,
+        `${API_BASE_URL}/search/arxiv?query=${encodeURIComponent(query)}&page=${newPage}&page_size=10`,
         {
           headers: {
             'Accept': 'application/json',
@@ -159,9 +196,14 @@ export const Feed: React.FC = () => {
       }
       
       const token = localStorage.getItem('token');
-      const excludeIds = Array.from(shownContentIds).join(',');
+      if (page === 1) {
+        recommendationCursor.current = null;
+      }
+      // Papers already shown are tracked server-side under the feed session
+      const sessionParam = feedSession.current ? `&session=${feedSession.current}` : '';
+      const cursorParam = recommendationCursor.current ? `&cursor=${recommendationCursor.current}` : '';
       const response = await fetch(
-        `${API_BASE_URL}/api/recommendations?page=${page}&page_size=10&exclude=${excludeIds}`, 
+        `${API_BASE_URL}/api/recommendations?page=${page}&page_size=10${sessionParam}${cursorParam}`, 
         {
           signal: abortController.signal,
           headers: {
@@ -175,15 +217,10 @@ export const Feed: React.FC = () => {
       if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
       
       const data = await response.json();
+      recommendationCursor.current = data.cursor ?? null;
+      feedSession.current = data.session ?? feedSession.current;
       
       if (data.items && Array.isArray(data.items)) {
-        const newIds = data.items.map((item: Content) => item.id);
-        setShownContentIds(prev => {
-          const updatedSet = new Set(Array.from(prev));
-          newIds.forEach((id: number) => updatedSet.add(id));
-          return updatedSet;
-        });
-
         if (isBackground) {
           setNextPageContent(data.items);
         } else {
@@ -255,9 +292,31 @@ export const Feed: React.FC = () => {
             type="text" 
             placeholder="Search academic papers..."
             value={searchQuery}
-            onChange={(e) => setSearchQuery(e.target.value)}
+            onChange={(e) => {
+              setSearchQuery(e.target.value);
+              setShowSuggestions(true);
+            }}
             onKeyPress={(e) => e.key === 'Enter' && handleSearch()}
+            onBlur={() => setShowSuggestions(false)}
           />
+          {showSuggestions && suggestions.length > 0 && (
+            <ul className="search-suggestions">
+              {suggestions.map((suggestion) => (
+                <li
+                  key={`${suggestion.kind}:${suggestion.text}`}
+                  // Runs before the input's blur hides the list
+                  onMouseDown={(e) => {
+                    e.preventDefault();
+                    setSearchQuery(suggestion.text);
+                    handleSearch(1, suggestion.text);
+                  }}
+                >
+                  <span>{suggestion.text}</span>
+                  <span className="suggestion-kind">{suggestion.kind}</span>
+                </li>
+              ))}
+            </ul>
+          )}
           <button 
             className="search-button"
             onClick={() => handleSearch()}
@@ -301,7 +360,7 @@ export const Feed: React.FC = () => {
           onSearch={(query: string) => {
             setShowProfile(false);
             setSearchQuery(query);
-            handleSearch(1);
+            handleSearch(1, query);
           }}
           onLogout={handleLogout}
         />
@@ -0,0 +1,106 @@
+"""Local stand-in for the arXiv API serving canned Atom pages."""
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from xml.sax.saxutils import escape
+
+
+def make_papers(category, count, newest=datetime(2024, 6, 1, tzinfo=timezone.utc)):
+    """`count` papers of `category`, one hour apart, newest first."""
+    return [
+        {
+            'id': f"http://arxiv.org/abs/{category}/{count - i:05d}v1",
+            'title': f"{category} paper {count - i}",
+            'published': newest - timedelta(hours=i),
+            'category': category,
+        }
+        for i in range(count)
+    ]
+
+
+def atom_feed(papers):
+    entries = "".join(
+        f"""
+  <entry>
+    <id>{escape(paper['id'])}</id>
+    <published>{paper['published'].strftime('%Y-%m-%dT%H:%M:%SZ')}</published>
+    <title>{escape(paper['title'])}</title>
+    <summary>Abstract of {escape(paper['title'])}</summary>
+    <author><name>Ada Lovelace</name></author>
+    <link title="pdf" href="{escape(paper['id'].replace('/abs/', '/pdf/'))}"/>
+    <category term="{escape(paper['category'])}"/>
+  </entry>"""
+        for paper in papers
+    )
+    return f'<?xml version="1.0" encoding="UTF-8"?>\n<feed xmlns="http://www.w3.org/2005/Atom">{entries}\n</feed>'
+
+
+class ArxivServer:
+    """
+    Serves `papers` ({category: papers newest first}) the way the API pages them,
+    recording every request. `failures` lists status codes returned, in order,
+    before the real responses.
+    """
+
+    def __init__(self, papers):
+        self.papers = papers
+        self.failures = []
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                params = {key: values[0] for key, values in parse_qs(urlparse(self.path).query).items()}
+                server.requests.append((threading.get_ident(), params, time.monotonic()))
+                if server.failures:
+                    self.send_response(server.failures.pop(0))
+                    self.send_header("Retry-After", "0")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                body = atom_feed(server.page(params)).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/atom+xml")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}/api/query"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, args=(0.05,), daemon=True)
+
+    def page(self, params):
+        if 'id_list' in params:
+            # Looked up by id across categories, versions ignored, in the order asked for
+            wanted = params['id_list'].split(',')
+            by_id = {paper['id'].split('/abs/')[1].rsplit('v', 1)[0]: paper
+                     for papers in self.papers.values() for paper in papers}
+            return [by_id[arxiv_id] for arxiv_id in wanted if arxiv_id in by_id]
+        query = params['search_query']
+        category = query.split()[0].removeprefix('cat:')
+        papers = self.papers.get(category, [])
+        if 'submittedDate:[' in query:
+            low, high = query.split('submittedDate:[')[1].rstrip(']').split(' TO ')
+            low, high = (datetime.strptime(value, '%Y%m%d%H%M').replace(tzinfo=timezone.utc) for value in (low, high))
+            # Minute resolution, inclusive at both ends
+            papers = [paper for paper in papers if low <= paper['published'] < high + timedelta(minutes=1)]
+        if params.get('sortOrder') == 'ascending':
+            papers = papers[::-1]
+        start, count = int(params.get('start', 0)), int(params.get('max_results', 10))
+        return papers[start:start + count]
+
+    def starts(self):
+        return [int(params['start']) for _, params, _ in self.requests]
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
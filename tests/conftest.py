@@ -0,0 +1,107 @@
+import asyncio
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+import pytest
+
+# Module-level settings are read at import time, so point every database and
+# on-disk artifact at a scratch directory before anything under src/ is imported
+_SCRATCH = tempfile.mkdtemp(prefix="knowledge_tok_tests_")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{_SCRATCH}/users.db"
+os.environ["ARTICLES_DATABASE_URL"] = f"sqlite+aiosqlite:///{_SCRATCH}/articles.db"
+os.environ["EMBEDDING_CACHE_PATH"] = os.path.join(_SCRATCH, "embedding_cache.db")
+os.environ["EMBEDDING_STORE_DIR"] = os.path.join(_SCRATCH, "embedding_store")
+os.environ["ANN_INDEX_PATH"] = os.path.join(_SCRATCH, "ann_index.npz")
+os.environ["QUANTIZATION_PATH"] = os.path.join(_SCRATCH, "quantized_embeddings.npz")
+os.environ["EMBEDDING_CHECKPOINT_PATH"] = os.path.join(_SCRATCH, "embedding_checkpoint.json")
+# The API builds its mail settings at import; nothing is sent in tests
+os.environ.setdefault("MAIL_USERNAME", "test")
+os.environ.setdefault("MAIL_PASSWORD", "test")
+os.environ.setdefault("MAIL_FROM", "test@example.com")
+os.environ.setdefault("MAIL_SERVER", "localhost")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+from sqlalchemy.pool import NullPool  # noqa: E402
+
+from src.backend.models import Base  # noqa: E402
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    """Session factory over a fresh SQLite database with every table created."""
+    # NullPool: each test drives its coroutines with asyncio.run, and pooled
+    # aiosqlite connections can't be shared between event loops
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/articles.db", poolclass=NullPool)
+
+    async def create():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    asyncio.run(create())
+    yield sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    asyncio.run(engine.dispose())
+
+
+@pytest.fixture
+def database_url(tmp_path, session_factory):
+    """URL of the session_factory database, for code that creates its own engine."""
+    return f"sqlite+aiosqlite:///{tmp_path}/articles.db"
+
+
+@pytest.fixture
+def default_store():
+    """The store directory the API reads (a scratch path under the test settings), emptied around the test."""
+    from src.backend import embedding_store
+    shutil.rmtree(embedding_store.EMBEDDING_STORE_DIR, ignore_errors=True)
+    yield embedding_store.EMBEDDING_STORE_DIR
+    shutil.rmtree(embedding_store.EMBEDDING_STORE_DIR, ignore_errors=True)
+
+
+@pytest.fixture
+def embedding_cache(tmp_path, monkeypatch):
+    """An empty embedding cache in place of the shared one."""
+    from src.backend import embedding_cache as cache_module
+    cache = cache_module.EmbeddingCache(path=str(tmp_path / "embedding_cache.db"))
+    monkeypatch.setattr(cache_module, "embedding_cache", cache)
+    return cache
+
+
+class FakeModel:
+    """
+    Stand-in for a SentenceTransformer: deterministic vectors derived from the
+    text, and a record of every batch it was asked to encode.
+    """
+
+    dim = 8
+
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, texts, **kwargs):
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        self.calls.append(texts)
+        vectors = []
+        for text in texts:
+            seed = int.from_bytes(hashlib.sha256(text.encode()).digest()[:4], 'little')
+            rng = np.random.default_rng(seed)
+            vectors.append(rng.standard_normal(self.dim).astype(np.float32))
+        vectors = np.array(vectors, dtype=np.float32).reshape(len(texts), self.dim)
+        return vectors[0] if single else vectors
+
+
+@pytest.fixture
+def fake_model(monkeypatch):
+    """Installs a FakeModel as the shared encoder so nothing loads sentence-transformers."""
+    from src.backend import encoder
+    model = FakeModel()
+    monkeypatch.setattr(encoder, "_model", model)
+    return model
+
@@ -0,0 +1,143 @@
+import asyncio
+import os
+import threading
+
+import numpy as np
+
+from src.backend import ann_index, vector_index
+from src.backend.ann_index import IVFIndex, load_or_build, spherical_kmeans
+from src.backend.models import Content
+from src.backend.vector_index import EmbeddingIndex, normalize_rows
+
+
+def unit_corpus(n=2000, dim=16, seed=0):
+    rng = np.random.default_rng(seed)
+    return np.arange(1, n + 1), normalize_rows(rng.standard_normal((n, dim)))
+
+
+def test_spherical_kmeans_returns_unit_centroids():
+    _, matrix = unit_corpus(500)
+    centroids = spherical_kmeans(matrix, 8)
+    assert centroids.shape == (8, 16)
+    np.testing.assert_allclose(np.linalg.norm(centroids, axis=1), 1.0, rtol=1e-5)
+
+
+def test_build_files_every_row_under_exactly_one_list():
+    ids, matrix = unit_corpus()
+    ivf = IVFIndex.build(ids, matrix, n_lists=20)
+    assert ivf.offsets[-1] == len(ids)
+    assert sorted(ivf.rows.tolist()) == list(range(len(ids)))
+    # Probing every list is an exhaustive scan
+    assert sorted(ivf.candidate_rows(matrix[0], nprobe=20).tolist()) == list(range(len(ids)))
+    assert 0 < len(ivf.candidate_rows(matrix[0], nprobe=2)) < len(ids)
+
+
+def test_ann_search_finds_the_query_row_itself():
+    ids, matrix = unit_corpus()
+    index = EmbeddingIndex(ids, matrix, normalized=True)
+    index.ann = IVFIndex.build(ids, matrix, n_lists=20)
+    hits = sum(index.search(matrix[row], limit=1, nprobe=4)[0][0] == ids[row] for row in range(0, 2000, 50))
+    assert hits == 40
+
+
+def test_save_and_load_round_trip(tmp_path):
+    ids, matrix = unit_corpus(300)
+    path = str(tmp_path / "ann.npz")
+    ivf = IVFIndex.build(ids, matrix, n_lists=5)
+    ivf.save(path)
+    loaded = IVFIndex.load(path)
+    np.testing.assert_array_equal(loaded.rows, ivf.rows)
+    assert loaded.matches(np.concatenate([ids, [10**6]]))
+    assert not loaded.matches(ids[1:])
+
+
+def test_concurrent_saves_do_not_clobber_each_other(tmp_path):
+    ids, matrix = unit_corpus(300)
+    path = str(tmp_path / "ann.npz")
+    indexes = [IVFIndex.build(ids, matrix, n_lists=n) for n in (4, 5, 6, 7)]
+    errors = []
+
+    def save(ivf):
+        try:
+            for _ in range(20):
+                ivf.save(path)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=save, args=(ivf,)) for ivf in indexes]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert IVFIndex.load(path).n_lists in (4, 5, 6, 7)
+    assert os.listdir(tmp_path) == ["ann.npz"]
+
+
+def test_load_or_build_reuses_a_fresh_index_and_rebuilds_a_stale_one(tmp_path, monkeypatch):
+    ids, matrix = unit_corpus(300)
+    path = str(tmp_path / "ann.npz")
+    first = load_or_build(ids, matrix, path)
+    built = []
+    monkeypatch.setattr(IVFIndex, "build", classmethod(lambda cls, *args, **kw: built.append(1) or first))
+
+    load_or_build(np.concatenate([ids, [1000]]), matrix, path)
+    assert not built
+    load_or_build(np.arange(1, 1000), matrix, path)
+    assert built
+
+
+def test_get_index_builds_the_ivf_index_in_the_background(session_factory, monkeypatch, tmp_path):
+    monkeypatch.setattr(ann_index, "ANN_ENGINE", "ivf")
+    monkeypatch.setattr(ann_index, "ANN_MIN_ROWS", 100)
+    monkeypatch.setattr(ann_index, "ANN_INDEX_PATH", str(tmp_path / "ann.npz"))
+    monkeypatch.setattr(vector_index, "_index", None)
+    ids, matrix = unit_corpus(400)
+
+    async def run():
+        async with session_factory() as session:
+            session.add_all([
+                Content(id=int(content_id), title=str(content_id), external_id=str(content_id), embedding=row)
+                for content_id, row in zip(ids, matrix)
+            ])
+            await session.commit()
+            index = await vector_index.get_index(session)
+            # The query path only schedules the build
+            assert index.ann is None and index._maintenance is not None
+            await index._maintenance
+            return index
+
+    index = asyncio.run(run())
+    assert index.ann is not None and index.ann.n_rows == 400
+    assert index.search(matrix[10], limit=1)[0].tolist() == [11]
+
+
+def test_background_compaction_keeps_rows_added_while_it_runs():
+    ids, matrix = unit_corpus(300)
+    index = EmbeddingIndex(ids, matrix, normalized=True)
+    index.add([5, 1000], matrix[:2])
+
+    async def run():
+        task = asyncio.create_task(index.compact_async())
+        await asyncio.sleep(0)
+        # Lands in the journal while the merge runs in its worker thread
+        index.add([2000], [matrix[7]])
+        await task
+
+    asyncio.run(run())
+    assert len(index.delta_ids) == 1 and len(index.ids) == 301
+    assert sorted(index.search(matrix[7], limit=2)[0].tolist()) == [8, 2000]
+    # id 5 was re-added with row 0's vector before the compaction
+    assert sorted(index.search(matrix[0], limit=2)[0].tolist()) == [1, 5]
+
+
+def test_rows_after_the_trained_prefix_are_still_scored():
+    ids, matrix = unit_corpus(600)
+    # Index persisted when the base had 500 rows, reused after the store grew
+    trained = IVFIndex.build(ids[:500], matrix[:500], n_lists=10)
+    assert trained.matches(ids)
+    index = EmbeddingIndex(ids, matrix, normalized=True)
+    index.ann = trained
+    for row in (500, 550, 599):
+        assert index.search(matrix[row], limit=1, nprobe=1)[0].tolist() == [ids[row]]
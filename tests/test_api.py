@@ -0,0 +1,193 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, text
+
+fastapi_testclient = pytest.importorskip("fastapi.testclient")
+
+from src.backend import auth, category_index, encoder, main, suggest_index, utils, vector_index  # noqa: E402
+from src.backend.database import get_articles_db  # noqa: E402
+from src.backend.models import Content, Interaction, User  # noqa: E402
+from src.backend.search_index import create_fts  # noqa: E402
+
+NEWEST = datetime(2024, 6, 1)
+
+
+def paper(content_id, categories=('cs.LG',), embedding=None):
+    return Content(
+        id=content_id, title=f"Paper {content_id}", abstract=f"Abstract {content_id}",
+        external_id=str(content_id), url=f"http://arxiv.org/pdf/{content_id}", source='arxiv',
+        published_date=NEWEST - timedelta(hours=content_id),
+        paper_metadata={'categories': list(categories), 'authors': ['Ada Lovelace'], 'paper_id': str(content_id)},
+        embedding=embedding
+    )
+
+
+@pytest.fixture
+def api(session_factory, monkeypatch):
+    """
+    Client for the API over the session_factory database, without the startup
+    hook. `api.user` is the signed-in user (None for anonymous requests).
+    """
+    monkeypatch.setattr(vector_index, "_index", None)
+    monkeypatch.setattr(category_index, "_index", None)
+    monkeypatch.setattr(suggest_index, "_index", None)
+
+    async def articles_db():
+        async with session_factory() as session:
+            yield session
+
+    client = fastapi_testclient.TestClient(main.app)
+    client.user = None
+    main.app.dependency_overrides[get_articles_db] = articles_db
+    main.app.dependency_overrides[auth.get_current_user] = lambda: client.user
+    yield client
+    main.app.dependency_overrides.clear()
+
+
+def seed(session_factory, rows):
+    async def run():
+        async with session_factory() as session:
+            session.add_all(rows)
+            await session.commit()
+    asyncio.run(run())
+
+
+def embedded_corpus(count=40, dim=8):
+    rng = np.random.default_rng(0)
+    return [paper(content_id, embedding=rng.standard_normal(dim).astype(np.float32))
+            for content_id in range(1, count + 1)]
+
+
+def test_recommendation_pages_slice_the_ranking_behind_the_cursor(api, session_factory, monkeypatch):
+    seed(session_factory, embedded_corpus() + [Interaction(user_id=7, content_id=1, interaction_type='like')])
+    api.user = User(id=7, username='reader')
+    rankings = []
+    rank_content_ids = main.rank_content_ids
+
+    async def counted(*args, **kwargs):
+        rankings.append(kwargs)
+        return await rank_content_ids(*args, **kwargs)
+
+    monkeypatch.setattr(main, "rank_content_ids", counted)
+
+    first = api.get("/api/recommendations", params={'page_size': 5}).json()
+    second = api.get("/api/recommendations", params={
+        'page': 2, 'page_size': 5, 'cursor': first['cursor'], 'session': first['session']
+    }).json()
+
+    assert len(rankings) == 1
+    assert second['cursor'] == first['cursor'] and first['has_more']
+    first_ids = [item['id'] for item in first['items']]
+    second_ids = [item['id'] for item in second['items']]
+    assert len(first_ids) == len(second_ids) == 5
+    assert not set(first_ids) & set(second_ids) and 1 not in first_ids + second_ids
+
+
+def test_feed_session_carries_what_was_shown_between_requests(api, session_factory):
+    seed(session_factory, [paper(content_id) for content_id in range(1, 13)])
+
+    first = api.get("/api/recommendations", params={'page_size': 5}).json()
+    # Any worker continues the session: it lives in the database, not in this process
+    second = api.get("/api/recommendations", params={'page_size': 5, 'session': first['session']}).json()
+    fresh = api.get("/api/recommendations", params={'page_size': 5, 'exclude': '1,2'}).json()
+
+    assert [item['id'] for item in first['items']] == [1, 2, 3, 4, 5]
+    assert second['session'] == first['session']
+    assert [item['id'] for item in second['items']] == [6, 7, 8, 9, 10] and second['has_more']
+    # A request without the session starts a new one; older clients' exclude list still applies
+    assert fresh['session'] != first['session']
+    assert [item['id'] for item in fresh['items']] == [3, 4, 5, 6, 7]
+
+
+def test_category_filters_the_feed_and_the_content_listing(api, session_factory):
+    seed(session_factory, [
+        paper(content_id, ('stat.ML',) if content_id % 3 == 0 else ('cs.LG', 'cs.AI'))
+        for content_id in range(1, 13)
+    ] + [Interaction(user_id=7, content_id=6, interaction_type='not_interested')])
+
+    feed = api.get("/api/recommendations", params={'page_size': 3, 'category': 'stat.ML'}).json()
+    assert [item['id'] for item in feed['items']] == [3, 6, 9]
+    assert feed['total'] == 4 and feed['has_more']
+
+    listing = api.get("/api/content", params={'limit': 3, 'category': 'cs.AI,stat.ML'}).json()
+    assert [item['id'] for item in listing['items']] == [1, 2, 3] and listing['total'] == 12
+    # A signed-in user's interactions are left out of the listing
+    api.user = User(id=7, username='reader')
+    listing = api.get("/api/content", params={'page': 2, 'limit': 4, 'category': 'stat.ML'}).json()
+    assert listing['items'] == [] and listing['total'] == 3 and not listing['has_more']
+    first = api.get("/api/content", params={'limit': 4, 'category': 'stat.ML'}).json()
+    assert [item['id'] for item in first['items']] == [3, 9, 12]
+
+
+def test_readiness_reports_the_encoder_without_loading_it(api, fake_model, monkeypatch):
+    monkeypatch.setattr(encoder, "_model", None)
+    monkeypatch.setattr(encoder, "get_model", lambda: pytest.fail("readiness must not load the model"))
+    assert api.get("/api/health/ready").json() == {"status": "ok", "encoder_loaded": False}
+
+    monkeypatch.setattr(encoder, "_model", fake_model)
+    assert api.get("/api/health/ready").json() == {"status": "ok", "encoder_loaded": True}
+
+
+def test_encoder_metrics_count_the_batches_served(api, fake_model, monkeypatch):
+    service = encoder.EncoderService(window_ms=1)
+    monkeypatch.setattr(encoder, "encoder_service", service)
+    asyncio.run(service.encode(["a", "b", "c"]))
+
+    metrics = api.get("/api/encoder/metrics").json()
+    assert metrics == {
+        "encoder_loaded": True, "queue_depth": 0, "batches": 1, "texts_encoded": 3,
+        "mean_batch_size": 3.0, "last_batch_size": 3, "max_batch_size": 3
+    }
+
+
+def test_search_modes_and_fusion(api, session_factory, tmp_path, embedding_cache, fake_model, monkeypatch):
+    monkeypatch.setattr(utils, "embedding_cache", embedding_cache)
+    monkeypatch.setattr(encoder, "encoder_service", encoder.EncoderService(window_ms=1))
+    engine = create_engine(f"sqlite:///{tmp_path}/articles.db")
+    with engine.begin() as connection:
+        create_fts(connection)
+    engine.dispose()
+    query_vector = fake_model.encode("graph learning")
+    seed(session_factory, [
+        paper(1), paper(2, embedding=query_vector), paper(3, embedding=-query_vector), paper(4, embedding=query_vector)
+    ])
+
+    async def retitle():
+        async with session_factory() as session:
+            await session.execute(text("UPDATE content SET title = 'Graph learning' WHERE id IN (1, 2, 3)"))
+            await session.commit()
+    asyncio.run(retitle())
+
+    lexical = api.get("/search/arxiv", params={'query': 'graph learning'}).json()
+    assert sorted(item['id'] for item in lexical['items']) == [1, 2, 3] and lexical['total'] == 3
+
+    hybrid = api.get("/search/arxiv", params={'query': 'graph learning', 'mode': 'hybrid', 'fusion': 'weighted'}).json()
+    # Only lexical matches are candidates; the embedding decides between equal titles
+    assert [item['id'] for item in hybrid['items']][0] == 2 and hybrid['total'] == 3
+
+    assert api.get("/search/arxiv", params={'query': 'graph', 'mode': 'fuzzy'}).status_code == 400
+    assert api.get("/search/arxiv", params={'query': 'graph', 'mode': 'hybrid', 'fusion': 'max'}).status_code == 400
+    assert api.get("/search/arxiv", params={'query': 'of'}).json() == {"items": [], "total": 0, "has_more": False}
+
+
+def test_suggestions_rank_liked_papers_first_and_clamp_the_limit(api, session_factory):
+    rows = [paper(content_id) for content_id in range(1, 31)]
+    for row in rows:
+        row.title = {1: "Graph neural networks", 2: "Graph neural networks", 3: "Graph neural networks",
+                     4: "Graph kernels", 5: "Graph kernels"}.get(row.id, f"Topic{row.id} study")
+    seed(session_factory, rows + [Interaction(user_id=7, content_id=4, interaction_type='save')])
+
+    response = api.get("/search/suggest", params={'q': 'graph', 'limit': 2})
+    assert response.status_code == 200
+    assert response.json() == {"query": "graph", "suggestions": [
+        {"text": "graph", "kind": "title", "count": 5},
+        {"text": "graph kernels", "kind": "title", "count": 2},
+    ]}
+    assert api.get("/search/suggest", params={'q': 'lovelace'}).json()["suggestions"] == [
+        {"text": "Ada Lovelace", "kind": "author", "count": 30}
+    ]
+    assert len(api.get("/search/suggest", params={'q': 'topic', 'limit': 100}).json()["suggestions"]) == 20
+    assert len(api.get("/search/suggest", params={'q': 'topic', 'limit': 0}).json()["suggestions"]) == 1
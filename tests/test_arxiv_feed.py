@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+import requests
+
+from arxiv_server import ArxivServer, make_papers
+from src.backend.arxiv_feed import ArxivClient, TokenBucket, crawl
+
+RATE = 20  # requests per second; fast enough for a test, slow enough to measure
+
+
+def client_for(server, **kwargs):
+    return ArxivClient(server.url, rate_limiter=TokenBucket(rate=RATE), backoff_factor=0.01, **kwargs)
+
+
+def assert_spaced(server):
+    times = sorted(when for _, _, when in server.requests)
+    gaps = [later - earlier for earlier, later in zip(times, times[1:])]
+    # Arrival times at the server jitter with connection setup, so check the
+    # overall rate strictly and single gaps loosely
+    assert (times[-1] - times[0]) >= (len(times) - 1) / RATE * 0.95
+    assert min(gaps) >= 0.5 / RATE
+
+
+def test_pages_until_a_short_page_under_the_rate_limit():
+    with ArxivServer({'cs.LG': make_papers('cs.LG', 250)}) as server:
+        client = client_for(server)
+        papers = asyncio.run(client.fetch_category('cs.LG', max_results=1000, page_size=100))
+        client.close()
+
+    assert server.starts() == [0, 100, 200]
+    assert len(papers) == 250 and papers[0]['title'] == 'cs.LG paper 250'
+    assert len({paper['external_id'] for paper in papers}) == 250
+    assert_spaced(server)
+
+
+def test_max_results_caps_the_last_page():
+    with ArxivServer({'cs.LG': make_papers('cs.LG', 250)}) as server:
+        client = client_for(server)
+        papers = asyncio.run(client.fetch_category('cs.LG', max_results=130, page_size=100))
+        client.close()
+
+    assert [params['max_results'] for _, params, _ in server.requests] == ['100', '30']
+    assert len(papers) == 130
+
+
+def test_retries_go_through_the_rate_limiter():
+    with ArxivServer({'cs.LG': make_papers('cs.LG', 5)}) as server:
+        server.failures = [503, 429]
+        client = client_for(server)
+        papers = asyncio.run(client.fetch_category('cs.LG', max_results=10))
+        client.close()
+
+    assert len(server.requests) == 3 and len(papers) == 5
+    assert_spaced(server)
+
+
+def test_gives_up_after_the_configured_retries():
+    with ArxivServer({}) as server:
+        server.failures = [500] * 10
+        client = client_for(server, retries=2)
+        with pytest.raises(requests.HTTPError):
+            asyncio.run(client.query(search_query='cat:cs.LG'))
+        client.close()
+    assert len(server.requests) == 3
+
+
+def test_crawl_shares_one_rate_limit_across_categories():
+    categories = {name: make_papers(name, 30) for name in ('cs.LG', 'cs.CV', 'math.CO', 'stat.ML')}
+    stored = {}
+
+    async def on_papers(category, papers):
+        stored[category] = papers
+
+    with ArxivServer(categories) as server:
+        client = client_for(server)
+        counts = asyncio.run(crawl(list(categories), max_results=30, concurrency=4, client=client, on_papers=on_papers))
+        client.close()
+
+    assert counts == {name: 30 for name in categories}
+    assert {paper['paper_metadata']['categories'][0] for paper in stored['math.CO']} == {'math.CO'}
+    assert_spaced(server)
+
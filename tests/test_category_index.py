@@ -0,0 +1,63 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import update
+
+from src.backend.category_index import CategoryIndex, category_keys, parse_categories, utc_timestamp
+from src.backend.models import Content
+
+
+def test_papers_are_filed_under_their_codes_and_archives():
+    assert category_keys(['cs.LG', 'stat.ML']) == {'cs.LG', 'cs', 'stat.ML', 'stat'}
+    assert parse_categories(' cs.LG, ,math.CO') == ['cs.LG', 'math.CO']
+
+
+def test_naive_and_aware_times_are_both_utc():
+    naive = datetime(2024, 5, 1, 12, 0)
+    assert utc_timestamp(naive) == utc_timestamp(naive.replace(tzinfo=timezone.utc))
+    assert utc_timestamp(datetime(2024, 5, 1, 14, 0, tzinfo=timezone(timedelta(hours=2)))) == utc_timestamp(naive)
+    assert utc_timestamp(None) == 0.0
+
+
+def test_newest_first_mixes_database_and_feed_times():
+    index = CategoryIndex()
+    # Loaded from the database (naive UTC) and parsed from the feed (aware) respectively
+    index.add(1, ['cs.LG'], datetime(2024, 5, 1, 12, 0))
+    index.add(2, ['cs.LG'], datetime(2024, 5, 1, 11, 0, tzinfo=timezone.utc))
+    index.add(3, ['cs.CV'], datetime(2024, 5, 1, 13, 0, tzinfo=timezone.utc))
+    assert index.newest_first(['cs.LG']).tolist() == [1, 2]
+    assert index.newest_first(['cs']).tolist() == [3, 1, 2]
+
+
+def test_refiled_paper_leaves_its_old_categories():
+    index = CategoryIndex()
+    index.add(1, ['cs.LG'])
+    index.add(2, ['cs.LG'])
+    assert index.ids_for(['cs.LG']).tolist() == [1, 2]
+    index.add(1, ['math.CO'])
+    assert index.ids_for(['cs.LG']).tolist() == [2]
+    assert index.ids_for(['math']).tolist() == [1]
+    assert len(index.ids) == 2
+
+
+def test_refresh_files_papers_whose_metadata_was_filled_in_later(session_factory):
+    async def run():
+        async with session_factory() as db:
+            db.add_all([
+                Content(id=1, title='a', external_id='a', paper_metadata={'categories': ['cs.LG']}),
+                Content(id=2, title='b', external_id='b'),
+            ])
+            await db.commit()
+            index = await CategoryIndex.from_db(db)
+            assert index.ids_for(['cs']).tolist() == [1] and index.unfiled == {2}
+
+            # Another process enriches paper 2 without adding any row
+            await db.execute(update(Content).where(Content.id == 2).values(paper_metadata={'categories': ['cs.CV']}))
+            await db.commit()
+            await index.refresh(db, force=True)
+            return index
+
+    index = asyncio.run(run())
+    assert index.ids_for(['cs']).tolist() == [1, 2]
+    assert index.ids_for(['cs.CV']).tolist() == [2]
+    assert not index.unfiled
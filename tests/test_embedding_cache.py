@@ -0,0 +1,72 @@
+import asyncio
+import sqlite3
+import threading
+
+import numpy as np
+
+from src.backend.embedding_cache import EmbeddingCache, encode_papers, normalize_text
+
+
+def test_keys_ignore_whitespace_and_depend_on_the_model(tmp_path):
+    cache = EmbeddingCache(path=str(tmp_path / "cache.db"), model_name="a")
+    assert normalize_text("  Deep\n\tlearning ") == "Deep learning"
+    assert cache.key("Deep  learning") == cache.key(" Deep learning\n")
+    assert cache.key("Deep learning") != cache.key("deep learning")
+    other = EmbeddingCache(path=str(tmp_path / "cache.db"), model_name="b")
+    assert other.key("Deep learning") != cache.key("Deep learning")
+
+
+def test_each_distinct_text_is_encoded_once(embedding_cache, fake_model):
+    vectors = embedding_cache.encode(["x", "y", "x"])
+    assert fake_model.calls == [["x", "y"]]
+    np.testing.assert_array_equal(vectors[0], vectors[2])
+
+    embedding_cache.encode(["y", "z"])
+    assert fake_model.calls[1:] == [["z"]]
+
+
+def test_entries_outlive_the_process_tier(embedding_cache, fake_model):
+    embedding_cache.encode(["persisted"])
+    # A second process sharing the file: empty LRU, same table
+    other = EmbeddingCache(path=embedding_cache.path, model_name=embedding_cache.model_name, max_entries=1)
+    cached = other.get_many(["persisted"])[0]
+    assert len(fake_model.calls) == 1
+    np.testing.assert_array_equal(cached, fake_model.encode("persisted"))
+
+    with sqlite3.connect(embedding_cache.path) as conn:
+        assert conn.execute("SELECT count(*) FROM embeddings").fetchone()[0] == 1
+
+
+def test_lru_tier_is_bounded(tmp_path, fake_model):
+    cache = EmbeddingCache(path=str(tmp_path / "cache.db"), max_entries=2)
+    cache.encode(["a", "b", "c"])
+    assert list(cache._lru) == [cache.key("b"), cache.key("c")]
+
+
+def test_paper_embedding_is_the_mean_of_title_and_abstract(embedding_cache, fake_model):
+    vectors = encode_papers(["t1", "t2"], ["a1", "a2"])
+    assert fake_model.calls == [["t1", "t2", "a1", "a2"]]
+    np.testing.assert_allclose(vectors[1], (fake_model.encode("t2") + fake_model.encode("a2")) / 2, rtol=1e-6)
+
+
+def test_async_encoding_keeps_sqlite_off_the_event_loop(embedding_cache, fake_model, monkeypatch):
+    from src.backend import encoder
+    monkeypatch.setattr(encoder, "encoder_service", encoder.EncoderService(window_ms=1))
+    sqlite_threads = []
+    connection = embedding_cache._connection
+
+    def tracked_connection():
+        sqlite_threads.append(threading.current_thread())
+        return connection()
+
+    monkeypatch.setattr(embedding_cache, "_connection", tracked_connection)
+
+    async def run():
+        first = await embedding_cache.encode_async(["q", "r", "q"])
+        second = await embedding_cache.encode_async(["r"])
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert fake_model.calls == [["q", "r"]]
+    np.testing.assert_array_equal(first[1], second[0])
+    assert sqlite_threads and threading.main_thread() not in sqlite_threads
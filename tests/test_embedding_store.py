@@ -0,0 +1,50 @@
+import asyncio
+import os
+
+import numpy as np
+
+from src.backend import embedding_store
+from src.backend.models import Content
+from src.backend.vector_index import EmbeddingIndex, normalize_rows
+
+
+def test_write_store_publishes_a_memory_mapped_generation(tmp_path):
+    directory = str(tmp_path)
+    assert embedding_store.open_store(directory) is None
+
+    matrix = normalize_rows(np.arange(12).reshape(4, 3))
+    generation = embedding_store.write_store([1, 2, 3, 4], matrix, directory)
+    assert embedding_store.current_generation(directory) == generation
+
+    opened, ids, mapped = embedding_store.open_store(directory)
+    assert opened == generation and ids.tolist() == [1, 2, 3, 4]
+    assert isinstance(mapped, np.memmap) and not mapped.flags.writeable
+    np.testing.assert_array_equal(mapped, matrix)
+
+
+def test_old_generations_are_pruned(tmp_path):
+    directory = str(tmp_path)
+    generations = [embedding_store.write_store([1], [[1.0, 0.0]], directory) for _ in range(4)]
+    kept = sorted(name for name in os.listdir(directory) if name.startswith("gen-"))
+    assert len(kept) == embedding_store.KEEP_GENERATIONS
+    assert generations[-1] in kept
+
+
+def test_index_maps_the_store_and_loads_newer_rows_into_the_delta(session_factory, default_store):
+    async def run():
+        async with session_factory() as session:
+            session.add_all([
+                Content(id=i, title=str(i), external_id=str(i), embedding=np.eye(4, dtype=np.float32)[i - 1])
+                for i in (1, 2, 3)
+            ])
+            await session.commit()
+            await embedding_store.export_store(session)
+            # Embedded after the export
+            session.add(Content(id=4, title='4', external_id='4', embedding=np.eye(4, dtype=np.float32)[3]))
+            await session.commit()
+            return await EmbeddingIndex.from_db(session)
+
+    index = asyncio.run(run())
+    assert index.generation is not None and isinstance(index.matrix, np.memmap)
+    assert index.ids.tolist() == [1, 2, 3] and index.delta_ids.tolist() == [4]
+    assert index.search([0, 0, 0, 1], limit=1)[0].tolist() == [4]
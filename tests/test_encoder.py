@@ -0,0 +1,93 @@
+import asyncio
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from src.backend import encoder
+from src.backend.encoder import EncoderService
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_importing_the_serving_modules_does_not_load_the_model():
+    code = (
+        "import sys; import src.backend.utils, src.backend.vector_index, src.backend.embedding_cache; "
+        "print(sorted({'torch', 'sentence_transformers'} & set(sys.modules)))"
+    )
+    output = subprocess.run([sys.executable, "-c", code], cwd=REPO_ROOT, env=os.environ,
+                            capture_output=True, text=True, check=True).stdout
+    assert output.strip() == "[]"
+
+
+def test_model_is_loaded_once_on_first_use(monkeypatch):
+    loads = []
+
+    def slow_load(model_name):
+        loads.append(model_name)
+        time.sleep(0.05)
+        return object()
+
+    monkeypatch.setattr(encoder, "_model", None)
+    monkeypatch.setitem(encoder.BACKENDS, "torch", slow_load)
+    assert not encoder.is_loaded()
+
+    models = []
+    threads = [threading.Thread(target=lambda: models.append(encoder.get_model())) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert loads == [encoder.EMBEDDING_MODEL]
+    assert len({id(model) for model in models}) == 1 and encoder.is_loaded()
+
+
+def test_warm_up_loads_the_model_off_the_event_loop(monkeypatch):
+    monkeypatch.setattr(encoder, "_model", None)
+    loaded_on = []
+    monkeypatch.setitem(encoder.BACKENDS, "torch", lambda name: loaded_on.append(threading.current_thread()) or object())
+    asyncio.run(encoder.warm_up())
+    assert encoder.is_loaded() and loaded_on[0] is not threading.main_thread()
+
+
+def test_backends_are_validated_and_get_their_own_model_id():
+    with pytest.raises(ValueError):
+        encoder.load_model("tpu")
+    assert encoder.model_id("torch", "m") == "m"
+    assert encoder.model_id("onnx", "m") == "m@onnx"
+
+
+def test_concurrent_requests_share_one_batch(fake_model):
+    service = EncoderService(window_ms=50, max_batch=64)
+
+    async def run():
+        return await asyncio.gather(
+            service.encode(["a", "b"]), service.encode(["c"]), service.encode(["d", "e", "f"])
+        )
+
+    results = asyncio.run(run())
+    assert fake_model.calls == [["a", "b", "c", "d", "e", "f"]]
+    assert [len(vectors) for vectors in results] == [2, 1, 3]
+    np.testing.assert_array_equal(results[1][0], fake_model.encode("c"))
+    assert service.metrics()["batches"] == 1 and service.metrics()["max_batch_size"] == 6
+
+
+def test_batches_are_capped_and_errors_reach_every_waiter(fake_model, monkeypatch):
+    service = EncoderService(window_ms=50, max_batch=2)
+
+    async def run():
+        return await asyncio.gather(*(service.encode([text]) for text in "abcde"))
+
+    asyncio.run(run())
+    assert all(len(call) <= 2 for call in fake_model.calls) and sum(map(len, fake_model.calls)) == 5
+
+    monkeypatch.setattr(fake_model, "encode", lambda texts, **kwargs: 1 / 0)
+
+    async def failing():
+        return await asyncio.gather(service.encode(["x"]), service.encode(["y"]), return_exceptions=True)
+
+    assert all(isinstance(result, ZeroDivisionError) for result in asyncio.run(failing()))
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from src.backend import encoder
+from src.backend.scripts import benchmark_encoders as benchmark
+
+
+class NormalizedModel:
+    """Deterministic unit vectors per text, optionally perturbed like a quantized backend."""
+
+    def __init__(self, noise=0.0):
+        self.noise = noise
+
+    def encode(self, texts, **kwargs):
+        vectors = []
+        for text in texts:
+            rng = np.random.default_rng(sum(map(ord, text)))
+            vector = rng.standard_normal(16) + self.noise * np.random.default_rng(len(text)).standard_normal(16)
+            vectors.append(vector / np.linalg.norm(vector))
+        return np.array(vectors, dtype=np.float32)
+
+
+def test_load_model_dispatches_on_the_backend(monkeypatch):
+    loaded = []
+    for name in encoder.BACKENDS:
+        monkeypatch.setitem(encoder.BACKENDS, name, lambda model_name, name=name: loaded.append((name, model_name)))
+    encoder.load_model("torch-int8", "some-model")
+    encoder.load_model("onnx", "other-model")
+    assert loaded == [("torch-int8", "some-model"), ("onnx", "other-model")]
+
+
+def test_onnx_backend_needs_onnxruntime():
+    try:
+        import onnxruntime  # noqa: F401
+        pytest.skip("onnxruntime is installed")
+    except ImportError:
+        pass
+    with pytest.raises(ImportError):
+        encoder.load_onnx(encoder.EMBEDDING_MODEL)
+
+
+def test_benchmark_reports_speed_and_agreement_against_fp32(monkeypatch, capsys):
+    def missing(model_name):
+        raise ImportError("No module named 'onnxruntime'")
+
+    monkeypatch.setitem(encoder.BACKENDS, "torch", lambda model_name: NormalizedModel())
+    monkeypatch.setitem(encoder.BACKENDS, "torch-int8", lambda model_name: NormalizedModel(noise=0.1))
+    monkeypatch.setitem(encoder.BACKENDS, "onnx", missing)
+
+    benchmark.benchmark_encoders([f"text {i}" for i in range(20)], ["onnx", "torch-int8"], batch_size=8, repeats=1)
+    lines = {line.split()[0]: line.split() for line in capsys.readouterr().out.splitlines()[2:]}
+    # fp32 runs first and agrees with itself exactly
+    assert list(lines) == ["torch", "onnx", "torch-int8"]
+    assert float(lines["torch"][3]) == pytest.approx(1.0, abs=1e-4)
+    assert 0.9 < float(lines["torch-int8"][3]) < 1.0
+    assert lines["onnx"][1] == "skipped"
@@ -0,0 +1,117 @@
+import asyncio
+
+from sqlalchemy import select
+
+from arxiv_server import ArxivServer, make_papers
+from src.backend.arxiv_feed import ArxivClient, TokenBucket
+from src.backend.models import Content
+from src.backend.scripts import enrich_existing_data
+from src.backend.scripts.enrich_existing_data import arxiv_id_from_url, enrich_batch, enrich_content
+
+PAPERS = {'cs.LG': make_papers('cs.LG', 7)}
+
+
+def fast_client(*args, **kwargs):
+    return ArxivClient(*args, rate_limiter=TokenBucket(rate=200), backoff_factor=0.01, **kwargs)
+
+
+def add_rows(session_factory, rows):
+    async def run():
+        async with session_factory() as session:
+            session.add_all(rows)
+            await session.commit()
+    asyncio.run(run())
+
+
+def metadata_by_url(session_factory):
+    async def run():
+        async with session_factory() as session:
+            return dict((await session.execute(select(Content.url, Content.paper_metadata))).all())
+    return asyncio.run(run())
+
+
+def stored_without_metadata():
+    return [
+        Content(title=paper['title'], external_id=paper['id'], url=paper['id'].replace('/abs/', '/pdf/'))
+        for paper in PAPERS['cs.LG']
+    ]
+
+
+def test_arxiv_id_from_url_strips_the_version_and_extension():
+    assert arxiv_id_from_url('http://arxiv.org/abs/2401.01234v3') == '2401.01234'
+    assert arxiv_id_from_url('https://arxiv.org/pdf/hep-th/9901001v1.pdf') == 'hep-th/9901001'
+    assert arxiv_id_from_url('http://arxiv.org/abs/2401.01234') == '2401.01234'
+    assert arxiv_id_from_url('https://example.com/paper.pdf') is None
+    assert arxiv_id_from_url(None) is None
+
+
+def test_enrich_batch_looks_up_the_batch_in_one_request(session_factory):
+    rows = stored_without_metadata()[:3] + [
+        Content(title='elsewhere', external_id='elsewhere', url='https://example.com/paper.pdf'),
+        Content(title='unknown', external_id='unknown', url='http://arxiv.org/abs/cs.LG/99999v1'),
+    ]
+    add_rows(session_factory, rows)
+
+    async def run(client):
+        async with session_factory() as session:
+            batch = (await session.execute(select(Content.id, Content.url).order_by(Content.id))).all()
+            return await enrich_batch(session, client, batch)
+
+    with ArxivServer(PAPERS) as server:
+        client = fast_client(server.url)
+        assert asyncio.run(run(client)) == 3
+        client.close()
+
+    assert len(server.requests) == 1
+    assert server.requests[0][1]['id_list'].split(',') == [
+        'cs.LG/00007', 'cs.LG/00006', 'cs.LG/00005', 'cs.LG/99999'
+    ]
+    metadata = metadata_by_url(session_factory)
+    assert metadata['http://arxiv.org/pdf/cs.LG/00007v1']['categories'] == ['cs.LG']
+    assert metadata['http://arxiv.org/pdf/cs.LG/00007v1']['authors'] == ['Ada Lovelace']
+    assert metadata['https://example.com/paper.pdf'] is None
+    assert metadata['http://arxiv.org/abs/cs.LG/99999v1'] is None
+
+
+def test_enrich_content_fills_every_missing_row_in_batched_requests(session_factory, database_url, monkeypatch):
+    monkeypatch.setattr(enrich_existing_data, "ARTICLES_DATABASE_URL", database_url)
+    monkeypatch.setattr(enrich_existing_data, "ArxivClient", fast_client)
+    already = Content(title='done', external_id='done', url='http://arxiv.org/abs/cs.LG/00001v1',
+                      paper_metadata={'categories': ['kept']})
+    add_rows(session_factory, stored_without_metadata() + [already])
+
+    with ArxivServer(PAPERS) as server:
+        asyncio.run(enrich_content(batch_size=2, concurrency=2, base_url=server.url))
+
+    id_lists = [params['id_list'].split(',') for _, params, _ in server.requests]
+    assert len(id_lists) == 4 and all(len(ids) <= 2 for ids in id_lists)
+    assert sorted(sum(id_lists, [])) == sorted(f"cs.LG/{n:05d}" for n in range(1, 8))
+    metadata = metadata_by_url(session_factory)
+    assert all(value is not None for value in metadata.values())
+    assert metadata['http://arxiv.org/abs/cs.LG/00001v1'] == {'categories': ['kept']}
+
+
+def test_a_failed_batch_is_skipped_and_the_rest_committed(session_factory, database_url, monkeypatch):
+    monkeypatch.setattr(enrich_existing_data, "ARTICLES_DATABASE_URL", database_url)
+    monkeypatch.setattr(enrich_existing_data, "ArxivClient", fast_client)
+    add_rows(session_factory, stored_without_metadata())
+
+    with ArxivServer(PAPERS) as server:
+        # Not a retryable status: the first request's batch fails outright
+        server.failures = [400]
+        asyncio.run(enrich_content(batch_size=2, concurrency=2, base_url=server.url))
+
+    missing = [url for url, value in metadata_by_url(session_factory).items() if value is None]
+    assert len(missing) == 2
+
+
+def test_dry_run_only_counts(session_factory, database_url, monkeypatch, capsys):
+    monkeypatch.setattr(enrich_existing_data, "ARTICLES_DATABASE_URL", database_url)
+    monkeypatch.setattr(enrich_existing_data, "ArxivClient", fast_client)
+    add_rows(session_factory, stored_without_metadata())
+
+    with ArxivServer(PAPERS) as server:
+        asyncio.run(enrich_content(base_url=server.url, dry_run=True))
+
+    assert not server.requests
+    assert "Found 7 papers" in capsys.readouterr().out
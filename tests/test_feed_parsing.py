@@ -0,0 +1,96 @@
+import asyncio
+import io
+import xml.etree.ElementTree as ET
+
+from arxiv_server import atom_feed, make_papers
+from src.backend import utils
+from src.backend.arxiv_feed import iter_batches, iter_entries, parse_entry, parse_feed, published_range
+
+ERROR_ENTRY = '''<?xml version="1.0"?>
+<feed xmlns="http://www.w3.org/2005/Atom">
+  <entry><id>http://arxiv.org/api/errors#incorrect_id_format</id><title>Error</title>
+    <summary>incorrect id format for 1234</summary></entry>
+</feed>'''
+
+
+class TrackedReader(io.RawIOBase):
+    """Binary stream that hands out small reads and remembers how far it has been read."""
+
+    def __init__(self, data, chunk=512):
+        self.data, self.chunk, self.position = data, chunk, 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        piece = self.data[self.position:self.position + min(len(buffer), self.chunk)]
+        buffer[:len(piece)] = piece
+        self.position += len(piece)
+        return len(piece)
+
+
+def test_entries_map_to_paper_dicts():
+    xml_data = atom_feed(make_papers('cs.LG', 1)).replace('cs.LG paper 1', 'cs.LG\n   paper   1')
+    [paper] = parse_feed(xml_data)
+    assert paper['title'] == 'cs.LG paper 1'
+    assert paper['url'] == 'http://arxiv.org/pdf/cs.LG/00001v1'
+    assert paper['external_id'] == 'http://arxiv.org/abs/cs.LG/00001v1'
+    assert paper['paper_metadata']['categories'] == ['cs.LG']
+    assert paper['paper_metadata']['paper_id'] == '00001v1'
+    assert paper['published_date'].utcoffset().total_seconds() == 0
+
+
+def test_entry_without_a_pdf_link_falls_back_to_its_id():
+    entry = ET.fromstring(
+        '<entry xmlns="http://www.w3.org/2005/Atom"><id>http://arxiv.org/abs/2401.00001v2</id>'
+        '<published>2024-01-01T10:00:00Z</published><title>A  title</title>'
+        '<author><name>Ada Lovelace</name></author><author><name>Alan Turing</name></author></entry>'
+    )
+    paper = parse_entry(entry)
+    assert paper['url'] == paper['external_id'] == 'http://arxiv.org/abs/2401.00001v2'
+    assert paper['abstract'] == '' and paper['title'] == 'A title'
+    assert paper['paper_metadata']['authors'] == ['Ada Lovelace', 'Alan Turing']
+    assert paper['paper_metadata']['categories'] == []
+
+
+def test_any_source_type_parses_the_same_and_error_entries_are_skipped():
+    xml_data = atom_feed(make_papers('cs.LG', 3))
+    expected = [paper['external_id'] for paper in parse_feed(xml_data)]
+    for source in (xml_data, xml_data.encode(), io.BytesIO(xml_data.encode())):
+        assert [paper['external_id'] for paper in iter_entries(source)] == expected
+    assert list(iter_entries(ERROR_ENTRY)) == []
+
+
+def test_entries_are_yielded_before_the_document_is_read():
+    data = atom_feed(make_papers('cs.LG', 2000)).encode()
+    reader = TrackedReader(data)
+    entries = iter_entries(io.BufferedReader(reader, buffer_size=512))
+    next(entries)
+    # iterparse reads ahead a fixed-size block, not the document
+    assert reader.position < len(data) // 10
+    assert len(list(entries)) == 1999
+
+
+def test_published_range_and_batches():
+    xml_data = atom_feed(make_papers('cs.LG', 3))
+    oldest, newest = published_range(xml_data)
+    assert (newest - oldest).total_seconds() == 2 * 3600
+    assert published_range(ERROR_ENTRY) is None
+    assert list(iter_batches(iter(range(5)), 2)) == [[0, 1], [2, 3], [4]]
+
+
+def test_batches_are_written_while_the_response_is_still_being_read(monkeypatch):
+    data = atom_feed(make_papers('cs.LG', 2000)).encode()
+    reader = TrackedReader(data)
+    writes = []
+
+    async def record(db, batch, embed):
+        writes.append((len(batch), reader.position))
+        return [1] * len(batch)
+
+    monkeypatch.setattr(utils, "BULK_CHUNK_SIZE", 100)
+    monkeypatch.setattr(utils, "insert_and_embed", record)
+    stored = asyncio.run(utils.process_and_store_arxiv_results(io.BufferedReader(reader, buffer_size=512), db=None))
+
+    assert len(stored) == 2000 and [size for size, _ in writes] == [100] * 20
+    assert writes[0][1] < len(data) // 5
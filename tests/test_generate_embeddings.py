@@ -0,0 +1,192 @@
+import asyncio
+import os
+
+import numpy as np
+import pytest
+from sqlalchemy import select
+
+from src.backend import embedding_store
+from src.backend.models import Content
+from src.backend.scripts import generate_embeddings as script
+
+
+@pytest.fixture
+def papers(session_factory):
+    """Five papers with distinct titles and abstracts; id 3 is already embedded."""
+    async def create():
+        async with session_factory() as db:
+            db.add_all([
+                Content(id=i, title=f"title {i}", abstract=f"abstract {i}", external_id=str(i),
+                        embedding=np.ones(8, dtype=np.float32) if i == 3 else None)
+                for i in range(1, 6)
+            ])
+            await db.commit()
+
+    asyncio.run(create())
+    return session_factory
+
+
+def stored_embeddings(session_factory):
+    async def read():
+        async with session_factory() as db:
+            result = await db.execute(select(Content.id, Content.embedding).order_by(Content.id))
+            return {row.id: row.embedding for row in result}
+    return asyncio.run(read())
+
+
+@pytest.fixture
+def run_script(database_url, tmp_path, monkeypatch, fake_model, embedding_cache, default_store):
+    monkeypatch.setattr(script, "ARTICLES_DATABASE_URL", database_url)
+    checkpoint_path = str(tmp_path / "checkpoint.json")
+
+    def run(**kwargs):
+        asyncio.run(script.generate_embeddings(checkpoint_path=checkpoint_path, **kwargs))
+        return checkpoint_path
+    return run
+
+
+def test_missing_embeddings_are_encoded_in_chunks(papers, run_script, fake_model):
+    checkpoint_path = run_script(batch_size=16, chunk_size=2)
+
+    # Titles and abstracts of a chunk go to the model in one call
+    assert [len(call) for call in fake_model.calls] == [4, 4]
+    assert fake_model.calls[0] == ["title 1", "title 2", "abstract 1", "abstract 2"]
+
+    embeddings = stored_embeddings(papers)
+    np.testing.assert_array_equal(embeddings[3], np.ones(8))
+    expected = (fake_model.encode("title 4") + fake_model.encode("abstract 4")) / 2
+    np.testing.assert_allclose(embeddings[4], expected, rtol=1e-6)
+    assert all(vector is not None for vector in embeddings.values())
+    assert not os.path.exists(checkpoint_path)
+
+
+def test_finished_run_publishes_the_embedding_store(papers, run_script):
+    run_script(chunk_size=2)
+    generation, ids, matrix = embedding_store.open_store()
+    assert ids.tolist() == [1, 2, 3, 4, 5]
+    np.testing.assert_allclose(np.linalg.norm(matrix, axis=1), 1.0, rtol=1e-5)
+
+
+def test_reembed_revisits_every_row(papers, run_script, fake_model):
+    run_script(chunk_size=10, reembed=True)
+    assert len(fake_model.calls[0]) == 10
+    assert not np.array_equal(stored_embeddings(papers)[3], np.ones(8))
+
+
+def test_shards_cover_the_pending_id_range(papers):
+    async def plan():
+        async with papers() as db:
+            return await script.plan_shards(db, 2, reembed=False), await script.plan_shards(db, 2, reembed=True)
+
+    pending, everything = asyncio.run(plan())
+    assert [(shard['start'], shard['end']) for shard in pending] == [(1, 3), (4, 5)]
+    assert [(shard['start'], shard['end']) for shard in everything] == [(1, 3), (4, 5)]
+    assert all(shard['last_id'] == shard['start'] - 1 and not shard['done'] for shard in pending)
+
+
+def test_resume_continues_after_the_checkpointed_id(papers, run_script, fake_model, tmp_path):
+    async def plan():
+        async with papers() as db:
+            return await script.plan_shards(db, 1, reembed=False)
+
+    shards = asyncio.run(plan())
+    shards[0]['last_id'] = 2
+    checkpoint_path = str(tmp_path / "checkpoint.json")
+    script.save_checkpoint(checkpoint_path, {
+        'model': script.EMBEDDING_MODEL, 'backend': script.ENCODER_BACKEND, 'reembed': False, 'shards': shards
+    })
+
+    run_script(resume=True)
+    assert fake_model.calls == [["title 4", "title 5", "abstract 4", "abstract 5"]]
+    embeddings = stored_embeddings(papers)
+    assert embeddings[1] is None and embeddings[5] is not None
+
+
+def test_resume_refuses_a_checkpoint_from_another_backend(papers, run_script, fake_model, tmp_path, capsys):
+    checkpoint_path = str(tmp_path / "checkpoint.json")
+    checkpoint = {'model': script.EMBEDDING_MODEL, 'backend': 'onnx', 'reembed': True,
+                  'shards': [{'start': 1, 'end': 5, 'last_id': 0, 'done': False}]}
+    script.save_checkpoint(checkpoint_path, checkpoint)
+
+    run_script(resume=True)
+    assert not fake_model.calls
+    assert "backend onnx" in capsys.readouterr().out
+    assert script.load_checkpoint(checkpoint_path) == checkpoint
+
+
+def test_a_failing_chunk_is_skipped_and_left_for_the_next_run(papers, run_script, fake_model, monkeypatch, capsys):
+    encode = fake_model.encode
+
+    def flaky(texts, **kwargs):
+        if "title 1" in texts:
+            raise RuntimeError("out of memory")
+        return encode(texts, **kwargs)
+
+    monkeypatch.setattr(fake_model, "encode", flaky)
+    checkpoint_path = run_script(chunk_size=2)
+    output = capsys.readouterr().out
+    assert "Error generating embeddings for ids 1-2: out of memory" in output
+    assert "id ranges [[1, 2]]" in output and "complete" not in output
+    embeddings = stored_embeddings(papers)
+    assert embeddings[1] is None and embeddings[2] is None
+    assert embeddings[4] is not None and embeddings[5] is not None
+    # The run is not finished while a range failed
+    shard, = script.load_checkpoint(checkpoint_path)['shards']
+    assert shard['failed'] == [[1, 2]] and shard['last_id'] == 5 and not shard['done']
+
+    monkeypatch.setattr(fake_model, "encode", encode)
+    fake_model.calls.clear()
+    run_script(chunk_size=2, resume=True)
+    assert fake_model.calls == [["title 1", "title 2", "abstract 1", "abstract 2"]]
+    assert all(vector is not None for vector in stored_embeddings(papers).values())
+    assert not os.path.exists(checkpoint_path)
+
+
+def test_a_failing_write_is_rolled_back_and_the_run_continues(papers, run_script, monkeypatch, capsys):
+    write_chunk = script.write_chunk
+
+    async def flaky_write(session, checkpoint, checkpoint_path, index, ids, embeddings):
+        if ids[0] == 1:
+            await session.execute(script.update_embedding, [{'content_id': 1, 'vector': embeddings[0]}])
+            raise RuntimeError("database is locked")
+        await write_chunk(session, checkpoint, checkpoint_path, index, ids, embeddings)
+
+    monkeypatch.setattr(script, "write_chunk", flaky_write)
+    run_script(chunk_size=2)
+    assert "Error writing embeddings for ids 1-2: database is locked" in capsys.readouterr().out
+    embeddings = stored_embeddings(papers)
+    # The half-written chunk was rolled back
+    assert embeddings[1] is None and embeddings[4] is not None
+
+
+def test_resume_retries_a_failed_write_of_a_reembed(papers, run_script, fake_model, monkeypatch, capsys):
+    write_chunk = script.write_chunk
+
+    async def failing_write(session, checkpoint, checkpoint_path, index, ids, embeddings):
+        if 3 in ids:
+            raise RuntimeError("database is locked")
+        await write_chunk(session, checkpoint, checkpoint_path, index, ids, embeddings)
+
+    monkeypatch.setattr(script, "write_chunk", failing_write)
+    checkpoint_path = run_script(chunk_size=2, reembed=True)
+    assert "complete" not in capsys.readouterr().out
+    # Still the old model's vector: without the failed range nothing would revisit it
+    np.testing.assert_array_equal(stored_embeddings(papers)[3], np.ones(8))
+    assert script.load_checkpoint(checkpoint_path)['shards'][0]['failed'] == [[3, 4]]
+
+    monkeypatch.setattr(script, "write_chunk", write_chunk)
+    run_script(chunk_size=2, resume=True)
+    assert "complete" in capsys.readouterr().out
+    assert not np.array_equal(stored_embeddings(papers)[3], np.ones(8))
+    assert not os.path.exists(checkpoint_path)
+
+
+def test_settle_chunk_tracks_failed_ranges(tmp_path):
+    path = str(tmp_path / "checkpoint.json")
+    checkpoint = {'shards': [{'start': 1, 'end': 9, 'last_id': 2, 'failed': [[1, 2]], 'done': False}]}
+    script.settle_chunk(checkpoint, path, 0, None, [3, 4], False)
+    # A retry that fails again stays listed once
+    script.settle_chunk(checkpoint, path, 0, [1, 2], [1, 2], False)
+    assert checkpoint['shards'][0]['failed'] == [[1, 2], [3, 4]] and checkpoint['shards'][0]['last_id'] == 4
+    script.settle_chunk(checkpoint, path, 0, [1, 2], [1, 2], True)
+    assert script.load_checkpoint(path)['shards'][0]['failed'] == [[3, 4]]
@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+from sqlalchemy import create_engine
+
+from src.backend import encoder, utils, vector_index
+from src.backend.models import Content
+from src.backend.search_index import create_fts, fuse_rankings
+from src.backend.utils import hybrid_search_ids
+
+
+def test_rrf_combines_both_ranks():
+    # 1: lexical 1st, semantic 2nd; 3: lexical 3rd, semantic 1st; 2: no embedding
+    assert fuse_rankings([1, 2, 3], [9, 8, 7], [3, 1], [0.9, 0.5], fusion='rrf') == [1, 3, 2]
+
+
+def test_semantic_weight_moves_between_the_two_orders():
+    lexical_ids, lexical_scores = [1, 2, 3, 4], [4.0, 3.0, 2.0, 1.0]
+    semantic_ids, semantic_scores = [4, 3, 1], [0.9, 0.8, 0.1]
+    for fusion in ('rrf', 'weighted'):
+        assert fuse_rankings(lexical_ids, lexical_scores, semantic_ids, semantic_scores,
+                             fusion=fusion, semantic_weight=0) == [1, 2, 3, 4]
+        # Candidates without an embedding follow the embedded ones, in lexical order
+        assert fuse_rankings(lexical_ids, lexical_scores, semantic_ids, semantic_scores,
+                             fusion=fusion, semantic_weight=1) == [4, 3, 1, 2]
+
+
+def test_weighted_fusion_normalizes_each_side():
+    # Raw bm25 scores dwarf cosine similarities; after min-max scaling they count equally
+    fused = fuse_rankings([1, 2, 3], [30.0, 20.0, 10.0], [3, 2, 1], [0.9, 0.6, 0.0], fusion='weighted')
+    assert fused == [2, 1, 3]
+    assert fuse_rankings([1, 2], [30.0, 10.0], [2, 1], [0.9, 0.0], fusion='weighted', semantic_weight=0.6) == [2, 1]
+
+
+def test_empty_candidates_and_unknown_fusion():
+    assert fuse_rankings([], [], [], []) == []
+    with pytest.raises(ValueError):
+        fuse_rankings([1], [1.0], [1], [1.0], fusion='max')
+
+
+def test_hybrid_search_only_reranks_lexical_candidates(tmp_path, session_factory, embedding_cache, fake_model,
+                                                      monkeypatch):
+    monkeypatch.setattr(utils, "embedding_cache", embedding_cache)
+    monkeypatch.setattr(encoder, "encoder_service", encoder.EncoderService(window_ms=1))
+    monkeypatch.setattr(vector_index, "_index", None)
+    query = 'graph learning'
+    query_vector = fake_model.encode(query)
+    other = fake_model.encode('something else')
+    fake_model.calls.clear()
+
+    engine = create_engine(f"sqlite:///{tmp_path}/articles.db")
+    with engine.begin() as connection:
+        create_fts(connection)
+    engine.dispose()
+
+    async def run():
+        async with session_factory() as session:
+            session.add_all([
+                Content(title='Graph learning', external_id='1', embedding=other),
+                Content(title='Graph learning', external_id='2', embedding=query_vector),
+                Content(title='Graph learning', external_id='3'),
+                # Semantically perfect but no lexical match: never a candidate
+                Content(title='Unrelated topic', external_id='4', embedding=query_vector),
+            ])
+            await session.commit()
+            first = await hybrid_search_ids(query, session, fusion='weighted')
+            second = await hybrid_search_ids(query, session, fusion='rrf')
+            return first, second
+
+    first, second = asyncio.run(run())
+    assert first[0] == 2 and sorted(first) == [1, 2, 3]
+    assert sorted(second) == [1, 2, 3]
+    # The query is embedded once; the second search hits the embedding cache
+    assert fake_model.calls == [[query]]
+
+
+def test_hybrid_search_without_lexical_matches_skips_the_encoder(session_factory, embedding_cache, fake_model,
+                                                                monkeypatch):
+    monkeypatch.setattr(utils, "embedding_cache", embedding_cache)
+
+    async def run():
+        async with session_factory() as session:
+            return await hybrid_search_ids('nothing matches', session)
+
+    assert asyncio.run(run()) == []
+    assert not fake_model.calls
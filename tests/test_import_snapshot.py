@@ -0,0 +1,124 @@
+import asyncio
+import io
+import json
+import os
+
+from sqlalchemy import select
+
+from src.backend.models import Content
+from src.backend.scripts import import_snapshot as snapshot_module
+from src.backend.scripts.import_snapshot import import_snapshot, read_batches, snapshot_record_to_paper
+
+
+def snapshot_record(number, categories='cs.LG'):
+    return {
+        'id': f"2401.{number:05d}",
+        'title': f"Paper\n  number {number}",
+        'abstract': f"  Abstract {number}\n",
+        'authors': 'Ada Lovelace, Alan Turing',
+        'authors_parsed': [['Lovelace', 'Ada', ''], ['Turing', 'Alan', '']],
+        'categories': categories,
+        'versions': [
+            {'version': 'v1', 'created': 'Mon, 1 Jan 2024 10:00:00 GMT'},
+            {'version': 'v2', 'created': 'Tue, 2 Jan 2024 10:00:00 GMT'},
+        ],
+    }
+
+
+def write_snapshot(path, records):
+    with open(path, 'w') as f:
+        for record in records:
+            f.write(json.dumps(record) + '\n')
+    return str(path)
+
+
+def stored_external_ids(session_factory):
+    async def run():
+        async with session_factory() as session:
+            return (await session.scalars(select(Content.external_id).order_by(Content.id))).all()
+    return asyncio.run(run())
+
+
+def test_record_maps_to_the_api_paper_scheme():
+    paper = snapshot_record_to_paper(snapshot_record(7))
+    assert paper['external_id'] == 'http://arxiv.org/abs/2401.00007v2'
+    assert paper['url'] == 'http://arxiv.org/pdf/2401.00007v2'
+    assert paper['title'] == 'Paper number 7' and paper['abstract'] == 'Abstract 7'
+    assert paper['paper_metadata']['authors'] == ['Ada Lovelace', 'Alan Turing']
+    assert paper['paper_metadata']['categories'] == ['cs.LG']
+    # The first version's date is the publication date
+    assert paper['published_date'].isoformat() == '2024-01-01T10:00:00+00:00'
+
+
+def test_record_without_parsed_authors_splits_the_author_string():
+    record = snapshot_record(1)
+    del record['authors_parsed']
+    assert snapshot_record_to_paper(record)['paper_metadata']['authors'] == ['Ada Lovelace', 'Alan Turing']
+
+
+def test_read_batches_filters_categories_and_reports_resumable_offsets():
+    lines = [json.dumps(snapshot_record(n, 'cs.LG' if n % 2 else 'math.CO')).encode() + b'\n' for n in range(1, 7)]
+    snapshot = io.BytesIO(b''.join(lines) + b'\n')
+
+    batches = list(read_batches(snapshot, 0, 2, {'cs'}))
+    assert [[p['external_id'][-8:-2] for p in papers] for papers, _ in batches] == [['.00001', '.00003'], ['.00005']]
+    # Resuming at a reported offset continues with the records after that batch
+    resumed = list(read_batches(snapshot, batches[0][1], 2, None))
+    assert [p['external_id'][-8:-2] for papers, _ in resumed for p in papers] == ['.00004', '.00005', '.00006']
+
+
+def test_import_stores_every_record_once_and_removes_the_progress_file(tmp_path, database_url, session_factory,
+                                                                     monkeypatch):
+    monkeypatch.setattr(snapshot_module, "ARTICLES_DATABASE_URL", database_url)
+    path = write_snapshot(tmp_path / "snapshot.json", [snapshot_record(n) for n in range(1, 8)])
+
+    asyncio.run(import_snapshot(path, batch_size=3))
+    assert len(stored_external_ids(session_factory)) == 7
+    assert not os.path.exists(f"{path}.progress")
+
+    # Re-importing the same snapshot inserts nothing new
+    asyncio.run(import_snapshot(path, batch_size=3))
+    assert len(stored_external_ids(session_factory)) == 7
+
+
+def test_resume_continues_after_the_last_committed_batch(tmp_path, database_url, session_factory, monkeypatch):
+    monkeypatch.setattr(snapshot_module, "ARTICLES_DATABASE_URL", database_url)
+    records = [snapshot_record(n) for n in range(1, 7)]
+    path = write_snapshot(tmp_path / "snapshot.json", records)
+    stored = []
+    real_insert = snapshot_module.bulk_insert_papers
+
+    async def failing_insert(session, papers):
+        if stored:
+            raise RuntimeError("interrupted")
+        stored.extend(papers)
+        return await real_insert(session, papers)
+
+    monkeypatch.setattr(snapshot_module, "bulk_insert_papers", failing_insert)
+    try:
+        asyncio.run(import_snapshot(path, batch_size=3))
+    except RuntimeError:
+        pass
+    with open(f"{path}.progress") as f:
+        assert json.load(f)['records'] == 3
+
+    inserted = []
+
+    async def recording_insert(session, papers):
+        inserted.extend(papers)
+        return await real_insert(session, papers)
+
+    monkeypatch.setattr(snapshot_module, "bulk_insert_papers", recording_insert)
+    asyncio.run(import_snapshot(path, batch_size=3, resume=True))
+    assert [p['external_id'] for p in inserted] == [snapshot_record_to_paper(r)['external_id'] for r in records[3:]]
+    assert len(stored_external_ids(session_factory)) == 6
+    assert not os.path.exists(f"{path}.progress")
+
+
+def test_import_of_an_empty_snapshot_finishes_cleanly(tmp_path, database_url, monkeypatch):
+    monkeypatch.setattr(snapshot_module, "ARTICLES_DATABASE_URL", database_url)
+    monkeypatch.setattr(snapshot_module, "write_progress", lambda path, progress: None)
+    path = write_snapshot(tmp_path / "snapshot.json", [])
+    # No progress file was ever written; finishing must not fail removing it
+    asyncio.run(import_snapshot(path))
+    assert not os.path.exists(f"{path}.progress")
@@ -0,0 +1,180 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from sqlalchemy import select
+
+from arxiv_server import ArxivServer, atom_feed, make_papers
+from src.backend import category_index, ingest
+from src.backend.category_index import CategoryIndex
+from src.backend.arxiv_feed import ArxivClient, TokenBucket
+from src.backend.ingest import IngestPipeline
+from src.backend.models import Content
+
+
+def catalogue():
+    """Two categories of 30 papers; cs.CV also lists two cs.LG papers, as cross-lists do."""
+    cs_lg = make_papers('cs.LG', 30)
+    return {'cs.LG': cs_lg, 'cs.CV': make_papers('cs.CV', 30) + cs_lg[:2]}
+
+
+def pipeline(server, session_factory, concurrency=2, **kwargs):
+    client = ArxivClient(server.url, rate_limiter=TokenBucket(rate=1000), retries=0)
+    return IngestPipeline(session_factory, client, concurrency=concurrency, batch_size=8, queue_size=2,
+                          report_every=3600, **kwargs)
+
+
+def stored_rows(session_factory):
+    async def read():
+        async with session_factory() as db:
+            return (await db.execute(select(Content.external_id, Content.embedding))).all()
+    return asyncio.run(read())
+
+
+@pytest.fixture
+def ingest_env(fake_model, embedding_cache):
+    return fake_model
+
+
+def test_pipeline_stores_and_embeds_every_paper_once(session_factory, ingest_env):
+    with ArxivServer(catalogue()) as server:
+        stored = asyncio.run(pipeline(server, session_factory).run(['cs.LG', 'cs.CV'], max_results=40))
+
+    rows = stored_rows(session_factory)
+    assert len(stored) == len(rows) == 60
+    assert all(embedding is not None for _, embedding in rows)
+    # Batches of at most batch_size papers reach the encoder (title + abstract each)
+    assert max(len(call) for call in ingest_env.calls) <= 16
+
+
+def test_second_run_skips_stored_papers_before_embedding(session_factory, ingest_env):
+    with ArxivServer(catalogue()) as server:
+        asyncio.run(pipeline(server, session_factory).run(['cs.LG'], max_results=40))
+        calls = len(ingest_env.calls)
+        stored = asyncio.run(pipeline(server, session_factory).run(['cs.LG', 'cs.CV'], max_results=40))
+
+    assert len(stored) == 30
+    # Only cs.CV's own papers were encoded on the second run
+    encoded = [text for call in ingest_env.calls[calls:] for text in call]
+    assert encoded and not any('cs.LG' in text for text in encoded)
+
+
+def test_stage_stats_count_every_stage(session_factory, ingest_env, capsys):
+    with ArxivServer(catalogue()) as server:
+        run = pipeline(server, session_factory)
+        asyncio.run(run.run(['cs.LG'], max_results=40))
+
+    assert run.stats['fetch'].items == 1
+    assert run.stats['parse'].items == 30 and run.stats['write'].items == 30
+    assert "queue 0/2" in capsys.readouterr().out
+
+
+def test_a_failing_category_does_not_stop_the_others(session_factory, ingest_env, capsys):
+    with ArxivServer(catalogue()) as server:
+        # One worker takes the categories from the end of the list, so cs.CV gets the 500
+        server.failures = [500]
+        stored = asyncio.run(pipeline(server, session_factory, concurrency=1, embed=False).run(['cs.LG', 'cs.CV']))
+
+    assert "Failed to fetch cs.CV" in capsys.readouterr().out
+    assert len(stored) == 30
+    assert all(external_id.split('/')[-2] == 'cs.LG' for external_id, _ in stored_rows(session_factory))
+
+
+def test_a_failing_write_stops_the_pipeline(session_factory, ingest_env, monkeypatch):
+    async def broken(*args, **kwargs):
+        raise RuntimeError("disk full")
+
+    monkeypatch.setattr(ingest, "insert_papers", broken)
+    with ArxivServer(catalogue()) as server:
+        with pytest.raises(RuntimeError, match="disk full"):
+            asyncio.run(pipeline(server, session_factory).run(['cs.LG', 'cs.CV'], max_results=40))
+
+
+def paper(n, categories=('cs.LG',), title=None):
+    return {
+        'title': title or f"paper {n}", 'abstract': f"abstract {n}", 'url': f"http://arxiv.org/pdf/{n}",
+        'external_id': f"http://arxiv.org/abs/{n}", 'source': 'arxiv',
+        'published_date': datetime(2024, 1, 1) + timedelta(days=n),
+        'paper_metadata': {'categories': list(categories), 'authors': []},
+    }
+
+
+def test_bulk_insert_reports_only_the_rows_it_inserted(session_factory):
+    async def run():
+        async with session_factory() as db:
+            first = await ingest.bulk_insert_papers(db, [paper(1), paper(2), paper(1, title="copy")])
+            second = await ingest.bulk_insert_papers(db, [paper(2), paper(3)])
+            titles = (await db.execute(select(Content.title).order_by(Content.id))).scalars().all()
+            return first, second, titles
+
+    first, second, titles = asyncio.run(run())
+    assert len(first) == 2 and len(second) == 1 and second[0] not in first
+    # The first copy of a paper listed twice wins, and existing rows are left alone
+    assert titles == ["paper 1", "paper 2", "paper 3"]
+
+
+def test_concurrent_writers_never_both_count_a_paper_as_new(session_factory):
+    batch = [paper(n) for n in range(50)]
+
+    async def write():
+        async with session_factory() as db:
+            return await ingest.bulk_insert_papers(db, batch)
+
+    async def run():
+        return await asyncio.gather(*(write() for _ in range(4)))
+
+    results = asyncio.run(run())
+    ids = [content_id for result in results for content_id in result]
+    assert len(ids) == len(set(ids)) == 50
+
+
+def test_update_existing_refreshes_rows_and_refiles_them(session_factory, monkeypatch):
+    index = CategoryIndex()
+    monkeypatch.setattr(category_index, "_index", index)
+
+    async def run():
+        async with session_factory() as db:
+            [content_id] = await ingest.bulk_insert_papers(db, [paper(1)])
+            assert await ingest.bulk_insert_papers(db, [paper(1, ['math.CO'], "revised")], update_existing=True) == []
+            return content_id, await db.get(Content, content_id)
+
+    content_id, row = asyncio.run(run())
+    assert row.title == "revised" and row.paper_metadata['categories'] == ['math.CO']
+    assert index.ids_for(['cs']).tolist() == [] and index.ids_for(['math']).tolist() == [content_id]
+
+
+def test_insert_and_embed_only_encodes_new_papers(session_factory):
+    embedded = []
+
+    async def embed(papers):
+        embedded.append([p['title'] for p in papers])
+        return np.ones((len(papers), 4), dtype=np.float32)
+
+    async def run():
+        async with session_factory() as db:
+            await ingest.bulk_insert_papers(db, [paper(1)])
+            new_ids = await ingest.insert_and_embed(db, [paper(1), paper(2)], embed)
+            rows = (await db.execute(select(Content.id, Content.embedding).order_by(Content.id))).all()
+            return new_ids, rows
+
+    new_ids, rows = asyncio.run(run())
+    assert embedded == [["paper 2"]]
+    assert [row.id for row in rows if row.embedding is not None] == new_ids
+
+
+def test_storing_an_api_response_skips_known_papers(session_factory, ingest_env):
+    from src.backend.utils import process_and_store_arxiv_results
+    xml_data = atom_feed(make_papers('cs.LG', 3))
+
+    async def run():
+        async with session_factory() as db:
+            first = await process_and_store_arxiv_results(xml_data, db)
+            calls = len(ingest_env.calls)
+            second = await process_and_store_arxiv_results(xml_data, db)
+            embedded = (await db.execute(select(Content.id).where(Content.embedding.is_not(None)))).scalars().all()
+            return first, second, calls, embedded
+
+    first, second, calls, embedded = asyncio.run(run())
+    assert len(first) == 3 and second == [] and sorted(embedded) == sorted(first)
+    assert len(ingest_env.calls) == calls
@@ -0,0 +1,39 @@
+import asyncio
+
+import numpy as np
+from sqlalchemy import select, text
+
+from src.backend.models import Content, Float32Vector
+
+
+def test_float32_vector_round_trips_as_little_endian_bytes():
+    column = Float32Vector()
+    blob = column.process_bind_param([1.0, -2.5, 3.25], None)
+    assert blob == np.array([1.0, -2.5, 3.25], dtype='<f4').tobytes()
+    vector = column.process_result_value(blob, None)
+    assert vector.dtype == np.dtype('<f4')
+    np.testing.assert_array_equal(vector, [1.0, -2.5, 3.25])
+    assert column.process_bind_param(None, None) is None
+    assert column.process_result_value(None, None) is None
+
+
+def test_float32_vector_compares_arrays_elementwise():
+    column = Float32Vector()
+    assert column.compare_values(np.ones(3), np.ones(3))
+    assert not column.compare_values(np.ones(3), np.zeros(3))
+    assert column.compare_values(None, None)
+    assert not column.compare_values(None, np.ones(3))
+
+
+def test_embedding_is_stored_as_a_4_byte_per_dimension_blob(session_factory):
+    async def run():
+        async with session_factory() as session:
+            session.add(Content(title='t', external_id='x', embedding=np.arange(384, dtype=np.float64)))
+            await session.commit()
+            size = await session.scalar(text("SELECT length(embedding) FROM content"))
+            stored = await session.scalar(select(Content.embedding))
+            return size, stored
+
+    size, stored = asyncio.run(run())
+    assert size == 384 * 4
+    np.testing.assert_array_equal(stored, np.arange(384, dtype=np.float32))
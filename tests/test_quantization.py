@@ -0,0 +1,81 @@
+import asyncio
+import os
+
+import numpy as np
+
+from src.backend import quantization, vector_index
+from src.backend.models import Content
+from src.backend.quantization import Int8Quantizer, ProductQuantizer, load_or_fit
+from src.backend.vector_index import EmbeddingIndex, normalize_rows
+
+
+def unit_corpus(n=1000, dim=16, seed=0):
+    rng = np.random.default_rng(seed)
+    return np.arange(1, n + 1), normalize_rows(rng.standard_normal((n, dim)))
+
+
+def test_int8_scores_track_exact_scores():
+    _, matrix = unit_corpus()
+    quantizer = Int8Quantizer.fit(matrix)
+    codes = quantizer.encode(matrix)
+    assert codes.dtype == np.int8
+    np.testing.assert_allclose(quantizer.scores(codes, matrix[0]), matrix @ matrix[0], atol=0.05)
+    rows = np.array([3, 9, 500])
+    np.testing.assert_allclose(quantizer.scores(codes, matrix[0], rows), matrix[rows] @ matrix[0], atol=0.05)
+
+
+def test_pq_codes_rank_the_query_row_near_the_top():
+    _, matrix = unit_corpus()
+    quantizer = ProductQuantizer.fit(matrix, m=4, iterations=5)
+    codes = quantizer.encode(matrix)
+    assert codes.shape == (1000, 4) and quantizer.bytes_per_vector == 4
+    hits = sum(row in np.argsort(-quantizer.scores(codes, matrix[row]))[:10] for row in range(0, 1000, 100))
+    assert hits >= 8
+
+
+def test_load_or_fit_reuses_matching_codes(tmp_path, monkeypatch):
+    ids, matrix = unit_corpus(300)
+    path = str(tmp_path / "codes.npz")
+    quantizer, codes = load_or_fit(ids, matrix, 'int8', path)
+    assert os.listdir(tmp_path) == ["codes.npz"]
+
+    monkeypatch.setattr(Int8Quantizer, "fit", classmethod(lambda cls, matrix: 1 / 0))
+    reused, reused_codes = load_or_fit(ids, matrix, 'int8', path)
+    np.testing.assert_array_equal(reused_codes, codes)
+    np.testing.assert_array_equal(reused.scales, quantizer.scales)
+
+
+def test_codes_are_built_off_the_query_path_and_the_floats_leave_the_heap(session_factory, monkeypatch, tmp_path):
+    monkeypatch.setattr(quantization, "EMBEDDING_QUANTIZATION", "int8")
+    monkeypatch.setattr(quantization, "QUANTIZATION_PATH", str(tmp_path / "codes.npz"))
+    monkeypatch.setattr(vector_index, "_index", None)
+    ids, matrix = unit_corpus(200)
+
+    async def run():
+        async with session_factory() as session:
+            session.add_all([
+                Content(id=int(content_id), title=str(content_id), external_id=str(content_id), embedding=row)
+                for content_id, row in zip(ids, matrix)
+            ])
+            await session.commit()
+            index = await vector_index.get_index(session)
+            # The first query is answered by the exact scan while the fit runs
+            assert index.quantizer is None and index._maintenance is not None
+            assert index.search(matrix[5], limit=1)[0].tolist() == [6]
+            await index._maintenance
+            return index
+
+    index = asyncio.run(run())
+    assert index.quantizer.kind == 'int8' and len(index.codes) == 200
+    assert isinstance(index.matrix, np.memmap)
+    assert index.search(matrix[42], limit=1)[0].tolist() == [43]
+
+
+def test_compaction_drops_codes_for_the_old_base():
+    ids, matrix = unit_corpus(100)
+    index = EmbeddingIndex(ids, matrix, normalized=True)
+    index.quantizer = Int8Quantizer.fit(matrix)
+    index.codes = index.quantizer.encode(matrix)
+    index.add([1000], [matrix[0]])
+    index.compact()
+    assert index.quantizer is None and index.codes is None
@@ -0,0 +1,31 @@
+from src.backend import ranking_cache
+from src.backend.ranking_cache import RankedResults, RankingCache
+
+
+def test_pages_are_sliced_relative_to_the_first_ranked_page():
+    results = RankedResults(user_id=1, ids=range(25), first_page=2)
+    assert results.page(2, 10) == (list(range(10)), True)
+    assert results.page(4, 10) == (list(range(20, 25)), False)
+    # Pages before the one the ranking was computed for start at the top
+    assert results.page(1, 10)[0] == list(range(10))
+
+
+def test_cursor_belongs_to_its_user():
+    cache = RankingCache()
+    cursor = cache.put(RankedResults(user_id=1, ids=[5, 6]))
+    assert cache.get(cursor, 1).ids.tolist() == [5, 6]
+    assert cache.get(cursor, 2) is None
+    assert cache.get("unknown", 1) is None
+
+
+def test_expired_and_evicted_cursors_are_gone(monkeypatch):
+    cache = RankingCache(max_entries=2)
+    first = cache.put(RankedResults(1, [1]))
+    second = cache.put(RankedResults(1, [2]))
+    cache.get(first, 1)  # most recently used now
+    cache.put(RankedResults(1, [3]))
+    assert cache.get(second, 1) is None and cache.get(first, 1) is not None
+
+    monkeypatch.setattr(ranking_cache, "RANKING_CACHE_TTL_SECONDS", -1)
+    stale = cache.put(RankedResults(1, [4]))
+    assert cache.get(stale, 1) is None
@@ -0,0 +1,157 @@
+import asyncio
+import importlib.util
+import os
+import time
+
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from src.backend import database, search_index
+from src.backend.models import Content
+from src.backend.scripts import rebuild_search_index as rebuild_module
+from src.backend.search_index import create_fts, fts_exists, search_ids
+
+MIGRATION = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                         "migrations", "versions", "5e2f8a6b1c90_add_content_fts_index.py")
+
+
+def papers():
+    return [
+        Content(title='Graph neural networks', abstract='Message passing on graphs.', external_id='1',
+                paper_metadata={'authors': ['Ada Lovelace'], 'categories': ['cs.LG']}),
+        Content(title='Protein folding', abstract='Structure prediction with graph neural networks.',
+                external_id='2', paper_metadata={'authors': ['Alan Turing'], 'categories': ['q-bio.BM']}),
+        Content(title='Galaxy surveys', abstract='Redshift catalogues.', external_id='3'),
+    ]
+
+
+def add_papers(session_factory):
+    async def run():
+        async with session_factory() as session:
+            session.add_all(papers())
+            await session.commit()
+    asyncio.run(run())
+
+
+def run_migration(url, step):
+    spec = importlib.util.spec_from_file_location("fts_migration", MIGRATION)
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+    engine = create_engine(url)
+    with engine.begin() as connection:
+        with Operations.context(MigrationContext.configure(connection)):
+            getattr(migration, step)()
+        exists = fts_exists(connection)
+    engine.dispose()
+    return exists
+
+
+def search(session_factory, query):
+    async def run():
+        async with session_factory() as session:
+            return await search_ids(session, query, limit=10)
+    return asyncio.run(run())
+
+
+def test_startup_only_detects_the_index(tmp_path, monkeypatch, capsys):
+    users = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/users.db", poolclass=NullPool)
+    articles = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/articles.db", poolclass=NullPool)
+    monkeypatch.setattr(database, "engine", users)
+    monkeypatch.setattr(database, "articles_engine", articles)
+
+    asyncio.run(database.init_db())
+    assert "Full-text index missing" in capsys.readouterr().out
+    engine = create_engine(f"sqlite:///{tmp_path}/articles.db")
+    with engine.connect() as connection:
+        assert not fts_exists(connection)
+        create_fts(connection)
+        connection.commit()
+    engine.dispose()
+
+    asyncio.run(database.init_db())
+    assert "Full-text index missing" not in capsys.readouterr().out
+
+
+def test_migration_indexes_existing_rows_and_downgrade_drops_it(tmp_path, session_factory):
+    add_papers(session_factory)
+    url = f"sqlite:///{tmp_path}/articles.db"
+
+    assert run_migration(url, "upgrade")
+    ids, total = search(session_factory, 'graph networks')
+    # Title matches outrank abstract matches
+    assert ids == [1, 2] and total == 2
+    assert search(session_factory, 'turing')[0] == [2]
+
+    assert not run_migration(url, "downgrade")
+    engine = create_engine(url)
+    with engine.connect() as connection:
+        assert connection.exec_driver_sql(
+            "SELECT count(*) FROM sqlite_master WHERE name LIKE 'content_fts%'"
+        ).scalar() == 0
+    engine.dispose()
+
+
+def test_triggers_keep_the_index_in_sync(tmp_path, session_factory):
+    run_migration(f"sqlite:///{tmp_path}/articles.db", "upgrade")
+    add_papers(session_factory)
+
+    async def run():
+        async with session_factory() as session:
+            await session.execute(text("UPDATE content SET title = 'Cosmic graph structure' WHERE id = 3"))
+            await session.execute(text("DELETE FROM content WHERE id = 1"))
+            # Embedding-only writes leave the index alone
+            await session.execute(text("UPDATE content SET embedding = x'00' WHERE id = 2"))
+            await session.commit()
+
+    asyncio.run(run())
+    assert search(session_factory, 'graph')[0] == [3, 2]
+    assert search(session_factory, 'galaxy') == ([], 0)
+
+
+def test_rebuild_script_creates_then_rebuilds(tmp_path, database_url, session_factory, monkeypatch, capsys):
+    monkeypatch.setattr(rebuild_module, "ARTICLES_DATABASE_URL", database_url)
+    add_papers(session_factory)
+
+    asyncio.run(rebuild_module.rebuild_search_index())
+    assert "Indexed 3 papers" in capsys.readouterr().out
+    assert search(session_factory, 'protein')[0] == [2]
+
+    asyncio.run(rebuild_module.rebuild_search_index())
+    assert "Indexed 3 papers" in capsys.readouterr().out
+
+
+def test_match_expression_quotes_terms_and_drops_short_ones():
+    assert search_index.match_expression('GNN "on" graphs OR x*') == '"gnn" OR "graphs"'
+    assert search_index.match_expression('of an') == ''
+
+
+def test_a_missing_index_is_picked_up_once_created(tmp_path, session_factory, monkeypatch):
+    monkeypatch.setattr(search_index, "INDEX_REFRESH_SECONDS", 0.2)
+
+    def available():
+        async def run():
+            async with session_factory() as session:
+                return await search_index.fts_available(session)
+        return asyncio.run(run())
+
+    assert not available()
+    run_migration(f"sqlite:///{tmp_path}/articles.db", "upgrade")
+    # Not looked for again until the refresh interval has passed
+    assert not available()
+    time.sleep(0.25)
+    assert available()
+    # Once found, the index is assumed to stay
+    run_migration(f"sqlite:///{tmp_path}/articles.db", "downgrade")
+    assert available()
+
+
+def test_migration_after_the_rebuild_script_reindexes_once(tmp_path, database_url, session_factory, monkeypatch):
+    monkeypatch.setattr(rebuild_module, "ARTICLES_DATABASE_URL", database_url)
+    add_papers(session_factory)
+    asyncio.run(rebuild_module.rebuild_search_index())
+
+    assert run_migration(f"sqlite:///{tmp_path}/articles.db", "upgrade")
+    assert search(session_factory, 'graph') == ([1, 2], 2)
@@ -0,0 +1,59 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from src.backend.models import FeedSession
+from src.backend.seen_sets import SeenSet, SeenSetStore
+
+
+def test_bitmap_tracks_added_ids():
+    seen = SeenSet()
+    seen.add([3, 17, 1000, -1])
+    assert seen.contains([3, 4, 17, 1000, 5000, -1]).tolist() == [True, False, True, True, False, False]
+    assert seen.ids().tolist() == [3, 17, 1000]
+    assert len(seen) == 3
+
+
+def test_session_continues_on_another_worker(session_factory):
+    # Two stores stand in for two API worker processes sharing one database
+    first_worker, second_worker = SeenSetStore(), SeenSetStore()
+
+    async def run():
+        async with session_factory() as db:
+            token, seen = await first_worker.load(db)
+            seen.add([1, 2, 3])
+            seen.latest_offset = 3
+            await first_worker.save(db, token, seen)
+        async with session_factory() as db:
+            same_token, seen = await second_worker.load(db, token)
+            assert same_token == token
+            seen.add([4])
+            await second_worker.save(db, token, seen)
+        async with session_factory() as db:
+            return await first_worker.load(db, token)
+
+    _, seen = asyncio.run(run())
+    assert seen.ids().tolist() == [1, 2, 3, 4] and seen.latest_offset == 3
+
+
+def test_unknown_and_expired_tokens_start_a_new_session(session_factory):
+    store = SeenSetStore(ttl_seconds=60)
+
+    async def run():
+        async with session_factory() as db:
+            token, seen = await store.load(db, "never-issued")
+            assert token != "never-issued" and len(seen) == 0
+
+            db.add(FeedSession(token="old", seen=SeenSet().to_bytes(), latest_offset=5,
+                               updated_at=datetime.utcnow() - timedelta(minutes=5)))
+            await db.commit()
+            token, seen = await store.load(db, "old")
+            assert token != "old" and seen.latest_offset == 0
+
+            # Saving purges expired rows
+            await store.save(db, token, seen)
+            tokens = (await db.execute(select(FeedSession.token))).scalars().all()
+            assert tokens == [token]
+
+    asyncio.run(run())
@@ -0,0 +1,191 @@
+import asyncio
+import threading
+
+import numpy as np
+from sqlalchemy import select
+
+from src.backend import suggest_index
+from src.backend.models import Content, Interaction
+from src.backend.suggest_index import SuggestIndex, normalize, paper_terms, title_phrases
+
+
+def add_papers(session_factory, papers):
+    async def run():
+        async with session_factory() as session:
+            session.add_all([
+                Content(title=title, external_id=f"{title} {number}", paper_metadata=metadata)
+                for number, (title, metadata) in enumerate(papers)
+            ])
+            await session.commit()
+    asyncio.run(run())
+
+
+def build(session_factory):
+    async def run():
+        async with session_factory() as session:
+            return await SuggestIndex.from_db(session)
+    return asyncio.run(run())
+
+
+def test_phrases_skip_stopword_edges():
+    assert normalize("  Deep-Learning,  of GRAPHS ") == "deep-learning of graphs"
+    assert title_phrases("Learning of Graphs") == {"learning", "graphs", "learning of graphs"}
+    terms = paper_terms("Graphs", {'authors': ['Ada Lovelace'], 'categories': ['cs.LG']})
+    assert ('author', 'lovelace', 'Ada Lovelace') in terms and ('category', 'cs lg', 'cs.LG') in terms
+
+
+def test_build_ranks_by_paper_count_and_drops_rare_phrases(session_factory):
+    add_papers(session_factory, [
+        ("Graph neural networks", {'authors': ['Ada Lovelace']}),
+        ("Graph neural networks for molecules", {'authors': ['Ada Lovelace']}),
+        ("Graph kernels", None),
+    ])
+
+    index = build(session_factory)
+    assert index.suggest("graph", limit=2) == [("graph", "title", 3), ("graph neural", "title", 2)]
+    # Typing the surname finds the author
+    assert index.suggest("love") == [("Ada Lovelace", "author", 2)]
+    # In one paper only: below SUGGEST_MIN_COUNT
+    assert index.suggest("graph kern") == []
+    assert index.suggest("kernels") == [("kernels", "title", 1)]
+
+
+def test_added_papers_are_merged_in_the_background_under_the_same_rule():
+    index = SuggestIndex()
+    merge_threads = []
+    merged = index._merged
+
+    def tracked(*args):
+        merge_threads.append(threading.get_ident())
+        return merged(*args)
+
+    index._merged = tracked
+
+    async def run():
+        index.add(1, "Sparse attention")
+        # The lookup answers from the current arrays instead of merging on the keystroke path
+        assert index.suggest("sparse") == []
+        await index._merge_task
+        assert index.suggest("sparse") == [("sparse", "title", 1)]
+        # One paper isn't enough for a phrase; the second one brings it to SUGGEST_MIN_COUNT
+        assert index.suggest("sparse att") == []
+        index.add(2, "Sparse attention")
+        await index._merge_task
+        return index.suggest("sparse att")
+
+    assert asyncio.run(run()) == [("sparse attention", "title", 2)]
+    assert merge_threads and threading.get_ident() not in merge_threads
+
+
+def test_sub_threshold_phrases_are_bounded(monkeypatch):
+    monkeypatch.setattr(suggest_index, "SUGGEST_MAX_RARE", 5)
+    index = SuggestIndex()
+
+    async def run():
+        for content_id in range(1, 21):
+            index.add(content_id, f"Topic{content_id} study")
+            await index._merge_task
+
+    asyncio.run(run())
+    assert len(index._rare) == 5
+    # The most recently seen phrases are the ones kept
+    assert ("title", "topic20 study", "topic20 study") in index._rare
+
+
+def test_lookups_keep_their_version_while_a_merge_swaps_in_a_new_one():
+    index = SuggestIndex()
+
+    async def run():
+        index.add(1, "Quantum chemistry")
+        await index._merge_task
+        before = index.entries
+        assert index.suggest("quantum") == [("quantum", "title", 1)]
+        index.add(2, "Quantum computing")
+        await index._merge_task
+        return before
+
+    before = asyncio.run(run())
+    assert index.entries is not before
+    # The old version and its cache are untouched; the new one has its own
+    assert before.cache[("quantum", 8)] == [("quantum", "title", 1)]
+    assert index.suggest("quantum") == [("quantum", "title", 2)]
+
+
+def test_refresh_and_warm_up_count_rows_off_the_event_loop(session_factory, monkeypatch):
+    monkeypatch.setattr(suggest_index, "_index", None)
+    add_papers(session_factory, [("Diffusion models", None), ("Diffusion models for audio", None)])
+    count_threads = []
+    count_terms = suggest_index.count_terms
+
+    def tracked(rows):
+        count_threads.append(threading.get_ident())
+        return count_terms(rows)
+
+    monkeypatch.setattr(suggest_index, "count_terms", tracked)
+
+    async def run():
+        await suggest_index.warm_up(session_factory)
+        index = suggest_index._index
+        assert index.suggest("diffusion mod") == [("diffusion models", "title", 2)]
+        async with session_factory() as session:
+            session.add(Content(title="Diffusion models in vision", external_id="3"))
+            await session.commit()
+            await index.refresh(session, force=True)
+        await index._merge_task
+        return index.suggest("diffusion mod")
+
+    assert asyncio.run(run()) == [("diffusion models", "title", 3)]
+    assert count_threads and threading.get_ident() not in count_threads
+
+
+def test_likes_and_saves_outweigh_paper_counts_and_are_picked_up_on_refresh(session_factory):
+    add_papers(session_factory, [("Graph neural networks", None)] * 3 + [("Graph kernels", None)] * 2)
+
+    async def interact(*changes):
+        async with session_factory() as session:
+            for action, content_id, interaction_type in changes:
+                if action == 'add':
+                    session.add(Interaction(user_id=1, content_id=content_id, interaction_type=interaction_type))
+                else:
+                    interaction = await session.scalar(select(Interaction).where(Interaction.content_id == content_id))
+                    await session.delete(interaction)
+            await session.commit()
+
+    # Views don't count towards popularity
+    asyncio.run(interact(('add', 4, 'like'), ('add', 1, 'view')))
+    index = build(session_factory)
+    # Two papers and one like (weight 2 + 5) beat three papers; the count shown is still papers
+    assert index.suggest("graph", limit=3) == [
+        ("graph", "title", 5), ("graph kernels", "title", 2), ("graph neural", "title", 3)
+    ]
+
+    async def refreshed():
+        async with session_factory() as session:
+            await index.refresh(session, force=True)
+        await index._merge_task
+        return index.suggest("graph", limit=2)
+
+    asyncio.run(interact(('remove', 4, None), ('remove', 1, None), ('add', 2, 'save')))
+    assert asyncio.run(refreshed()) == [("graph", "title", 5), ("graph neural", "title", 3)]
+    assert index.entries.weights[np.searchsorted(index.entries.keys, "graph kernels")] == 2
+
+
+def test_cold_start_merges_after_every_chunk(session_factory, monkeypatch):
+    monkeypatch.setattr(suggest_index, "_LOAD_CHUNK", 2)
+    # The phrase's two papers land in different chunks
+    add_papers(session_factory, [("Sparse attention", None), ("Dense retrieval", None),
+                                 ("Graph kernels", None), ("Sparse attention", None), ("Dense retrieval", None)])
+    pending_sizes = []
+    merged = SuggestIndex._merged
+
+    def tracked(self, entries, pending, pending_likes):
+        pending_sizes.append(len(pending))
+        return merged(self, entries, pending, pending_likes)
+
+    monkeypatch.setattr(SuggestIndex, "_merged", tracked)
+    index = build(session_factory)
+    # Never more than one chunk's terms pending at a time
+    assert pending_sizes == [6, 6, 3]
+    assert index.suggest("sparse att") == [("sparse attention", "title", 2)]
+    assert index.suggest("dense ret") == [("dense retrieval", "title", 2)]
+    assert ("title", "sparse attention", "sparse attention") not in index._rare
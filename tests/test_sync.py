@@ -0,0 +1,73 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from arxiv_server import ArxivServer, make_papers
+from src.backend import arxiv_feed
+from src.backend.arxiv_feed import ArxivClient, TokenBucket, crawl
+from src.backend.sync_state import advance, load_marks, save_marks
+
+NEWEST = datetime(2024, 6, 1, tzinfo=timezone.utc)
+
+
+def client_for(server):
+    return ArxivClient(server.url, rate_limiter=TokenBucket(rate=1000), retries=0)
+
+
+def paper_number(paper):
+    return int(paper['external_id'].split('/')[-1][:-2])
+
+
+def test_advance_only_moves_marks_forward():
+    marks = {}
+    advance(marks, 'cs.LG', NEWEST)
+    advance(marks, 'cs.LG', NEWEST - timedelta(hours=1))
+    advance(marks, 'cs.LG', None)
+    assert marks == {'cs.LG': NEWEST}
+
+
+def test_marks_round_trip_as_aware_utc(session_factory):
+    local = timezone(timedelta(hours=2))
+
+    async def run():
+        async with session_factory() as db:
+            await save_marks(db, {'cs.LG': NEWEST.astimezone(local)})
+            return await load_marks(db)
+
+    marks = asyncio.run(run())
+    assert marks == {'cs.LG': NEWEST} and marks['cs.LG'].tzinfo == timezone.utc
+
+
+def test_sync_fetches_from_the_mark_including_papers_at_it():
+    papers = make_papers('cs.LG', 300)
+    mark = papers[200]['published']  # paper 100
+
+    with ArxivServer({'cs.LG': papers}) as server:
+        client = client_for(server)
+        fetched = asyncio.run(client.fetch_category('cs.LG', max_results=1000, page_size=100, since=mark))
+        client.close()
+
+    _, params, _ = server.requests[0]
+    assert params['sortOrder'] == 'ascending' and 'submittedDate:[202405231600 TO' in params['search_query']
+    assert [paper_number(paper) for paper in fetched] == list(range(100, 301))
+
+
+def test_capped_syncs_resume_without_a_gap(monkeypatch):
+    monkeypatch.setattr(arxiv_feed, "ARXIV_SYNC_MAX_RESULTS", 120)
+    papers = make_papers('cs.LG', 300)
+    marks = {'cs.LG': papers[200]['published']}  # paper 100
+    seen = set()
+
+    async def on_papers(category, results):
+        for paper in results:
+            seen.add(paper_number(paper))
+            advance(marks, category, paper['published_date'])
+
+    with ArxivServer({'cs.LG': papers}) as server:
+        client = client_for(server)
+        for _ in range(3):
+            asyncio.run(crawl(['cs.LG'], client=client, on_papers=on_papers, marks=marks))
+        client.close()
+
+    # Each run stopped at the cap, and the next picked up exactly where it ended
+    assert seen == set(range(100, 301))
+    assert marks['cs.LG'] == NEWEST
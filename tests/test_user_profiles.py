@@ -0,0 +1,88 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from src.backend import user_profiles
+from src.backend.models import Content, Interaction
+from src.backend.user_profiles import apply_interaction, get_profile_vector
+
+VECTORS = {1: [1.0, 0.0, 0.0], 2: [0.0, 1.0, 0.0], 3: [0.0, 0.0, 4.0]}
+
+
+async def seed(session):
+    session.add_all([
+        Content(id=content_id, title=str(content_id), external_id=str(content_id),
+                embedding=np.array(vector, dtype=np.float32))
+        for content_id, vector in VECTORS.items()
+    ])
+    await session.commit()
+
+
+async def interact(session, content_id, interaction_type='like', added=True):
+    """Mirrors the interaction endpoint: change the row, flush, update the profile, commit."""
+    if added:
+        interaction = Interaction(user_id=7, content_id=content_id, interaction_type=interaction_type)
+        session.add(interaction)
+    else:
+        await session.execute(Interaction.__table__.delete().where(Interaction.content_id == content_id))
+    await session.flush()
+    await apply_interaction(session, 7, content_id, interaction_type, added)
+    await session.commit()
+
+
+def test_profile_is_the_running_mean_of_liked_and_saved_papers(session_factory):
+    async def run():
+        async with session_factory() as session:
+            await seed(session)
+            assert await get_profile_vector(session, 7) is None
+            await interact(session, 1)
+            await interact(session, 2, 'save')
+            await interact(session, 3, 'not_interested')
+            mean = await get_profile_vector(session, 7)
+            await interact(session, 1, added=False)
+            after_removal = await get_profile_vector(session, 7)
+            return mean, after_removal
+
+    mean, after_removal = asyncio.run(run())
+    np.testing.assert_allclose(mean, [0.5, 0.5, 0.0], atol=1e-6)
+    np.testing.assert_allclose(after_removal, [0.0, 1.0, 0.0], atol=1e-6)
+
+
+def test_removing_the_last_interaction_clears_the_profile(session_factory):
+    async def run():
+        async with session_factory() as session:
+            await seed(session)
+            await interact(session, 3)
+            await interact(session, 3, added=False)
+            return await get_profile_vector(session, 7)
+
+    assert asyncio.run(run()) is None
+
+
+def test_decay_halves_weight_every_half_life(monkeypatch):
+    now = datetime(2024, 1, 11)
+    assert user_profiles._decay(now - timedelta(days=10), now) == 1.0
+    monkeypatch.setattr(user_profiles, "PROFILE_HALF_LIFE_DAYS", 10.0)
+    assert user_profiles._decay(now - timedelta(days=10), now) == pytest.approx(0.5)
+    assert user_profiles._decay(now - timedelta(days=20), now) == pytest.approx(0.25)
+    assert user_profiles._decay(None, now) == 1.0
+
+
+def test_unliking_a_paper_embedded_after_the_like_keeps_the_other_likes(session_factory):
+    async def run():
+        async with session_factory() as session:
+            await seed(session)
+            session.add(Content(id=4, title='4', external_id='4'))
+            await session.commit()
+            await interact(session, 1)
+            # Not embedded yet, so it adds nothing to the profile
+            await interact(session, 4)
+            paper = await session.get(Content, 4)
+            paper.embedding = np.array([0.0, 1.0, 0.0], dtype=np.float32)
+            await session.commit()
+            await interact(session, 4, added=False)
+            return await get_profile_vector(session, 7)
+
+    np.testing.assert_allclose(asyncio.run(run()), [1.0, 0.0, 0.0], atol=1e-6)
@@ -0,0 +1,85 @@
+import asyncio
+
+import numpy as np
+
+from src.backend.models import Content
+from src.backend.vector_index import EmbeddingIndex, normalize_rows, top_k
+
+
+def brute_force(ids, matrix, query, limit):
+    matrix = matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+    scores = matrix @ (query / np.linalg.norm(query))
+    order = np.argsort(-scores, kind='stable')[:limit]
+    return np.asarray(ids)[order]
+
+
+def random_corpus(n=200, dim=16, seed=0):
+    rng = np.random.default_rng(seed)
+    return np.arange(1, n + 1), rng.standard_normal((n, dim)).astype(np.float32)
+
+
+def test_normalize_rows_scales_to_unit_length_and_keeps_zero_rows():
+    matrix = normalize_rows([[3.0, 4.0], [0.0, 0.0]])
+    assert matrix.dtype == np.float32 and matrix.flags['C_CONTIGUOUS']
+    np.testing.assert_allclose(matrix, [[0.6, 0.8], [0.0, 0.0]])
+
+
+def test_top_k_orders_best_first_and_skips_masked_scores():
+    ids = np.array([10, 11, 12, 13])
+    scores = np.array([0.1, -np.inf, 0.9, 0.5], dtype=np.float32)
+    top_ids, top_scores = top_k(ids, scores, 10)
+    assert top_ids.tolist() == [12, 13, 10]
+    np.testing.assert_allclose(top_scores, [0.9, 0.5, 0.1])
+    assert top_k(ids, scores, 2)[0].tolist() == [12, 13]
+
+
+def test_search_matches_brute_force_cosine():
+    ids, matrix = random_corpus()
+    index = EmbeddingIndex(ids, matrix)
+    query = np.random.default_rng(1).standard_normal(16)
+    found, _ = index.search(query, limit=10)
+    assert found.tolist() == brute_force(ids, matrix, query, 10).tolist()
+
+
+def test_search_honours_exclude_and_restrict():
+    ids, matrix = random_corpus()
+    index = EmbeddingIndex(ids, matrix)
+    query = matrix[4]
+    found, _ = index.search(query, limit=5, exclude=[5])
+    assert 5 not in found.tolist()
+
+    restrict = np.array([7, 20, 33])
+    found, _ = index.search(query, limit=10, restrict=restrict)
+    assert sorted(found.tolist()) == restrict.tolist()
+
+
+def test_added_rows_replace_base_rows_and_compact_keeps_results():
+    ids, matrix = random_corpus()
+    index = EmbeddingIndex(ids, matrix)
+    query = np.random.default_rng(2).standard_normal(16).astype(np.float32)
+    index.add([3, 1000], [query, -query])
+    assert len(index) == len(ids) + 1
+
+    found, scores = index.search(query, limit=1)
+    assert found.tolist() == [3] and scores[0] > 0.999
+    assert index.search(-query, limit=1)[0].tolist() == [1000]
+
+    before = index.search(query, limit=10)[0].tolist()
+    index.compact()
+    assert index.search(query, limit=10)[0].tolist() == before
+
+
+def test_from_db_loads_embedded_rows_only(session_factory):
+    async def run():
+        async with session_factory() as session:
+            session.add_all([
+                Content(title='a', external_id='a', embedding=np.ones(4, dtype=np.float32)),
+                Content(title='b', external_id='b'),
+                Content(title='c', external_id='c', embedding=np.array([1, 0, 0, 0], dtype=np.float32)),
+            ])
+            await session.commit()
+            return await EmbeddingIndex.from_db(session)
+
+    index = asyncio.run(run())
+    assert len(index) == 2
+    assert index.search(np.array([1, 0, 0, 0]), limit=1)[0].tolist() == [3]